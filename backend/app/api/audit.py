@@ -0,0 +1,37 @@
+# backend/app/api/audit.py
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.database import get_read_db
+from app.schemas.schemas import AuditEntry
+from app.crud import audit as crud_audit
+from app.models.models import User
+from app.core.security import get_current_user
+from typing import List, Optional
+
+router = APIRouter(prefix="/audit", tags=["Audit"])
+
+@router.get("/", response_model=List[AuditEntry])
+def read_audit_log(
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    object_type: Optional[str] = Query(None, description="按对象类型 (表名) 过滤，如 tasks、diaries"),
+    object_id: Optional[int] = Query(None, description="按对象 ID 过滤，需同时指定 object_type"),
+    before_id: Optional[int] = Query(None, description="只返回序号小于此值的记录，用于翻页"),
+    limit: int = Query(100, ge=1, le=500)
+):
+    """
+    获取当前用户数据的变更记录，按时间倒序。
+    变更在提交后异步写入，通常在一秒内可见。
+    """
+    entries = crud_audit.get_audit_log(
+        db, user_id=current_user.id, object_type=object_type,
+        object_id=object_id if object_type else None, before_id=before_id, limit=limit
+    )
+    return [
+        AuditEntry(
+            id=entry.id, object_type=entry.object_type, object_id=entry.object_id, action=entry.action,
+            changes=crud_audit.load_changes(entry.changes), created_at=entry.created_at,
+            prev_hash=entry.prev_hash, hash=entry.hash
+        )
+        for entry in entries
+    ]
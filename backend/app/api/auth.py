@@ -1,12 +1,16 @@
 # backend/app/api/auth.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.schemas.schemas import UserCreate, User, Token
+from app.schemas.schemas import UserCreate, User, Token, TokenRefresh, Logout, UserPreferencesUpdate
 from app.crud import users as crud_users
-from app.core.security import verify_password, create_access_token, get_current_user
-from datetime import timedelta
+from app.core import tokens
+from app.core.security import verify_password, verify_password_dummy, get_current_token, get_current_user
+from app.core.rate_limit import (
+    login_rate_limiter, password_hash_limiter, get_client_ip, RateLimitExceeded, ConcurrencyLimitExceeded
+)
 
 # --- 修正之处 ---
 # 为路由器添加 /auth 前缀
@@ -27,27 +31,89 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         if db_user_by_email:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="邮箱已注册")
 
-    new_user = crud_users.create_user(db=db, user=user)
+    try:
+        with password_hash_limiter.slot():
+            new_user = crud_users.create_user(db=db, user=user)
+    except ConcurrencyLimitExceeded as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
     return new_user
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login_for_access_token(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db)
+):
     """
     用户登录并获取 Access Token。
     使用 OAuth2PasswordRequestForm 获取用户名和密码。
+    按客户端 IP 和用户名限流，并限制同时进行的密码校验数量；
+    超限的请求在任何哈希计算之前就被拒绝。
     """
-    user = crud_users.get_user_by_username(db, username=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    try:
+        login_rate_limiter.check(form_data.username, get_client_ip(request))
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, int(e.retry_after + 0.999)))},
+        )
+
+    try:
+        with password_hash_limiter.slot():
+            user = crud_users.get_user_by_username(db, username=form_data.username)
+            if user:
+                authenticated = verify_password(form_data.password, user.hashed_password)
+            else:
+                authenticated = verify_password_dummy(form_data.password)
+    except ConcurrencyLimitExceeded as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
+
+    if not authenticated:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="不正确的用户名或密码",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=30) # 暂定30分钟过期
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+    # 访问令牌按 ACCESS_TOKEN_EXPIRE_MINUTES 过期，之后用刷新令牌续期，无需再次校验密码
+    return tokens.create_token_pair(user.username)
+
+@router.post("/refresh", response_model=Token)
+def refresh_access_token(body: TokenRefresh, db: Session = Depends(get_db)):
+    """
+    用刷新令牌换取一对新的访问令牌和刷新令牌 (不计算 bcrypt)。
+    刷新令牌只能使用一次：旧的刷新令牌随即吊销，重复使用返回 401。
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="刷新令牌无效或已失效",
+        headers={"WWW-Authenticate": "Bearer"},
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    try:
+        claims = tokens.verify_token(body.refresh_token, tokens.REFRESH)
+    except tokens.TokenError:
+        raise credentials_exception
+    user = crud_users.get_user_principal(db, username=claims.subject)
+    if user is None or not tokens.revoke(db, claims, user.id):
+        raise credentials_exception
+    return tokens.create_token_pair(user.username)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    body: Optional[Logout] = None,
+    db: Session = Depends(get_db),
+    claims: tokens.TokenClaims = Depends(get_current_token),
+    current_user: User = Depends(get_current_user)
+):
+    """吊销当前的访问令牌，以及请求体中给出的刷新令牌 (可选，无效时忽略)"""
+    tokens.revoke(db, claims, current_user.id)
+    if body is not None and body.refresh_token:
+        try:
+            refresh_claims = tokens.verify_token(body.refresh_token, tokens.REFRESH)
+        except tokens.TokenError:
+            refresh_claims = None
+        if refresh_claims is not None and refresh_claims.subject == current_user.username:
+            tokens.revoke(db, refresh_claims, current_user.id)
 
 @router.get("/me", response_model=User)
 def read_users_me(current_user: User = Depends(get_current_user)):
@@ -56,3 +122,12 @@ def read_users_me(current_user: User = Depends(get_current_user)):
     需要有效的 Access Token。
     """
     return current_user
+
+@router.patch("/me", response_model=User)
+def update_users_me(
+    preferences: UserPreferencesUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """更新当前用户的偏好，目前为时区偏移 utc_offset_minutes (日程视图据此划分日期)"""
+    return crud_users.update_user_preferences(db, current_user.id, current_user.username, preferences)
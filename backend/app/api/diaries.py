@@ -1,9 +1,12 @@
 # backend/app/api/diaries.py
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.schemas.schemas import DiaryCreate, DiaryUpdate, Diary, DiaryStats
+from app.database import get_db, get_read_db
+from app.schemas.schemas import DiaryCreate, DiaryUpdate, DiaryPatch, Diary, DiaryStats, DiaryPartial, Tombstone
 from app.crud import diaries as crud_diaries
+from app.crud.versioning import VersionConflict
 from app.models.models import User
 from app.core.security import get_current_user
 from datetime import datetime
@@ -20,36 +23,60 @@ def create_diary(
     """创建新日记。如果 is_encrypted 为 True，内容将在保存前加密。"""
     try:
         return crud_diaries.create_user_diary(db=db, diary=diary, user_id=current_user.id)
+    except crud_diaries.DuplicateEntryDate as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.get("/", response_model=List[Diary])
 def read_diaries(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     skip: int = 0,
     limit: int = 100,
     start_date: Optional[datetime] = Query(None, description="日记日期开始范围"),
     end_date: Optional[datetime] = Query(None, description="日记日期结束范围"),
-    decrypt: bool = Query(False, description="是否解密加密日记内容 (慎用，通常在客户端完成解密)")
+    decrypt: bool = Query(False, description="是否解密加密日记内容 (慎用，通常在客户端完成解密)"),
+    fields: Optional[str] = Query(None, description="只返回指定字段，逗号分隔，例如 title,entry_date"),
+    view: Optional[str] = Query(None, description="视图: full (默认) 或 summary (不含 content，附带 preview 摘要)")
 ):
     """
     获取日记列表。
     支持按日期范围过滤。
     'decrypt' 参数用于在服务器端解密加密日记内容，这在生产环境中应谨慎使用。
     更安全的做法是在客户端完成解密。
+    'fields' / 'view' 参数用于列表页只获取需要的字段，未请求 content 时不会读取和解密内容。
     """
-    diaries = crud_diaries.get_diaries(
-        db=db,
-        user_id=current_user.id,
-        skip=skip,
-        limit=limit,
-        start_date=start_date,
-        end_date=end_date,
-        decrypt=decrypt
-    )
+    try:
+        diaries = crud_diaries.get_diaries(
+            db=db,
+            user_id=current_user.id,
+            skip=skip,
+            limit=limit,
+            start_date=start_date,
+            end_date=end_date,
+            decrypt=decrypt,
+            fields=fields.split(",") if fields else None,
+            view=view
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if fields or view:
+        # 投影结果只包含请求的字段，未请求的字段不出现在响应中
+        partial = [DiaryPartial.model_validate(diary) for diary in diaries]
+        return JSONResponse(content=jsonable_encoder(partial, exclude_unset=True))
     return diaries
 
+@router.get("/tombstones", response_model=List[Tombstone])
+def read_deleted_diaries(
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    since: Optional[datetime] = Query(None, description="只返回此时间之后删除的日记"),
+    limit: int = Query(1000, le=5000)
+):
+    """获取已删除日记的墓碑 (id 与删除时间)，供客户端增量同步时移除本地副本"""
+    return crud_diaries.get_deleted_diaries(db=db, user_id=current_user.id, since=since, limit=limit)
+
 @router.get("/{diary_id}", response_model=Diary)
 def read_diary(
     diary_id: int,
@@ -79,9 +106,31 @@ def update_diary(
         if updated_diary is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="日记未找到或无权更新")
         return updated_diary
+    except crud_diaries.DuplicateEntryDate as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
+@router.patch("/{diary_id}", response_model=Diary)
+def patch_diary(
+    diary_id: int,
+    diary_patch: DiaryPatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    部分更新日记，只修改请求中出现的字段；只改标题、日期、评级时不会读取或重新加密内容。
+    请求中带上读取到的 'version' 时，若日记已被其他客户端修改则返回 409。
+    """
+    try:
+        diary = crud_diaries.patch_diary(db=db, diary_id=diary_id, user_id=current_user.id, diary_patch=diary_patch)
+    except (VersionConflict, crud_diaries.DuplicateEntryDate) as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if diary is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="日记未找到或无权更新")
+    return diary
 
 @router.delete("/{diary_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_diary(
@@ -90,14 +139,14 @@ def delete_diary(
     current_user: User = Depends(get_current_user)
 ):
     """删除日记"""
-    deleted_diary = crud_diaries.delete_diary(db=db, diary_id=diary_id, user_id=current_user.id)
-    if deleted_diary is None:
+    deleted = crud_diaries.delete_diary(db=db, diary_id=diary_id, user_id=current_user.id)
+    if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="日记未找到或无权删除")
     return {"message": "日记删除成功"}
 
 @router.get("/stats/summary", response_model=DiaryStats)
 def get_diary_statistics(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取日记统计信息。包括总条目数、总字数、打卡频率、评级分布等。"""
@@ -0,0 +1,88 @@
+# backend/app/api/jobs.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.schemas.schemas import JobCreate, Job, JobResult
+from app.crud import jobs as crud_jobs
+from app.core import jobs as job_runtime
+from app.models.models import User
+from app.core.security import get_current_user
+from typing import List, Optional
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+def _get_job_or_404(db: Session, job_id: str, user_id: int):
+    db_job = crud_jobs.get_job(db, job_id, user_id)
+    if db_job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="作业未找到")
+    return db_job
+
+@router.post("/", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+def submit_job(
+    job: JobCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    提交后台作业，立即返回作业状态，之后通过 GET /jobs/{id} 轮询进度。
+    每个用户同时排队和运行中的作业数超过上限时返回 429。
+    """
+    try:
+        params = job_runtime.validate_params(job.kind, job.params)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"不支持的作业类型: {job.kind}")
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.errors(include_url=False))
+    try:
+        db_job = crud_jobs.create_job(db, user_id=current_user.id, kind=job.kind, params=params)
+    except crud_jobs.JobLimitExceeded as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    job_runtime.submit_job(db_job.id)
+    db.refresh(db_job)
+    return db_job
+
+@router.get("/", response_model=List[Job])
+def read_jobs(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    status_filter: Optional[str] = Query(None, alias="status", description="按作业状态过滤"),
+    limit: int = Query(50, le=200)
+):
+    """获取当前用户最近提交的作业"""
+    return crud_jobs.get_jobs(db, user_id=current_user.id, status=status_filter, limit=limit)
+
+@router.get("/{job_id}", response_model=Job)
+def read_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取作业状态和进度 (不含结果)"""
+    return _get_job_or_404(db, job_id, current_user.id)
+
+@router.get("/{job_id}/result", response_model=JobResult)
+def read_job_result(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取已成功结束的作业的结果；作业尚未结束时返回 409，失败或已取消时返回 410"""
+    db_job = _get_job_or_404(db, job_id, current_user.id)
+    if db_job.status in crud_jobs.ACTIVE_STATUSES:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"作业尚未完成 (当前状态 {db_job.status})")
+    if db_job.status != crud_jobs.SUCCEEDED:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=db_job.error or "作业已取消")
+    return JobResult(id=db_job.id, status=db_job.status, result=crud_jobs.load_json(db_job.result))
+
+@router.post("/{job_id}/cancel", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+def cancel_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """取消作业：排队中的作业立即取消，运行中的作业在下一次报告进度时停止"""
+    db_job = crud_jobs.cancel_job(db, job_id, current_user.id)
+    if db_job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="作业未找到")
+    return db_job
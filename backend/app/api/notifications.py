@@ -17,7 +17,7 @@ def read_notification_settings(
     current_user: User = Depends(get_current_user)
 ):
     """获取当前用户的通知设置。"""
-    return crud_notifications.get_notification_settings(db=db, user_id=current_user.id)
+    return crud_notifications.read_notification_settings(db=db, user_id=current_user.id)
 
 @router.put("/settings", response_model=NotificationSettings)
 def update_notification_settings(
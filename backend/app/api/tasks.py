@@ -1,9 +1,15 @@
 # backend/app/api/tasks.py
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.schemas.schemas import TaskCreate, TaskUpdate, Task, ImportanceEnumSchema
+from app.database import get_db, get_read_db
+from app.schemas.schemas import (
+    TaskCreate, TaskUpdate, TaskPatch, Task, TaskPartial, ImportanceEnumSchema, Tombstone,
+    TaskBulkComplete, TaskBulkCompleteResult, TaskAgenda
+)
 from app.crud import tasks as crud_tasks
+from app.crud.versioning import VersionConflict
 from app.models.models import User, ImportanceEnum
 from app.core.security import get_current_user
 from datetime import datetime
@@ -18,45 +24,89 @@ def create_task(
     current_user: User = Depends(get_current_user)
 ):
     """创建新任务"""
-    return crud_tasks.create_user_task(db=db, task=task, user_id=current_user.id)
+    try:
+        return crud_tasks.create_user_task(db=db, task=task, user_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.get("/", response_model=List[Task])
 def read_tasks(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     skip: int = 0,
     limit: int = 100,
     completed: Optional[bool] = Query(None, description="按完成状态过滤"),
     importance: Optional[ImportanceEnumSchema] = Query(None, description="按重要性过滤"),
     due_date_after: Optional[datetime] = Query(None, description="截止日期晚于此时间"),
-    due_date_before: Optional[datetime] = Query(None, description="截止日期早于此时间")
+    due_date_before: Optional[datetime] = Query(None, description="截止日期早于此时间"),
+    fields: Optional[str] = Query(None, description="只返回指定字段，逗号分隔，例如 title,due_date"),
+    view: Optional[str] = Query(None, description="视图: full (默认) 或 summary (不含描述和提醒时间)"),
+    include_archived: bool = Query(False, description="同时返回已归档的历史任务")
 ):
     """
     获取任务列表。
     支持按完成状态、重要性、截止日期范围过滤。
+    指定截止日期范围时，重复任务会展开为范围内的各个实例 (is_virtual=true)。
+    默认不包含已归档的历史任务，'include_archived' 为 true 时一并返回 (is_archived=true)。
+    'fields' / 'view' 参数用于列表页只获取需要的字段。
     """
     # 将 ImportanceEnumSchema 转换为数据库模型中的 ImportanceEnum
     db_importance = ImportanceEnum[importance.upper()] if importance else None
-    tasks = crud_tasks.get_tasks(
-        db=db,
-        user_id=current_user.id,
-        skip=skip,
-        limit=limit,
-        completed=completed,
-        importance=db_importance,
-        due_date_after=due_date_after,
-        due_date_before=due_date_before
-    )
+    try:
+        tasks = crud_tasks.get_tasks(
+            db=db,
+            user_id=current_user.id,
+            skip=skip,
+            limit=limit,
+            completed=completed,
+            importance=db_importance,
+            due_date_after=due_date_after,
+            due_date_before=due_date_before,
+            fields=fields.split(",") if fields else None,
+            view=view,
+            include_archived=include_archived
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if fields or view:
+        # 投影结果只包含请求的字段，未请求的字段不出现在响应中
+        partial = [TaskPartial.model_validate(task) for task in tasks]
+        return JSONResponse(content=jsonable_encoder(partial, exclude_unset=True))
     return tasks
 
+@router.get("/tombstones", response_model=List[Tombstone])
+def read_deleted_tasks(
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    since: Optional[datetime] = Query(None, description="只返回此时间之后删除的任务"),
+    limit: int = Query(1000, le=5000)
+):
+    """获取已删除任务的墓碑 (id 与删除时间)，供客户端增量同步时移除本地副本"""
+    return crud_tasks.get_deleted_tasks(db=db, user_id=current_user.id, since=since, limit=limit)
+
+@router.get("/agenda", response_model=TaskAgenda)
+def read_task_agenda(
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    limit: int = Query(100, ge=1, le=500, description="每组最多返回的任务数")
+):
+    """
+    日程视图：一次返回未完成任务的 overdue (已逾期)、today (今天)、this_week (之后 6 天) 和 no_date (无截止时间) 四组。
+    日期按当前用户的 utc_offset_minutes (PATCH /auth/me 设置) 划分，重复任务在今天和本周内展开为实例。
+    """
+    return crud_tasks.get_task_agenda(
+        db=db, user_id=current_user.id, utc_offset_minutes=current_user.utc_offset_minutes, limit=limit
+    )
+
 @router.get("/{task_id}", response_model=Task)
 def read_task(
     task_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    include_archived: bool = Query(False, description="在热表中找不到时查询已归档的任务")
 ):
     """根据ID获取单个任务"""
-    task = crud_tasks.get_task(db=db, task_id=task_id, user_id=current_user.id)
+    task = crud_tasks.get_task(db=db, task_id=task_id, user_id=current_user.id, include_archived=include_archived)
     if task is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="任务未找到")
     return task
@@ -69,11 +119,70 @@ def update_task(
     current_user: User = Depends(get_current_user)
 ):
     """更新任务"""
-    updated_task = crud_tasks.update_task(db=db, task_id=task_id, task_update=task_update, user_id=current_user.id)
+    try:
+        updated_task = crud_tasks.update_task(db=db, task_id=task_id, task_update=task_update, user_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if updated_task is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="任务未找到或无权更新")
     return updated_task
 
+@router.patch("/{task_id}", response_model=Task)
+def patch_task(
+    task_id: int,
+    task_patch: TaskPatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    部分更新任务，只修改请求中出现的字段。
+    请求中带上读取到的 'version' 时，若任务已被其他客户端修改则返回 409，而不是覆盖对方的修改。
+    """
+    try:
+        task = crud_tasks.patch_task(db=db, task_id=task_id, user_id=current_user.id, task_patch=task_patch)
+    except VersionConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if task is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="任务未找到或无权更新")
+    return task
+
+@router.post("/complete", response_model=TaskBulkCompleteResult)
+def complete_tasks(
+    request: TaskBulkComplete,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """批量标记任务完成 (completed=false 时取消完成)，返回实际发生变化的任务 ID"""
+    updated_ids = crud_tasks.set_tasks_completed(
+        db=db, user_id=current_user.id, task_ids=request.ids, completed=request.completed
+    )
+    return TaskBulkCompleteResult(updated_ids=updated_ids)
+
+@router.put("/{task_id}/occurrences", response_model=Task)
+def update_task_occurrence(
+    task_id: int,
+    task_update: TaskUpdate,
+    occurrence_date: datetime = Query(..., description="要修改的实例时间 (列表中虚拟实例的 occurrence_date)"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    完成或编辑重复任务的单个实例。
+    该实例会保存为独立任务 (recurrence_parent_id 指向系列)，之后的列表查询返回这条记录而不是虚拟实例。
+    """
+    try:
+        task = crud_tasks.materialize_occurrence(
+            db=db, task_id=task_id, user_id=current_user.id,
+            occurrence_date=occurrence_date, task_update=task_update
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if task is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="重复任务未找到")
+    return task
+
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_task(
     task_id: int,
@@ -81,7 +190,7 @@ def delete_task(
     current_user: User = Depends(get_current_user)
 ):
     """删除任务"""
-    deleted_task = crud_tasks.delete_task(db=db, task_id=task_id, user_id=current_user.id)
-    if deleted_task is None:
+    deleted = crud_tasks.delete_task(db=db, task_id=task_id, user_id=current_user.id)
+    if not deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="任务未找到或无权删除")
     return {"message": "任务删除成功"}
@@ -0,0 +1,258 @@
+# backend/app/core/audit.py
+"""
+变更日志 (审计) 的采集与异步写入。
+
+采集：监听 SessionLocal 创建的会话的事件。
+  after_flush    - 通过 ORM 对象新增、修改、删除的行，按属性历史记录变更字段；
+  record()       - 单条 UPDATE / DELETE / UPSERT 语句绕过了 ORM 对象，由 crud 中的调用方显式登记；
+  after_commit   - 事务提交后才把本事务登记的变更放入队列，回滚 (after_rollback) 时丢弃。
+
+写入：进程内的有界队列 + 后台线程，按 AUDIT_BATCH_SIZE 条或 AUDIT_FLUSH_INTERVAL 秒为一批，
+用一个事务追加到 audit_log 的哈希链 (见 app.crud.audit)，业务事务不需要等待日志写入。
+队列满时提交方最多等待 AUDIT_ENQUEUE_TIMEOUT 秒，之后在当前线程直接写入 (背压)，
+内存占用有上限；进程被强制终止时队列中尚未写入的变更会丢失。
+写入失败时只重试暂时性的数据库错误 (连接断开、锁等待超时等)，且最多 AUDIT_WRITE_RETRIES 次；
+之后这批变更写入死信文件 AUDIT_DEAD_LETTER_PATH 并记录错误日志，写入方继续处理后续的变更，
+不会因为一批无法写入的变更阻塞整个 API。
+"""
+import atexit
+import enum
+import json
+import logging
+import queue
+import threading
+import time
+from contextlib import suppress
+from datetime import date, datetime, timezone
+from typing import List, Optional
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import DBAPIError, DisconnectionError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.config import settings
+from app.database import SessionLocal, engine
+from app.models.models import User, Task, Diary, DiaryKey, NotificationSettings
+from app.crud.audit import append_audit_entries
+
+logger = logging.getLogger(__name__)
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+
+# 记录变更的模型及其中只记录"已修改"、不记录取值的敏感字段
+AUDITED_MODELS = {
+    User: {"hashed_password", "diary_encryption_salt"},
+    Task: set(),
+    Diary: {"content", "content_blob", "preview"},
+    DiaryKey: {"wrapped_key"},
+    NotificationSettings: {"wecom_webhook_url", "dingtalk_webhook_url", "telegram_bot_token"},
+}
+REDACTED = "***"
+
+_PENDING_KEY = "audit_pending"
+
+def _jsonable(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return REDACTED
+    return value
+
+def _redact(model, changes: Optional[dict]) -> Optional[str]:
+    """变更字典转为 JSON 文本，敏感字段替换为 REDACTED"""
+    if changes is None:
+        return None
+    redacted = AUDITED_MODELS[model]
+    return json.dumps(
+        {key: REDACTED if key in redacted else value for key, value in changes.items()},
+        ensure_ascii=False, default=_jsonable, sort_keys=True
+    )
+
+def _entry(model, action: str, object_id, owner_id, changes: Optional[dict]) -> dict:
+    return {
+        "owner_id": owner_id,
+        "object_type": model.__tablename__,
+        "object_id": object_id,
+        "action": action,
+        "changes": _redact(model, changes),
+        "created_at": datetime.now(timezone.utc),
+    }
+
+def record(db: Session, model, action: str, object_id: Optional[int], owner_id: Optional[int], changes: Optional[dict] = None):
+    """
+    登记一条不经过 ORM 对象的变更 (单条语句的 UPDATE / DELETE / UPSERT)，随当前事务提交后写入。
+    批量语句无法确定单个对象时 object_id 传 None。
+    """
+    if settings.AUDIT_ENABLED and model in AUDITED_MODELS:
+        db.info.setdefault(_PENDING_KEY, []).append(_entry(model, action, object_id, owner_id, changes))
+
+def _owner_of(obj):
+    return obj.id if isinstance(obj, User) else obj.owner_id
+
+def _object_changes(obj, action: str) -> Optional[dict]:
+    """只读取已加载的属性和属性历史，不会触发额外的查询"""
+    state = inspect(obj)
+    if action == DELETE:
+        return None
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        if action == CREATE:
+            if attr.key in state.dict and state.dict[attr.key] is not None:
+                changes[attr.key] = state.dict[attr.key]
+        else:
+            history = state.attrs[attr.key].history
+            if history.added or history.deleted:
+                old = history.deleted[0] if history.deleted else None
+                new = history.added[0] if history.added else None
+                if old != new:
+                    changes[attr.key] = [old, new]
+    return changes
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_flushed_changes(session: Session, flush_context):
+    if not settings.AUDIT_ENABLED:
+        return
+    entries = []
+    for objects, action in ((session.new, CREATE), (session.dirty, UPDATE), (session.deleted, DELETE)):
+        for obj in objects:
+            model = type(obj)
+            if model not in AUDITED_MODELS:
+                continue
+            changes = _object_changes(obj, action)
+            if action == UPDATE and not changes:
+                continue
+            entries.append(_entry(model, action, obj.id, _owner_of(obj), changes))
+    if entries:
+        session.info.setdefault(_PENDING_KEY, []).extend(entries)
+
+@event.listens_for(SessionLocal, "after_commit")
+def _submit_committed_changes(session: Session):
+    entries = session.info.pop(_PENDING_KEY, None)
+    if entries:
+        audit_writer.submit(entries)
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_rolled_back_changes(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+
+def _is_transient(error: Exception) -> bool:
+    """连接断开、数据库被锁、连接池等待超时等可以重试的错误；约束冲突、表结构不符等重试也不会成功"""
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, (OperationalError, DisconnectionError, PoolTimeoutError))
+
+class AuditWriter:
+    """有界队列 + 后台线程，按批把变更追加到哈希链；线程在第一次提交变更时启动"""
+
+    def __init__(
+        self, session_factory, maxsize: int, batch_size: int, interval: float, enqueue_timeout: float,
+        retries: int, max_delay: float, dead_letter_path: str
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.enqueue_timeout = enqueue_timeout
+        self.retries = retries
+        self.max_delay = max_delay
+        self.dead_letter_path = dead_letter_path
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        # 后台线程与队列满时直接写入的提交方共用，保证同一进程内按顺序追加
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dead_lettered = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, entries: List[dict]):
+        self._ensure_started()
+        for index, entry in enumerate(entries):
+            try:
+                self.queue.put(entry, timeout=self.enqueue_timeout)
+            except queue.Full:
+                # 写入跟不上提交：由提交方直接写入剩余的变更，拖慢的是产生变更的请求；
+                # 不在请求线程中重试，失败时直接写入死信文件
+                self.write(entries[index:], retries=0)
+                return
+
+    def write(self, entries: List[dict], retries: Optional[int] = None):
+        """
+        在当前线程写入一批变更。暂时性错误按倍增的间隔最多重试 retries 次 (默认 AUDIT_WRITE_RETRIES)，
+        仍失败或遇到其他错误时写入死信文件。
+        """
+        retries = self.retries if retries is None else retries
+        with self._write_lock:
+            delay = self.interval
+            for attempt in range(retries + 1):
+                db = self.session_factory()
+                try:
+                    self.written += append_audit_entries(db, entries)
+                    return
+                except Exception as e:
+                    error = e
+                    # 连接已断开时回滚本身也可能失败，不能让它中断写入线程
+                    with suppress(Exception):
+                        db.rollback()
+                finally:
+                    db.close()
+                if not _is_transient(error) or attempt == retries:
+                    break
+                logger.warning("写入审计日志失败，%.1f 秒后重试 (%d/%d): %s", delay, attempt + 1, retries, error)
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_delay)
+            self._dead_letter(entries, error)
+
+    def _dead_letter(self, entries: List[dict], error: Exception):
+        self.dead_lettered += len(entries)
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False, default=_jsonable) + "\n")
+        except OSError as e:
+            logger.critical("审计日志写入失败 (%s)，死信文件 %s 也无法写入 (%s)，%d 条变更已丢失",
+                            error, self.dead_letter_path, e, len(entries))
+            return
+        logger.error("审计日志写入失败 (%s)，%d 条变更已写入死信文件 %s，"
+                     "修复后运行 python -m scripts.audit_log replay 重新写入", error, len(entries), self.dead_letter_path)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def flush(self):
+        """等待队列中已提交的变更全部写入 (进程退出前、测试中调用)"""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.join()
+
+# 写入方使用独立的会话工厂，不会触发上面的事件监听
+audit_writer = AuditWriter(
+    sessionmaker(autocommit=False, autoflush=False, bind=engine),
+    maxsize=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    interval=settings.AUDIT_FLUSH_INTERVAL,
+    enqueue_timeout=settings.AUDIT_ENQUEUE_TIMEOUT,
+    retries=settings.AUDIT_WRITE_RETRIES,
+    max_delay=settings.AUDIT_RETRY_MAX_DELAY,
+    dead_letter_path=settings.AUDIT_DEAD_LETTER_PATH,
+)
+atexit.register(audit_writer.flush)
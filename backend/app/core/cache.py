@@ -0,0 +1,281 @@
+# backend/app/core/cache.py
+"""
+可插拔的共享缓存。
+
+后端 (CACHE_BACKEND)：
+  memory - 进程内 LRU，每个 worker 各有一份，适合单进程部署和开发；
+  redis  - 通过 get_redis() 共享，多个 worker 看到同一份数据
+           (未配置 REDIS_URL 时为进程内的 LocalRedis 替身)；
+  none   - 不缓存，每次都调用加载函数。
+
+使用方式：在模块中声明命名空间，读时 get_or_set，写操作提交后调用 invalidate (或 set 写穿)：
+
+    stats_cache = cache.namespace("diary_stats", ttl=300)
+    stats = stats_cache.get_or_set(user_id, lambda: compute_stats(db, user_id))
+    stats_cache.invalidate(user_id)
+
+值以 JSON 存储 (datetime 转为 ISO 字符串)，加载函数返回 None 时不缓存。
+
+Redis 不可用时读取按未命中处理、回填跳过，加载锁视为已取得；失效 (delete) 失败会记录日志并抛出，
+调用方不会在缓存仍保留旧值时误以为已失效。
+"""
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.redis_client import get_redis, redis
+
+logger = logging.getLogger(__name__)
+
+# 共享后端的连接、超时等错误；未安装 redis 时只有 LocalRedis，不会抛出网络错误
+CACHE_ERRORS = (redis.exceptions.RedisError, OSError) if redis is not None else (OSError,)
+
+class MemoryCacheBackend:
+    """进程内 LRU 缓存，条目超过 max_entries 时淘汰最久未使用的"""
+
+    def __init__(self, max_entries: int = 10_000):
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.shared = False
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expire_at = entry
+            if expire_at is not None and expire_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _store(self, key: str, value: bytes, ttl: Optional[float]):
+        """写入并淘汰超出 max_entries 的条目，调用方需持有锁"""
+        self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            self._store(key, value, ttl)
+        return True
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """键不存在 (或已过期) 时写入并返回 True"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+class RedisCacheBackend:
+    """
+    基于 Redis (或 LocalRedis 替身) 的缓存，多个 worker / 实例共享。
+    Redis 出错时 get 视为未命中、set 跳过 (返回 False)、add 视为取得了锁，
+    缓存故障不影响请求本身；delete 用于失效，出错时记录日志后抛出。
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.shared = True
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(key)
+        except CACHE_ERRORS:
+            logger.warning("读取缓存 %s 失败，按未命中处理", key, exc_info=True)
+            return None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        try:
+            self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+            return True
+        except CACHE_ERRORS:
+            logger.warning("写入缓存 %s 失败，已跳过", key, exc_info=True)
+            return False
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        try:
+            return bool(self.client.set(key, value, px=int(ttl * 1000) if ttl else None, nx=True))
+        except CACHE_ERRORS:
+            logger.warning("获取缓存锁 %s 失败，按已取得处理", key, exc_info=True)
+            return True
+
+    def delete(self, *keys: str):
+        if not keys:
+            return
+        try:
+            self.client.delete(*keys)
+        except CACHE_ERRORS:
+            logger.exception("删除缓存 %s 失败，缓存中可能仍是旧值", ", ".join(keys))
+            raise
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法缓存 {type(value).__name__} 类型的值")
+
+class CacheNamespace:
+    """一个命名空间下的键共享前缀和默认 TTL"""
+
+    def __init__(self, cache: "Cache", name: str, ttl: Optional[float]):
+        self.cache = cache
+        self.name = name
+        self.ttl = ttl
+
+    def key(self, key) -> str:
+        return f"{self.cache.prefix}:{self.name}:{key}"
+
+    def version_key(self, key) -> str:
+        return f"{self.cache.prefix}:version:{self.name}:{key}"
+
+    def _read_version(self, key) -> Optional[bytes]:
+        return self.cache.backend.get(self.version_key(key))
+
+    def _bump_version(self, key):
+        """
+        写操作先换一个随机版本再写穿或删除：加载期间版本变化的回填会被撤销。
+        用随机值而不是计数器，版本键过期后重新写入也不会与旧值相同。
+        """
+        ttl = max(self.ttl or 0, settings.CACHE_LOCK_TTL)
+        self.cache.backend.set(self.version_key(key), secrets.token_bytes(8), ttl)
+
+    def get(self, key) -> Any:
+        if self.cache.backend is None:
+            return None
+        raw = self.cache.backend.get(self.key(key))
+        return None if raw is None else json.loads(raw)
+
+    def _store(self, key, value, ttl: Optional[float]) -> bool:
+        data = json.dumps(value, default=_json_default, ensure_ascii=False).encode('utf-8')
+        return self.cache.backend.set(self.key(key), data, ttl or self.ttl)
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        """写穿：写操作提交后直接把新值放入缓存；写入失败时改为删除，不留下旧值"""
+        if self.cache.backend is None:
+            return
+        if value is None:
+            self.invalidate(key)
+            return
+        self._bump_version(key)
+        if not self._store(key, value, ttl):
+            self.cache.backend.delete(self.key(key))
+
+    def invalidate(self, *keys):
+        if self.cache.backend is None:
+            return
+        for key in keys:
+            self._bump_version(key)
+        self.cache.backend.delete(*[self.key(key) for key in keys])
+
+    def _fill(self, key, loader: Callable[[], Any], ttl: Optional[float]) -> Any:
+        """
+        调用 loader 并回填。loader 读到的可能是写操作提交前的数据：回填后若版本已被写操作更换，
+        删除刚写入的值 (写操作先换版本再写穿/删除，两者任意交错都不会留下旧值)。
+        """
+        version = self._read_version(key)
+        value = loader()
+        if value is not None and self._store(key, value, ttl) and self._read_version(key) != version:
+            self.cache.backend.delete(self.key(key))
+        return value
+
+    def get_or_set(self, key, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        读取缓存，未命中时调用 loader 加载并写入。
+        同一个键的并发未命中只有一个调用方执行 loader (single-flight)：
+        进程内通过按键加锁实现；共享后端上再用 SET NX 锁协调其他 worker，
+        等待超过 CACHE_LOCK_WAIT 秒仍未取得结果时自行加载，避免长时间阻塞请求。
+        """
+        value = self.get(key)
+        if value is not None or self.cache.backend is None:
+            return value if value is not None else loader()
+
+        full_key = self.key(key)
+        with self.cache.local_flight(full_key):
+            value = self.get(key)
+            if value is not None:
+                return value
+            with self.cache.shared_flight(full_key) as acquired:
+                if not acquired:
+                    value = self._wait_for(key)
+                    if value is not None:
+                        return value
+                value = self._fill(key, loader, ttl)
+        return value
+
+    def _wait_for(self, key) -> Any:
+        deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            value = self.get(key)
+            if value is not None:
+                return value
+        return None
+
+class Cache:
+    def __init__(self, backend, prefix: str = "cache"):
+        self.backend = backend
+        self.prefix = prefix
+        self._flights: Dict[str, list] = {}
+        self._flights_lock = threading.Lock()
+
+    def namespace(self, name: str, ttl: Optional[float] = None) -> CacheNamespace:
+        return CacheNamespace(self, name, ttl if ttl is not None else settings.CACHE_DEFAULT_TTL)
+
+    @contextmanager
+    def local_flight(self, key: str):
+        """同一进程内同一个键同时只有一个线程加载"""
+        with self._flights_lock:
+            entry = self._flights.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._flights_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._flights.pop(key, None)
+
+    @contextmanager
+    def shared_flight(self, key: str):
+        """跨 worker 的加载锁，只在共享后端上生效；产出是否取得了锁"""
+        if not self.backend.shared:
+            yield True
+            return
+        lock_key = f"{key}:lock"
+        acquired = self.backend.add(lock_key, b"1", settings.CACHE_LOCK_TTL)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    self.backend.delete(lock_key)
+                except CACHE_ERRORS:
+                    pass  # 已记录日志，锁到 CACHE_LOCK_TTL 后自动过期
+
+def _build_backend():
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(settings.CACHE_MAX_ENTRIES)
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(get_redis())
+    if settings.CACHE_BACKEND == "none":
+        return None
+    raise ValueError(f"不支持的缓存后端: {settings.CACHE_BACKEND}")
+
+cache = Cache(_build_backend(), prefix=settings.CACHE_KEY_PREFIX)
@@ -0,0 +1,70 @@
+# backend/app/core/compression.py
+import zlib
+from typing import Optional, Tuple
+from app.core.config import settings
+
+# zstd 为可选依赖 (pip install zstandard)，未安装时自动回退到 zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+def available_codecs() -> list:
+    codecs = [CODEC_ZLIB]
+    if zstandard is not None:
+        codecs.append(CODEC_ZSTD)
+    return codecs
+
+def get_default_codec() -> Optional[str]:
+    """根据 DIARY_COMPRESSION 配置返回写入时使用的编码，"none" 表示不压缩"""
+    codec = settings.DIARY_COMPRESSION.lower()
+    if codec == "none":
+        return None
+    if codec == CODEC_ZSTD and zstandard is None:
+        return CODEC_ZLIB
+    if codec not in (CODEC_ZLIB, CODEC_ZSTD):
+        raise ValueError(f"不支持的压缩编码: {settings.DIARY_COMPRESSION}")
+    return codec
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, settings.DIARY_COMPRESSION_LEVEL)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("未安装 zstandard，无法使用 zstd 压缩。")
+        return zstandard.ZstdCompressor(level=settings.DIARY_COMPRESSION_LEVEL).compress(data)
+    raise ValueError(f"不支持的压缩编码: {codec}")
+
+def decompress(data: bytes, codec: Optional[str]) -> bytes:
+    if codec is None:
+        return bytes(data)
+    try:
+        if codec == CODEC_ZLIB:
+            return zlib.decompress(data)
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise ValueError("未安装 zstandard，无法解压 zstd 内容。")
+            return zstandard.ZstdDecompressor().decompress(data)
+    except zlib.error as e:
+        raise ValueError(f"解压失败: {e}")
+    except Exception as e:
+        if zstandard is not None and isinstance(e, zstandard.ZstdError):
+            raise ValueError(f"解压失败: {e}")
+        raise
+    raise ValueError(f"不支持的压缩编码: {codec}")
+
+def maybe_compress(data: bytes, codec: Optional[str] = None) -> Tuple[Optional[str], bytes]:
+    """
+    内容超过 DIARY_COMPRESSION_MIN_BYTES 且压缩后确实变小时才压缩。
+    返回 (实际使用的编码, 数据)，未压缩时编码为 None。
+    """
+    codec = codec or get_default_codec()
+    if codec is None or len(data) < settings.DIARY_COMPRESSION_MIN_BYTES:
+        return None, data
+    compressed = compress(data, codec)
+    if len(compressed) >= len(data):
+        return None, data
+    return codec, compressed
@@ -1,6 +1,6 @@
 # backend/app/core/config.py
 from pydantic_settings import BaseSettings
-from typing import List, ClassVar
+from typing import List, ClassVar, Dict
 
 class Settings(BaseSettings):
     """
@@ -11,9 +11,163 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "a_very_long_and_super_secret_random_string_for_jwt"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     ALGORITHM: str = "HS256"
+    # 刷新令牌的有效期 (天)；每次刷新换发新的刷新令牌并吊销旧的 (只能使用一次)
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+    # 校验通过的令牌在进程内缓存 (按令牌的哈希，缓存到令牌过期) 的最大条数
+    TOKEN_CACHE_MAX_ENTRIES: int = 10_000
+    # 各 worker 检查吊销代数、同步其他 worker 吊销的令牌的间隔秒数
+    TOKEN_REVOCATION_REFRESH_INTERVAL: float = 5
+
+    # --- Redis 配置 ---
+    # 留空时使用进程内的 LocalRedis 替身 (不跨进程共享)
+    REDIS_URL: str = ""
+
+    # --- 缓存配置 ---
+    # 缓存后端: "memory" (进程内 LRU)、"redis" (多 worker 共享，REDIS_URL 为空时退化为进程内替身) 或 "none"
+    CACHE_BACKEND: str = "memory"
+    CACHE_KEY_PREFIX: str = "tds"
+    CACHE_DEFAULT_TTL: float = 300
+    # memory 后端的最大条目数
+    CACHE_MAX_ENTRIES: int = 10_000
+    # 认证用户信息的缓存时间；用户被删除时会立即失效
+    CACHE_PRINCIPAL_TTL: float = 60
+    # 缓存未命中时，其他 worker 等待持锁方加载结果的最长秒数，以及加载锁的过期时间
+    CACHE_LOCK_WAIT: float = 2
+    CACHE_LOCK_TTL: float = 10
+
+    # --- 登录限流配置 ---
+    # 限流后端: "memory" (单进程) 或 "redis" (多 worker 共享，REDIS_URL 为空时退化为进程内替身)
+    RATE_LIMIT_BACKEND: str = "memory"
+    # 令牌桶容量 (突发次数) 与每分钟补充的令牌数
+    LOGIN_RATE_LIMIT_IP_CAPACITY: int = 20
+    LOGIN_RATE_LIMIT_IP_PER_MINUTE: float = 20
+    LOGIN_RATE_LIMIT_USER_CAPACITY: int = 5
+    LOGIN_RATE_LIMIT_USER_PER_MINUTE: float = 5
+    # 同时进行的 bcrypt 校验上限 (0 表示按 CPU 核数)，超出时直接返回 503
+    LOGIN_MAX_CONCURRENT_HASHES: int = 0
+    # 位于反向代理之后时，从 X-Forwarded-For 读取客户端 IP
+    TRUST_PROXY_HEADERS: bool = False
+
+    # --- 日记信封加密配置 ---
+    # KEK (密钥加密密钥) 用于包裹每个用户的数据加密密钥 (DEK)。
+    # DIARY_KEK 为 urlsafe base64 编码的 32 字节密钥，必须单独配置 (未配置时服务拒绝启动)，
+    # 与 SECRET_KEY 无关，轮换 JWT 签名密钥不影响日记。生成与轮换见 scripts/diary_keys.py。
+    DIARY_KEK: str = ""
+    DIARY_KEK_ID: str = "v1"
+    # 轮换 KEK 后，旧的 KEK 需保留在此处 (kek_id -> 密钥)，直到所有 DEK 重新包裹完毕
+    DIARY_RETIRED_KEKS: Dict[str, str] = {}
+    # 批量解密的线程数 (0 表示按 CPU 核数)，以及启用线程池的最小总密文字节数
+    DIARY_DECRYPT_WORKERS: int = 0
+    DIARY_PARALLEL_DECRYPT_MIN_BYTES: int = 256 * 1024
+
+    # --- 日记内容存储配置 ---
+    # 压缩编码: "zstd" (需安装 zstandard，未安装时回退 zlib)、"zlib" 或 "none"
+    DIARY_COMPRESSION: str = "zstd"
+    DIARY_COMPRESSION_LEVEL: int = 6
+    # 小于该字节数的内容不压缩
+    DIARY_COMPRESSION_MIN_BYTES: int = 512
+    # 是否将密文/压缩内容以二进制 (LargeBinary) 存储，而不是 base64 文本
+    DIARY_BINARY_STORAGE: bool = True
+    # 列表摘要视图中 preview 的最大字符数
+    DIARY_PREVIEW_LENGTH: int = 120
+
+    # --- 任务归档配置 ---
+    # 完成超过该天数的任务移入 tasks_archive 表，只在查询历史 (include_archived) 时读取
+    TASK_ARCHIVE_AFTER_DAYS: int = 90
+    # 每批移动的任务数，每批单独提交
+    TASK_ARCHIVE_BATCH_SIZE: int = 500
+
+    # --- 软删除配置 ---
+    # 删除的任务/日记先保留墓碑，超过该天数后由清理任务物理删除
+    SOFT_DELETE_RETENTION_DAYS: int = 30
+    # 清理任务每批删除的行数，每批单独提交
+    PURGE_BATCH_SIZE: int = 500
+
+    # --- 后台作业配置 ---
+    # 作业执行方式: "local" (API 进程内的线程池)、"eager" (提交时同步执行，用于开发和测试)、
+    # "database" (作业留在 jobs 表中，由 python -m scripts.job_worker 领取执行)
+    # 或 "celery" (需安装 celery，通过 JOB_BROKER_URL 投递，留空时使用 REDIS_URL)
+    JOB_BACKEND: str = "local"
+    JOB_BROKER_URL: str = ""
+    # local 后端的线程数
+    JOB_LOCAL_WORKERS: int = 2
+    # 每个用户同时排队和运行中的作业上限，超出时提交返回 429
+    JOB_MAX_ACTIVE_PER_USER: int = 2
+    # 作业写入进度 (同时检查取消请求) 的最小间隔秒数
+    JOB_PROGRESS_INTERVAL: float = 0.5
+    # database 后端的 worker 轮询间隔秒数
+    JOB_POLL_INTERVAL: float = 1.0
+    # 作业每批处理的行数，每批单独提交
+    JOB_BATCH_SIZE: int = 200
+    # 已结束的作业及其结果保留的天数，由 scripts.purge_deleted purge 清理
+    JOB_RESULT_RETENTION_DAYS: int = 7
+    # 运行中的作业超过这么多秒没有心跳 (进程重启、worker 回收) 时标记为失败，不再计入并发上限
+    JOB_STALE_AFTER: float = 600
+    # 检查心跳超时的作业、local 后端重新投递遗留的排队作业的间隔秒数
+    JOB_REAP_INTERVAL: float = 60
+
+    # --- 审计日志配置 ---
+    # 提交后把变更放入进程内的有界队列，由后台线程按批追加到 audit_log (哈希链)
+    AUDIT_ENABLED: bool = True
+    # 队列最多缓存的变更条数；队列满时提交方最多等待 AUDIT_ENQUEUE_TIMEOUT 秒，仍满则在当前线程直接写入
+    AUDIT_QUEUE_SIZE: int = 10_000
+    AUDIT_ENQUEUE_TIMEOUT: float = 2.0
+    # 每批写入的最大条数，以及不足一批时最长等待的秒数
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL: float = 1.0
+    # 数据库暂时不可用时一批最多重试的次数 (间隔从 AUDIT_FLUSH_INTERVAL 起倍增，最长 AUDIT_RETRY_MAX_DELAY 秒)；
+    # 重试用尽或遇到非暂时性错误时，这批变更追加到 AUDIT_DEAD_LETTER_PATH (JSON Lines)，
+    # 修复后用 python -m scripts.audit_log replay 重新写入
+    AUDIT_WRITE_RETRIES: int = 5
+    AUDIT_RETRY_MAX_DELAY: float = 30.0
+    AUDIT_DEAD_LETTER_PATH: str = "audit_dead_letter.jsonl"
+
+    # --- 响应压缩配置 ---
+    RESPONSE_COMPRESSION_ENABLED: bool = True
+    # 小于该字节数的响应不压缩
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024
+    RESPONSE_COMPRESSION_LEVEL: int = 6
+    # 压缩后体积超过原始体积的该比例时放弃压缩 (如 base64 密文)
+    RESPONSE_COMPRESSION_MAX_RATIO: float = 0.7
+    # 按偏好顺序排列；br 需安装 brotli，zstd 需安装 zstandard，未安装的会被忽略
+    RESPONSE_COMPRESSION_ENCODINGS: List[str] = ["zstd", "br", "gzip"]
 
     # --- 数据库配置 ---
     DATABASE_URL: str = "sqlite:///./taskdiary.db"
+    # 启动时创建缺失的表和列；scripts.serve 在启动 worker 前执行一次，并为 worker 关闭此项
+    SYNC_SCHEMA_ON_STARTUP: bool = True
+    # 整个部署 (所有 worker 合计) 允许占用的数据库连接数，按 worker 数平分为每个进程的连接池大小
+    DB_MAX_CONNECTIONS: int = 40
+    # 每个 worker 的连接池大小，0 表示 DB_MAX_CONNECTIONS / worker 数 (至少 2)
+    DB_POOL_SIZE: int = 0
+    DB_MAX_OVERFLOW: int = 0
+    # 等待空闲连接的最长秒数，以及连接的最长复用秒数 (避免被数据库或代理端断开)
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    # SQLite 连接参数：WAL 允许读写并发，多个 worker 写同一个文件时由 busy_timeout 排队而不是立即报错
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # 每个连接的页缓存大小 (KB)
+    SQLITE_CACHE_SIZE_KB: int = 20_000
+    # PostgreSQL 连接参数：单条语句的超时 (0 表示不限制) 和 application_name
+    POSTGRES_STATEMENT_TIMEOUT_MS: int = 0
+    POSTGRES_APPLICATION_NAME: str = "taskdiary"
+
+    # --- 生产服务器配置 (python -m scripts.serve) ---
+    # worker 进程数，0 表示按 CPU 核数；scripts.serve 会把实际数量写回环境变量供各 worker 读取
+    SERVER_WORKERS: int = 0
+    # 每个 worker 执行同步路由的线程数，0 表示与该 worker 的数据库连接数 (连接池 + 溢出) 相同
+    SERVER_THREADPOOL_SIZE: int = 0
+    # worker 处理该数量的请求 (加上 0~JITTER 的随机数，避免同时重启) 后平滑退出并由主进程重启，0 表示不限制
+    SERVER_MAX_REQUESTS: int = 0
+    SERVER_MAX_REQUESTS_JITTER: int = 0
+    # worker 常驻内存超过该值 (MB) 后平滑退出并重启，0 表示不限制；每 SERVER_MEMORY_CHECK_EVERY 个请求检查一次
+    SERVER_MAX_MEMORY_MB: int = 0
+    SERVER_MEMORY_CHECK_EVERY: int = 100
+    # 平滑退出时等待处理中的请求完成的最长秒数
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_KEEPALIVE_TIMEOUT: int = 5
 
     # --- CORS 跨域配置 ---
     # 定义允许访问后端 API 的前端源地址
@@ -0,0 +1,229 @@
+# backend/app/core/jobs.py
+"""
+后台作业。耗时的按用户操作 (重建统计、导出、批量重新加密、批量导入) 提交为作业，
+请求只负责写入 jobs 表并立即返回作业 ID，客户端轮询状态、取回结果或取消。
+
+执行方式 (JOB_BACKEND)：
+  local    - API 进程内的线程池 (本地 broker，不依赖外部服务；进程退出时未执行的作业留在队列中)；
+  eager    - 提交时在当前线程同步执行，用于开发和测试；
+  database - 作业留在 jobs 表中，由独立进程 python -m scripts.job_worker 轮询领取；
+  celery   - 通过 celery 投递作业 ID，由 python -m scripts.job_worker 启动 celery worker。
+
+执行作业的进程退出 (重启、worker 回收) 后，作业不会一直停留在 queued / running：
+API 进程启动时及每 JOB_REAP_INTERVAL 秒执行一次 reap_jobs()，把心跳超过 JOB_STALE_AFTER 秒的
+运行中作业标记为失败 (处理函数不一定可以安全重入，不自动重跑)；local 后端同时重新投递遗留在 jobs 表中的排队作业。
+
+作业处理函数通过 job_handler 注册，签名为 handler(ctx: JobContext, params)，返回值 (可 JSON 序列化)
+作为结果保存。处理函数应周期性调用 ctx.progress()，其中会检查取消请求并抛出 JobCancelled。
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, NamedTuple, Optional, Type
+from pydantic import BaseModel
+from app.core.config import settings
+from app.database import SessionLocal
+from app.crud import jobs as crud_jobs
+
+logger = logging.getLogger(__name__)
+
+# celery 为可选依赖，只有 JOB_BACKEND=celery 时需要
+try:
+    import celery
+except ImportError:
+    celery = None
+
+class JobCancelled(Exception):
+    """作业在运行中被请求取消"""
+
+class JobHandler(NamedTuple):
+    func: Callable
+    params_model: Optional[Type[BaseModel]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+def job_handler(kind: str, params_model: Optional[Type[BaseModel]] = None):
+    """注册作业处理函数；params_model 用于在提交时校验参数"""
+    def decorator(func):
+        _handlers[kind] = JobHandler(func, params_model)
+        return func
+    return decorator
+
+def get_handlers() -> Dict[str, JobHandler]:
+    # 处理函数依赖 crud 各模块，首次使用时再导入以避免循环导入
+    import app.crud.job_handlers  # noqa: F401
+    return _handlers
+
+def validate_params(kind: str, params: Optional[dict]) -> dict:
+    """校验作业类型与参数，返回规范化后的参数；类型未知时抛出 KeyError，参数无效时抛出 pydantic 的 ValidationError"""
+    handler = get_handlers()[kind]
+    if handler.params_model is None:
+        return {}
+    return handler.params_model.model_validate(params or {}).model_dump(mode="json")
+
+class JobContext:
+    """传给处理函数的运行上下文：独立的数据库会话、作业信息和进度报告"""
+
+    def __init__(self, db, job_id: str, user_id: int):
+        self.db = db
+        self.job_id = job_id
+        self.user_id = user_id
+        self._last_report = 0.0
+
+    def progress(self, done: int, total: int, message: Optional[str] = None, force: bool = False):
+        """
+        报告进度 (done / total)。为避免频繁写库，两次写入至少间隔 JOB_PROGRESS_INTERVAL 秒。
+        写入时一并检查取消请求，已请求取消则抛出 JobCancelled。
+        """
+        now = time.monotonic()
+        if not force and now - self._last_report < settings.JOB_PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        percent = int(done * 100 / total) if total else 0
+        if not crud_jobs.report_progress(self.db, self.job_id, percent, message):
+            raise JobCancelled()
+
+def run_job(job_id: str):
+    """
+    领取并执行一个作业，结果或错误写回 jobs 表。
+    作业已被其他 worker 领取或已取消时直接返回。
+    """
+    db = SessionLocal()
+    try:
+        if crud_jobs.claim_job(db, job_id):
+            _execute(db, job_id)
+    finally:
+        db.close()
+
+def _execute(db, job_id: str):
+    """执行已领取 (running) 的作业"""
+    job = crud_jobs.get_job(db, job_id)
+    ctx = JobContext(db, job.id, job.owner_id)
+    try:
+        handler = get_handlers()[job.kind]
+        result = handler.func(ctx, crud_jobs.load_json(job.params) or {})
+    except JobCancelled:
+        db.rollback()
+        crud_jobs.finish_job(db, job_id, crud_jobs.CANCELLED)
+    except ValueError as e:
+        # 处理函数以 ValueError 报告输入或数据问题，不打印堆栈
+        db.rollback()
+        crud_jobs.finish_job(db, job_id, crud_jobs.FAILED, error=str(e))
+    except Exception as e:
+        db.rollback()
+        logger.exception("作业 %s (%s) 执行失败", job_id, job.kind)
+        crud_jobs.finish_job(db, job_id, crud_jobs.FAILED, error=str(e) or type(e).__name__)
+    else:
+        crud_jobs.finish_job(db, job_id, crud_jobs.SUCCEEDED, result=result)
+
+class EagerJobBackend:
+    def submit(self, job_id: str):
+        run_job(job_id)
+
+class LocalJobBackend:
+    """进程内线程池：作业 ID 在内存队列中排队，由 JOB_LOCAL_WORKERS 个线程执行"""
+
+    def __init__(self, workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+
+    def submit(self, job_id: str):
+        self.executor.submit(run_job, job_id)
+
+class DatabaseJobBackend:
+    """提交时什么都不做，作业由 scripts.job_worker 从 jobs 表中领取"""
+
+    def submit(self, job_id: str):
+        pass
+
+class CeleryJobBackend:
+    def __init__(self, broker_url: str):
+        self.app = celery.Celery("taskdiary", broker=broker_url)
+        self.app.conf.task_acks_late = True
+        self.app.conf.worker_prefetch_multiplier = 1
+        self.run = self.app.task(name="jobs.run_job", ignore_result=True)(run_job)
+
+    def submit(self, job_id: str):
+        self.run.delay(job_id)
+
+def _build_backend():
+    if settings.JOB_BACKEND == "local":
+        return LocalJobBackend(settings.JOB_LOCAL_WORKERS)
+    if settings.JOB_BACKEND == "eager":
+        return EagerJobBackend()
+    if settings.JOB_BACKEND == "database":
+        return DatabaseJobBackend()
+    if settings.JOB_BACKEND == "celery":
+        if celery is None:
+            raise RuntimeError("JOB_BACKEND=celery 需要安装 celery (pip install celery)")
+        broker_url = settings.JOB_BROKER_URL or settings.REDIS_URL
+        if not broker_url:
+            raise RuntimeError("JOB_BACKEND=celery 需要配置 JOB_BROKER_URL 或 REDIS_URL")
+        return CeleryJobBackend(broker_url)
+    raise ValueError(f"不支持的作业后端: {settings.JOB_BACKEND}")
+
+backend = _build_backend()
+
+def submit_job(job_id: str):
+    """按 JOB_BACKEND 投递已写入 jobs 表的作业"""
+    backend.submit(job_id)
+
+def reap_jobs(requeue_all: bool = False):
+    """
+    回收执行中断的作业：心跳超时的运行中作业标记为失败。
+    local 后端的排队作业只在进程内存中排队，进程退出后需要重新投递：requeue_all 为 True (启动时)
+    投递全部排队中的作业，否则只投递排队超过 JOB_STALE_AFTER 秒的作业。
+    重复投递是安全的，claim_job 保证每个作业只执行一次。
+    """
+    db = SessionLocal()
+    try:
+        failed = crud_jobs.fail_stale_jobs(db)
+        requeued = []
+        if isinstance(backend, LocalJobBackend):
+            created_before = None if requeue_all else crud_jobs.stale_cutoff()
+            requeued = crud_jobs.get_queued_job_ids(db, created_before)
+    finally:
+        db.close()
+    for job_id in requeued:
+        backend.submit(job_id)
+    if failed or requeued:
+        logger.info("回收作业：%d 个心跳超时的作业标记为失败，重新投递 %d 个排队中的作业", failed, len(requeued))
+
+_reaper: Optional[threading.Thread] = None
+
+def _reap_loop():
+    while True:
+        time.sleep(settings.JOB_REAP_INTERVAL)
+        try:
+            reap_jobs()
+        except Exception:
+            logger.exception("回收作业失败，%s 秒后重试", settings.JOB_REAP_INTERVAL)
+
+def start_job_reaper():
+    """启动时回收一次，之后由后台线程定期回收 (API 进程的 lifespan 中调用)"""
+    global _reaper
+    reap_jobs(requeue_all=True)
+    if _reaper is None:
+        _reaper = threading.Thread(target=_reap_loop, name="job-reaper", daemon=True)
+        _reaper.start()
+
+def run_worker(max_jobs: Optional[int] = None, once: bool = False) -> int:
+    """
+    database 后端的 worker 循环：领取排队中的作业并执行，队列为空时每 JOB_POLL_INTERVAL 秒轮询一次。
+    once 为 True 时处理完当前队列即退出。返回执行的作业数。
+    """
+    executed = 0
+    db = SessionLocal()
+    try:
+        while max_jobs is None or executed < max_jobs:
+            job_id = crud_jobs.claim_next_job(db)
+            if job_id is None:
+                if once:
+                    break
+                time.sleep(settings.JOB_POLL_INTERVAL)
+                continue
+            _execute(db, job_id)
+            executed += 1
+    finally:
+        db.close()
+    return executed
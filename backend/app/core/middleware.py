@@ -0,0 +1,294 @@
+# backend/app/core/middleware.py
+import logging
+import os
+import random
+import signal
+import sys
+import zlib
+from typing import List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# brotli / zstd 均为可选依赖，未安装时只协商 gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 只压缩文本类响应，图片、压缩包等已压缩的内容直接透传
+COMPRESSIBLE_CONTENT_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "text/",
+    "image/svg+xml",
+)
+
+class _StreamCompressor:
+    """统一 gzip / br / zstd 的流式压缩接口：compress() 追加数据，flush() 同步刷新，finish() 结束流"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(min(max(level, 1), 9), zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=min(max(level, 0), 11))
+        elif encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=min(max(level, 1), 22)).compressobj()
+        else:
+            raise ValueError(f"不支持的响应压缩编码: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "gzip":
+            return self._obj.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._obj.flush()
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+def available_encodings() -> List[str]:
+    encodings = ["gzip"]
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    return encodings
+
+def negotiate_encoding(accept_encoding: str, preferred: Sequence[str]) -> Optional[str]:
+    """按服务端偏好顺序，选择客户端 Accept-Encoding 中 q > 0 的第一个编码"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+
+    for encoding in preferred:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件 (纯 ASGI 实现，支持流式响应)。
+
+    - 根据 Accept-Encoding 协商 zstd / br / gzip (后两者需安装对应可选依赖)；
+    - 小于 minimum_size 的响应不压缩；
+    - 先压缩开头至少 minimum_size 字节的样本，若压缩后体积超过原始的 max_ratio
+      (例如整页都是 base64 密文)，则放弃压缩，原样发送；
+    - 流式响应在样本判定之后逐块压缩并同步刷新，不会缓冲整个响应体。
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        level: int = 6,
+        max_ratio: float = 0.7,
+        encodings: Sequence[str] = ("zstd", "br", "gzip"),
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.max_ratio = max_ratio
+        supported = available_encodings()
+        self.encodings = [encoding for encoding in encodings if encoding in supported]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        # 未协商出编码时也要经过 responder：可压缩类型的响应一律带 Vary: Accept-Encoding，
+        # 否则共享缓存可能把未压缩的版本交给支持压缩的客户端 (或反之)
+        encoding = negotiate_encoding(accept_encoding, self.encodings)
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+def _add_vary(headers) -> list:
+    """在 Vary 中追加 Accept-Encoding (已包含或为 * 时不变)，返回新的响应头列表"""
+    vary = [value for name, value in headers if name == b"vary"]
+    tokens = {token.strip().lower() for value in vary for token in value.split(b",")}
+    if b"accept-encoding" in tokens or b"*" in tokens:
+        return list(headers)
+    headers = [(name, value) for name, value in headers if name != b"vary"]
+    headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+    return headers
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message = None
+        self.passthrough = False
+        self.started = False
+        self.compressor: Optional[_StreamCompressor] = None
+        self.buffer = bytearray()
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            compressible = self._is_compressible(message)
+            if compressible:
+                message = {**message, "headers": _add_vary(message.get("headers", []))}
+            self.start_message = message
+            self.passthrough = not compressible or self.encoding is None
+            if self.passthrough:
+                await self._send(message)
+                self.started = True
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is not None:
+            # 已决定压缩：逐块压缩，流结束时输出尾部
+            data = self.compressor.compress(body)
+            data += self.compressor.flush() if more_body else self.compressor.finish()
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        if self.started:
+            # 已决定不压缩：原样透传
+            await self._send(message)
+            return
+
+        self.buffer.extend(body)
+        if more_body and len(self.buffer) < self.middleware.minimum_size:
+            return # 继续缓冲，直到样本足够判断是否值得压缩
+        await self._decide(more_body)
+
+    def _is_compressible(self, message) -> bool:
+        if message["status"] < 200 or message["status"] in (204, 304):
+            return False
+        content_type = ""
+        for name, value in message.get("headers", []):
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        return content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)
+
+    async def _decide(self, more_body: bool):
+        sample = bytes(self.buffer)
+        self.buffer = bytearray()
+        self.started = True
+
+        if len(sample) < self.middleware.minimum_size:
+            await self._send_uncompressed(sample, more_body)
+            return
+
+        compressor = _StreamCompressor(self.encoding, self.middleware.level)
+        compressed = compressor.compress(sample)
+        compressed += compressor.flush() if more_body else compressor.finish()
+        if len(compressed) > len(sample) * self.middleware.max_ratio:
+            await self._send_uncompressed(sample, more_body)
+            return
+
+        self.compressor = compressor
+        headers = [(name, value) for name, value in self.start_message.get("headers", []) if name != b"content-length"]
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if not more_body:
+            headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+        await self._send({**self.start_message, "headers": headers})
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    async def _send_uncompressed(self, body: bytes, more_body: bool):
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+def current_rss_mb() -> float:
+    """当前进程的常驻内存 (MB)；没有 /proc 的平台退化为历史峰值"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource  # Windows 上没有该模块，只在退化路径中导入
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 上单位为字节，Linux 上为 KB
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class WorkerRecycleMiddleware:
+    """
+    worker 回收中间件 (纯 ASGI 实现)。
+
+    - 处理的请求数达到 max_requests (加上 0~jitter 的随机数，避免所有 worker 同时重启) 后，
+      或每 memory_check_every 个请求检查一次常驻内存、超过 max_memory_mb 后，
+      向本进程发送一次 SIGTERM；
+    - uvicorn 收到 SIGTERM 后停止接收新连接，等待处理中的请求完成 (最长 SERVER_GRACEFUL_TIMEOUT 秒) 再退出，
+      多 worker 模式下主进程会启动新的 worker 补位。单进程模式下 SIGTERM 会结束整个服务，不应启用。
+    """
+
+    def __init__(
+        self,
+        app,
+        max_requests: int = 0,
+        jitter: int = 0,
+        max_memory_mb: int = 0,
+        memory_check_every: int = 100,
+    ):
+        self.app = app
+        self.max_requests = max_requests + random.randint(0, jitter) if max_requests else 0
+        self.max_memory_mb = max_memory_mb
+        self.memory_check_every = max(1, memory_check_every)
+        self.requests = 0
+        self.recycling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.requests += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if not self.recycling and self._should_recycle():
+                self.recycling = True
+                logger.warning(
+                    "worker %d 已处理 %d 个请求，常驻内存 %.0f MB，平滑退出后重启",
+                    os.getpid(), self.requests, current_rss_mb()
+                )
+                os.kill(os.getpid(), signal.SIGTERM)
+
+    def _should_recycle(self) -> bool:
+        if self.max_requests and self.requests >= self.max_requests:
+            return True
+        return bool(
+            self.max_memory_mb
+            and self.requests % self.memory_check_every == 0
+            and current_rss_mb() > self.max_memory_mb
+        )
+
@@ -0,0 +1,167 @@
+# backend/app/core/rate_limit.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Tuple
+from app.core.config import settings
+from app.core.redis_client import get_redis, LocalRedis
+
+class RateLimitExceeded(Exception):
+    """请求超过令牌桶限制"""
+    def __init__(self, retry_after: float):
+        super().__init__(f"请求过于频繁，请在 {retry_after:.0f} 秒后重试")
+        self.retry_after = retry_after
+
+class ConcurrencyLimitExceeded(Exception):
+    """同时进行的密码哈希校验数已达上限"""
+
+def token_bucket_step(tokens, updated_at, now: float, capacity: float, refill_rate: float, cost: float = 1):
+    """
+    令牌桶的一次计算，返回 (剩余令牌, 是否放行, 需等待秒数)。
+    tokens / updated_at 为 None 表示新桶 (满额)。
+    """
+    if tokens is None or updated_at is None:
+        tokens, updated_at = capacity, now
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_rate)
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    return tokens, False, (cost - tokens) / refill_rate
+
+class MemoryTokenBucketBackend:
+    """进程内令牌桶，适用于单进程部署；桶数量超过 max_keys 时淘汰最久未使用的桶"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_keys = max_keys
+
+    def consume(self, key: str, capacity: float, refill_rate: float, cost: float = 1) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (None, None))
+            tokens, allowed, retry_after = token_bucket_step(tokens, updated_at, now, capacity, refill_rate, cost)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+# 使用 Redis 服务器时间，避免多个 worker 之间的时钟偏差
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], ttl)
+return {allowed, tostring(retry_after)}
+"""
+
+def _local_token_bucket(client: LocalRedis, keys: list, args: list):
+    """TOKEN_BUCKET_LUA 在 LocalRedis 上的等价实现"""
+    capacity, rate, cost, ttl = float(args[0]), float(args[1]), float(args[2]), int(args[3])
+    stored_tokens, stored_ts = client.hmget(keys[0], "tokens", "ts")
+    tokens, allowed, retry_after = token_bucket_step(
+        float(stored_tokens) if stored_tokens is not None else None,
+        float(stored_ts) if stored_ts is not None else None,
+        time.time(), capacity, rate, cost
+    )
+    client.hset(keys[0], {"tokens": tokens, "ts": time.time()})
+    client.pexpire(keys[0], ttl)
+    return [int(allowed), str(retry_after)]
+
+class RedisTokenBucketBackend:
+    """基于 Redis 的令牌桶，多个 worker / 实例共享同一份计数"""
+
+    def __init__(self, client, prefix: str = "ratelimit"):
+        self.client = client
+        self.prefix = prefix
+        if isinstance(client, LocalRedis):
+            client.register_script(TOKEN_BUCKET_LUA, _local_token_bucket)
+
+    def consume(self, key: str, capacity: float, refill_rate: float, cost: float = 1) -> Tuple[bool, float]:
+        # 桶在完全回满后即可过期
+        ttl_ms = int(capacity / refill_rate * 1000) + 1000
+        allowed, retry_after = self.client.eval(
+            TOKEN_BUCKET_LUA, 1, f"{self.prefix}:{key}", capacity, refill_rate, cost, ttl_ms
+        )
+        if isinstance(retry_after, bytes):
+            retry_after = retry_after.decode('utf-8')
+        return bool(int(allowed)), float(retry_after)
+
+class ConcurrencyLimiter:
+    """限制同时执行的 CPU 密集操作 (如 bcrypt 校验)，超出上限时立即拒绝而不是排队"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    @contextmanager
+    def slot(self):
+        if not self._semaphore.acquire(blocking=False):
+            raise ConcurrencyLimitExceeded("服务器繁忙，请稍后重试")
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+class LoginRateLimiter:
+    """
+    登录限流：分别按客户端 IP 和用户名消耗令牌，任一桶耗尽即拒绝。
+    在任何密码哈希之前调用，被拒绝的请求只花费一次字典或 Redis 操作。
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def check(self, username: str, client_ip: str):
+        allowed, retry_after = self.backend.consume(
+            f"login:ip:{client_ip}",
+            settings.LOGIN_RATE_LIMIT_IP_CAPACITY,
+            settings.LOGIN_RATE_LIMIT_IP_PER_MINUTE / 60
+        )
+        if not allowed:
+            raise RateLimitExceeded(retry_after)
+        allowed, retry_after = self.backend.consume(
+            f"login:user:{username.strip().lower()}",
+            settings.LOGIN_RATE_LIMIT_USER_CAPACITY,
+            settings.LOGIN_RATE_LIMIT_USER_PER_MINUTE / 60
+        )
+        if not allowed:
+            raise RateLimitExceeded(retry_after)
+
+def get_client_ip(request) -> str:
+    if settings.TRUST_PROXY_HEADERS:
+        forwarded_for = request.headers.get("x-forwarded-for")
+        if forwarded_for:
+            return forwarded_for.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def _build_backend():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisTokenBucketBackend(get_redis())
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return MemoryTokenBucketBackend()
+    raise ValueError(f"不支持的限流后端: {settings.RATE_LIMIT_BACKEND}")
+
+login_rate_limiter = LoginRateLimiter(_build_backend())
+password_hash_limiter = ConcurrencyLimiter(settings.LOGIN_MAX_CONCURRENT_HASHES or (os.cpu_count() or 1))
@@ -0,0 +1,269 @@
+# backend/app/core/recurrence.py
+"""
+重复规则 (RFC 5545 RRULE 的子集) 的解析与惰性展开。
+
+支持的属性：
+  FREQ=DAILY|WEEKLY|MONTHLY|YEARLY (必填)
+  INTERVAL=n           间隔，默认 1
+  COUNT=n / UNTIL=...  结束条件 (二选一)，UNTIL 格式为 YYYYMMDD 或 YYYYMMDDTHHMMSS[Z]
+  BYDAY=MO,WE,...      仅 WEEKLY
+  BYMONTHDAY=1,15,...  仅 MONTHLY
+
+展开时直接跳到查询窗口所在的周期，不从 DTSTART 逐个迭代；有 COUNT 时按每个周期
+固定的实例数算出之前已发生的次数 (每月 29-31 日、2 月 29 日这类不规则规则除外)，
+因此窗口查询的代价只与窗口内的实例数有关。
+"""
+import calendar
+from functools import lru_cache
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+# 连续这么多个周期没有任何实例时停止展开 (如每年 2 月 30 日)
+MAX_EMPTY_PERIODS = 1000
+# COUNT / UNTIL 的上限，避免计算结束时间时超出 datetime 的范围
+MAX_COUNT = 100_000
+MAX_UNTIL = datetime(2200, 1, 1)
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    freq: str
+    interval: int = 1
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+    byday: Tuple[int, ...] = ()
+    bymonthday: Tuple[int, ...] = ()
+
+def _parse_until(value: str) -> datetime:
+    for fmt in ("%Y%m%dT%H%M%SZ", "%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt.endswith("Z"):
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        elif fmt == "%Y%m%d":
+            parsed = parsed.replace(hour=23, minute=59, second=59)
+        return parsed
+    raise ValueError(f"无法解析 UNTIL: {value}")
+
+def _parse_int(name: str, value: str, minimum: int = 1) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} 必须是整数: {value}")
+    if number < minimum:
+        raise ValueError(f"{name} 必须不小于 {minimum}")
+    return number
+
+@lru_cache(maxsize=1024)
+def parse_rrule(text: str) -> RecurrenceRule:
+    """解析 RRULE 字符串，不支持的属性或组合会抛出 ValueError。结果不可变，按规则文本缓存"""
+    if text.upper().startswith("RRULE:"):
+        text = text[6:]
+    parts = {}
+    for part in text.strip().split(";"):
+        if not part:
+            continue
+        name, sep, value = part.partition("=")
+        if not sep or not value:
+            raise ValueError(f"无效的重复规则片段: {part}")
+        parts[name.strip().upper()] = value.strip().upper()
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ 必须是 {', '.join(FREQUENCIES)} 之一")
+    interval = _parse_int("INTERVAL", parts.pop("INTERVAL", "1"))
+    count = _parse_int("COUNT", parts.pop("COUNT")) if "COUNT" in parts else None
+    if count is not None and count > MAX_COUNT:
+        raise ValueError(f"COUNT 不能大于 {MAX_COUNT}")
+    until = _parse_until(parts.pop("UNTIL")) if "UNTIL" in parts else None
+    if until is not None and until.replace(tzinfo=None) >= MAX_UNTIL:
+        raise ValueError(f"UNTIL 必须早于 {MAX_UNTIL.year} 年")
+    if count is not None and until is not None:
+        raise ValueError("COUNT 和 UNTIL 不能同时使用")
+
+    byday: Tuple[int, ...] = ()
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY 仅支持 FREQ=WEEKLY")
+        try:
+            byday = tuple(sorted({WEEKDAYS[day] for day in parts.pop("BYDAY").split(",")}))
+        except KeyError as e:
+            raise ValueError(f"无效的 BYDAY: {e.args[0]}")
+
+    bymonthday: Tuple[int, ...] = ()
+    if "BYMONTHDAY" in parts:
+        if freq != "MONTHLY":
+            raise ValueError("BYMONTHDAY 仅支持 FREQ=MONTHLY")
+        bymonthday = tuple(sorted({_parse_int("BYMONTHDAY", day) for day in parts.pop("BYMONTHDAY").split(",")}))
+        if bymonthday[-1] > 31:
+            raise ValueError("BYMONTHDAY 必须在 1-31 之间")
+
+    if parts:
+        raise ValueError(f"不支持的重复规则属性: {', '.join(sorted(parts))}")
+    return RecurrenceRule(freq=freq, interval=interval, count=count, until=until, byday=byday, bymonthday=bymonthday)
+
+def align_datetime(value: Optional[datetime], reference: datetime) -> Optional[datetime]:
+    """
+    使 value 与 reference 的时区形式一致，以便比较。
+    SQLite 读出的时间是 naive 的 (按 UTC 存储)，而请求参数可能带时区。
+    """
+    if value is None:
+        return None
+    if reference.tzinfo is None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    if reference.tzinfo is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _add_months(year: int, month: int, months: int) -> Tuple[int, int]:
+    total = year * 12 + (month - 1) + months
+    return total // 12, total % 12 + 1
+
+def _period_occurrences(rule: RecurrenceRule, dtstart: datetime, period: int) -> List[datetime]:
+    """第 period 个周期内的所有实例 (按时间排序，不早于 dtstart)"""
+    start_date = dtstart.date()
+    if rule.freq == "DAILY":
+        dates = [start_date + timedelta(days=period * rule.interval)]
+    elif rule.freq == "WEEKLY":
+        week_start = start_date - timedelta(days=start_date.weekday()) + timedelta(weeks=period * rule.interval)
+        dates = [week_start + timedelta(days=day) for day in (rule.byday or (start_date.weekday(),))]
+    elif rule.freq == "MONTHLY":
+        year, month = _add_months(start_date.year, start_date.month, period * rule.interval)
+        days_in_month = calendar.monthrange(year, month)[1]
+        dates = [
+            start_date.replace(year=year, month=month, day=day)
+            for day in (rule.bymonthday or (start_date.day,)) if day <= days_in_month
+        ]
+    else:
+        year = start_date.year + period * rule.interval
+        if start_date.month == 2 and start_date.day == 29 and not calendar.isleap(year):
+            dates = []
+        else:
+            dates = [start_date.replace(year=year)]
+
+    time_part = dtstart.timetz()
+    return [
+        occurrence for occurrence in (datetime.combine(date, time_part) for date in dates)
+        if occurrence >= dtstart
+    ]
+
+def _period_of(rule: RecurrenceRule, dtstart: datetime, moment: datetime) -> int:
+    """moment 所在 (或之前最近) 的周期序号"""
+    start_date, date = dtstart.date(), moment.date()
+    if rule.freq == "DAILY":
+        period = (date - start_date).days // rule.interval
+    elif rule.freq == "WEEKLY":
+        week_start = start_date - timedelta(days=start_date.weekday())
+        period = ((date - week_start).days // 7) // rule.interval
+    elif rule.freq == "MONTHLY":
+        period = ((date.year - start_date.year) * 12 + date.month - start_date.month) // rule.interval
+    else:
+        period = (date.year - start_date.year) // rule.interval
+    return max(period, 0)
+
+def _occurrences_before(rule: RecurrenceRule, dtstart: datetime, period: int) -> Optional[int]:
+    """前 period 个周期内的实例总数；每个周期实例数不固定时返回 None"""
+    if period <= 0:
+        return 0
+    if rule.freq == "DAILY":
+        per_period = 1
+    elif rule.freq == "WEEKLY":
+        per_period = len(rule.byday) or 1
+    elif rule.freq == "MONTHLY":
+        days = rule.bymonthday or (dtstart.day,)
+        if max(days) > 28:
+            return None
+        per_period = len(days)
+    else:
+        if dtstart.month == 2 and dtstart.day == 29:
+            return None
+        per_period = 1
+    return len(_period_occurrences(rule, dtstart, 0)) + (period - 1) * per_period
+
+def iter_occurrences(
+    rule: RecurrenceRule,
+    dtstart: datetime,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = None
+) -> Iterator[datetime]:
+    """
+    按时间顺序生成 [start, end] 内的实例，最多 limit 个。
+    规则本身无结束条件时，必须提供 end 或 limit。
+    """
+    start = align_datetime(start, dtstart)
+    end = align_datetime(end, dtstart)
+    until = align_datetime(rule.until, dtstart)
+    if end is None and limit is None and rule.count is None and until is None:
+        raise ValueError("无结束条件的重复规则必须指定展开窗口或数量上限")
+
+    # 直接跳到窗口所在的周期；有 COUNT 且无法直接算出之前的实例数时从头计数
+    period = 0 if start is None else _period_of(rule, dtstart, start)
+    index = 0
+    if rule.count is not None and period:
+        index = _occurrences_before(rule, dtstart, period)
+        if index is None:
+            period, index = 0, 0
+    produced, empty_periods = 0, 0
+    while empty_periods < MAX_EMPTY_PERIODS:
+        occurrences = _period_occurrences(rule, dtstart, period)
+        empty_periods = 0 if occurrences else empty_periods + 1
+        for occurrence in occurrences:
+            if rule.count is not None and index >= rule.count:
+                return
+            index += 1
+            if (until is not None and occurrence > until) or (end is not None and occurrence > end):
+                return
+            if start is not None and occurrence < start:
+                continue
+            yield occurrence
+            produced += 1
+            if limit is not None and produced >= limit:
+                return
+        period += 1
+
+def is_occurrence(rule: RecurrenceRule, dtstart: datetime, moment: datetime) -> bool:
+    moment = align_datetime(moment, dtstart)
+    return next(iter_occurrences(rule, dtstart, start=moment, end=moment), None) == moment
+
+def _last_counted_occurrence(rule: RecurrenceRule, dtstart: datetime) -> Optional[datetime]:
+    """第 COUNT 个实例：每个周期实例数固定时直接算出所在的周期，否则从头计数"""
+    first = _period_occurrences(rule, dtstart, 0)
+    if rule.count <= len(first):
+        return first[rule.count - 1]
+    before_second = _occurrences_before(rule, dtstart, 1)
+    if before_second is None:
+        last = None
+        for last in iter_occurrences(rule, dtstart):
+            pass
+        return last
+    per_period = _occurrences_before(rule, dtstart, 2) - before_second
+    remaining = rule.count - before_second
+    period = 1 + (remaining - 1) // per_period
+    return _period_occurrences(rule, dtstart, period)[(remaining - 1) % per_period]
+
+def _last_occurrence_until(rule: RecurrenceRule, dtstart: datetime) -> Optional[datetime]:
+    """不晚于 UNTIL 的最后一个实例：从 UNTIL 所在的周期向前查找"""
+    until = align_datetime(rule.until, dtstart)
+    period = _period_of(rule, dtstart, until)
+    for candidate in range(period, max(period - MAX_EMPTY_PERIODS, -1), -1):
+        occurrences = [o for o in _period_occurrences(rule, dtstart, candidate) if o <= until]
+        if occurrences:
+            return occurrences[-1]
+    return None
+
+def last_occurrence(rule: RecurrenceRule, dtstart: datetime) -> Optional[datetime]:
+    """有限规则的最后一个实例；无限规则返回 None。结束时间超出可表示的范围时抛出 ValueError"""
+    if rule.count is None and rule.until is None:
+        return None
+    try:
+        if rule.count is not None:
+            return _last_counted_occurrence(rule, dtstart)
+        return _last_occurrence_until(rule, dtstart)
+    except (OverflowError, ValueError):
+        # 日期运算超出 datetime 的范围 (如每年 2 月 29 日且 COUNT 很大)
+        raise ValueError("重复规则的结束时间超出范围")
@@ -0,0 +1,154 @@
+# backend/app/core/redis_client.py
+import logging
+import threading
+import time
+import hashlib
+from typing import Callable, Dict, Optional
+from app.core.config import settings
+
+# redis 为可选依赖 (pip install redis)，未安装或未配置 REDIS_URL 时使用本地替身
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+class LocalRedis:
+    """
+    进程内的 Redis 替身，实现本项目用到的命令子集，用于开发和测试。
+    不跨进程共享数据。EVAL 无法执行 Lua，调用方需通过 register_script
+    为每个脚本注册等价的 Python 实现，handler 签名为 handler(client, keys, args)。
+    """
+
+    def __init__(self):
+        self._data: Dict[str, object] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._scripts: Dict[str, Callable] = {}
+
+    # --- 内部工具 ---
+    @staticmethod
+    def _key(key) -> str:
+        return key.decode('utf-8') if isinstance(key, bytes) else str(key)
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, float):
+            return repr(value).encode('utf-8')
+        return str(value).encode('utf-8')
+
+    def _alive(self, key: str) -> bool:
+        expire_at = self._expires.get(key)
+        if expire_at is not None and expire_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    # --- 字符串 ---
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            key = self._key(key)
+            return self._data[key] if self._alive(key) else None
+
+    def set(self, key, value, ex: Optional[int] = None, px: Optional[int] = None, nx: bool = False):
+        with self._lock:
+            key = self._key(key)
+            if nx and self._alive(key):
+                return None
+            self._data[key] = self._encode(value)
+            self._expires.pop(key, None)
+            if ex is not None:
+                self._expires[key] = time.monotonic() + ex
+            elif px is not None:
+                self._expires[key] = time.monotonic() + px / 1000
+            return True
+
+    def incr(self, key, amount: int = 1) -> int:
+        with self._lock:
+            key = self._key(key)
+            value = int(self._data[key]) + amount if self._alive(key) else amount
+            self._data[key] = self._encode(value)
+            return value
+
+    def delete(self, *keys) -> int:
+        with self._lock:
+            deleted = 0
+            for key in keys:
+                key = self._key(key)
+                if self._alive(key):
+                    deleted += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return deleted
+
+    def exists(self, key) -> int:
+        with self._lock:
+            return int(self._alive(self._key(key)))
+
+    def pexpire(self, key, milliseconds: int) -> bool:
+        with self._lock:
+            key = self._key(key)
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + milliseconds / 1000
+            return True
+
+    def expire(self, key, seconds: int) -> bool:
+        return self.pexpire(key, seconds * 1000)
+
+    # --- 哈希 ---
+    def hmget(self, key, *fields) -> list:
+        with self._lock:
+            key = self._key(key)
+            mapping = self._data.get(key) if self._alive(key) else None
+            return [mapping.get(self._key(field)) if mapping else None for field in fields]
+
+    def hset(self, key, mapping: dict) -> int:
+        with self._lock:
+            key = self._key(key)
+            if not self._alive(key):
+                self._data[key] = {}
+            target = self._data[key]
+            added = 0
+            for field, value in mapping.items():
+                field = self._key(field)
+                added += field not in target
+                target[field] = self._encode(value)
+            return added
+
+    # --- 脚本 ---
+    def register_script(self, script: str, handler: Callable):
+        self._scripts[hashlib.sha1(script.encode('utf-8')).hexdigest()] = handler
+
+    def eval(self, script: str, numkeys: int, *keys_and_args):
+        handler = self._scripts.get(hashlib.sha1(script.encode('utf-8')).hexdigest())
+        if handler is None:
+            raise NotImplementedError("LocalRedis 不能执行 Lua，请先 register_script 注册等价实现。")
+        with self._lock:
+            return handler(self, list(keys_and_args[:numkeys]), list(keys_and_args[numkeys:]))
+
+    def ping(self) -> bool:
+        return True
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_redis():
+    """
+    返回共享的 Redis 客户端。
+    配置了 REDIS_URL 且安装了 redis 包时连接真实 Redis，否则返回进程内的 LocalRedis。
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if settings.REDIS_URL and redis is not None:
+                    _client = redis.Redis.from_url(settings.REDIS_URL)
+                else:
+                    if settings.REDIS_URL:
+                        logger.warning("已配置 REDIS_URL 但未安装 redis 包，使用进程内 LocalRedis 替代，数据不在进程间共享")
+                    _client = LocalRedis()
+    return _client
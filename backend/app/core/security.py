@@ -1,13 +1,11 @@
 # backend/app/core/security.py
 from passlib.context import CryptContext
-from datetime import datetime, timedelta, timezone
-from typing import Optional
-from jose import JWTError, jwt
+from typing import Optional, List
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from app.schemas.schemas import TokenData
 from app.crud import users as crud_users
+from app.core import tokens
 from app.core.config import settings
 from app.database import get_db # 新增：在这里导入 get_db
 import secrets
@@ -16,7 +14,17 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.exceptions import InvalidTag
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.keywrap import aes_key_wrap, aes_key_unwrap, InvalidUnwrap
 from base64 import urlsafe_b64encode, urlsafe_b64decode
+from functools import lru_cache
+import logging
+
+logger = logging.getLogger(__name__)
 
 # --- 密码哈希和验证 ---
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -27,37 +35,42 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+@lru_cache(maxsize=1)
+def _get_dummy_password_hash() -> str:
+    return pwd_context.hash(secrets.token_urlsafe(16))
+
+def verify_password_dummy(plain_password: str) -> bool:
+    """
+    用户不存在时执行一次等价的 bcrypt 校验，使响应时间与用户存在时一致，
+    避免通过耗时差异探测用户名。总是返回 False。
+    """
+    pwd_context.verify(plain_password, _get_dummy_password_hash())
+    return False
+
 # --- JWT 认证相关 ---
+# 令牌的签发、校验缓存和吊销见 app.core.tokens
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
-
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="无法验证凭据",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def get_current_token(token: str = Depends(oauth2_scheme)) -> tokens.TokenClaims:
+    """校验请求中的访问令牌 (命中缓存时不解码、不验签，吊销检查只查内存集合)"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-
-    user = crud_users.get_user_by_username(db, username=token_data.username)
+        return tokens.verify_token(token, tokens.ACCESS)
+    except tokens.TokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无法验证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+async def get_current_user(claims: tokens.TokenClaims = Depends(get_current_token), db: Session = Depends(get_db)):
+    # 只需要用户的标识信息，读缓存，避免每个请求都查询 users 表
+    user = crud_users.get_user_principal(db, username=claims.subject)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无法验证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 # --- 日记加密相关 ---
@@ -78,14 +91,13 @@ def get_key_from_password_hash_and_salt(hashed_password: str, salt: str) -> byte
     )
     return kdf.derive(password_bytes)
 
-def encrypt_data(plaintext: str, key: bytes) -> str:
+def encrypt_bytes(data: bytes, key: bytes) -> bytes:
+    """AES-GCM 加密，返回 iv + 密文 + tag 的二进制形式"""
     iv = os.urandom(12)
-    cipher = Cipher(algorithms.AES(key), modes.GCM(iv), backend=default_backend())
-    encryptor = cipher.encryptor()
-    ciphertext = encryptor.update(plaintext.encode('utf-8')) + encryptor.finalize()
-    tag = encryptor.tag
-    combined_data = iv + ciphertext + tag
-    return urlsafe_b64encode(combined_data).decode('utf-8')
+    return iv + AESGCM(key).encrypt(iv, data, None)
+
+def encrypt_data(plaintext: str, key: bytes) -> str:
+    return urlsafe_b64encode(encrypt_bytes(plaintext.encode('utf-8'), key)).decode('utf-8')
 
 def decrypt_data(encrypted_text: str, key: bytes) -> str:
     try:
@@ -98,5 +110,132 @@ def decrypt_data(encrypted_text: str, key: bytes) -> str:
         plaintext = decryptor.update(ciphertext) + decryptor.finalize()
         return plaintext.decode('utf-8')
     except Exception as e:
-        print(f"解密失败: {e}")
+        logger.warning("解密失败: %r", e)
+        raise ValueError("解密失败，可能是密钥不匹配或数据损坏。") from e
+
+# --- 批量解密 ---
+# 一个 AESGCM 上下文可以在多个密文之间复用，cryptography 在 C 层执行解密时会释放 GIL，
+# 因此大页面可以分摊到线程池中并行处理。
+
+_decrypt_workers = settings.DIARY_DECRYPT_WORKERS or (os.cpu_count() or 1)
+_decrypt_executor: Optional[ThreadPoolExecutor] = None
+_decrypt_executor_lock = threading.Lock()
+
+def _get_decrypt_executor() -> ThreadPoolExecutor:
+    global _decrypt_executor
+    if _decrypt_executor is None:
+        with _decrypt_executor_lock:
+            if _decrypt_executor is None:
+                _decrypt_executor = ThreadPoolExecutor(max_workers=_decrypt_workers, thread_name_prefix="diary-decrypt")
+    return _decrypt_executor
+
+def _decrypt_chunk(aesgcm: AESGCM, payloads: list) -> List[bytes]:
+    results = []
+    for payload in payloads:
+        if isinstance(payload, str):
+            payload = urlsafe_b64decode(payload)
+        combined_data = memoryview(payload)
+        results.append(aesgcm.decrypt(combined_data[:12], combined_data[12:], None))
+    return results
+
+def decrypt_batch_bytes(payloads: list, key: bytes, parallel: Optional[bool] = None) -> List[bytes]:
+    """
+    用同一个密钥批量解密，结果顺序与输入一致。
+    payloads 的元素可以是 base64 文本或 iv + 密文 + tag 的二进制。
+    parallel 为 None 时，仅当总密文大小超过 DIARY_PARALLEL_DECRYPT_MIN_BYTES 才使用线程池。
+    任意一条解密失败都会抛出 ValueError，与 decrypt_data 行为一致。
+    """
+    if not payloads:
+        return []
+    aesgcm = AESGCM(key)
+    if parallel is None:
+        parallel = sum(len(payload) for payload in payloads) >= settings.DIARY_PARALLEL_DECRYPT_MIN_BYTES
+    try:
+        if not parallel or len(payloads) == 1:
+            return _decrypt_chunk(aesgcm, payloads)
+
+        executor = _get_decrypt_executor()
+        chunk_count = min(_decrypt_workers, len(payloads))
+        chunk_size = -(-len(payloads) // chunk_count)
+        futures = [
+            executor.submit(_decrypt_chunk, aesgcm, payloads[i:i + chunk_size])
+            for i in range(0, len(payloads), chunk_size)
+        ]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+    except (InvalidTag, ValueError) as e:
+        logger.warning("批量解密失败: %r", e)
         raise ValueError("解密失败，可能是密钥不匹配或数据损坏。")
+
+def decrypt_batch(encrypted_texts: List[str], key: bytes, parallel: Optional[bool] = None) -> List[str]:
+    """批量解密 encrypt_data 生成的 base64 密文，返回明文字符串列表"""
+    try:
+        return [data.decode('utf-8') for data in decrypt_batch_bytes(encrypted_texts, key, parallel)]
+    except UnicodeDecodeError:
+        raise ValueError("解密失败，可能是密钥不匹配或数据损坏。")
+
+# --- 信封加密 (Envelope Encryption) ---
+# 每个用户拥有一个随机生成的数据加密密钥 (DEK)，日记内容用 DEK 加密；
+# DEK 本身由服务端的 KEK 包裹后存储在 diary_keys 表中。
+# 轮换 KEK 只需重新包裹 DEK，而无需重写任何日记密文。
+
+@lru_cache(maxsize=16)
+def get_kek(kek_id: str) -> bytes:
+    """
+    根据 kek_id 获取 KEK。KEK 必须通过 DIARY_KEK / DIARY_RETIRED_KEKS 单独配置，
+    不再由 SECRET_KEY 派生：轮换 JWT 签名密钥不能影响已包裹的 DEK。
+    """
+    if kek_id == settings.DIARY_KEK_ID:
+        material = settings.DIARY_KEK
+    elif kek_id in settings.DIARY_RETIRED_KEKS:
+        material = settings.DIARY_RETIRED_KEKS[kek_id]
+    else:
+        raise ValueError(f"未知的 KEK: {kek_id}")
+
+    if not material:
+        raise ValueError(f"未配置 KEK {kek_id}：请设置 DIARY_KEK (python -m scripts.diary_keys generate-kek 生成)。")
+    kek = urlsafe_b64decode(material.encode('utf-8'))
+    if len(kek) != 32:
+        raise ValueError("KEK 必须是 32 字节的 urlsafe base64 编码字符串。")
+    return kek
+
+def check_kek_config():
+    """启动时校验当前 KEK 与保留的旧 KEK 均已配置且格式正确，否则抛出 RuntimeError"""
+    for kek_id in [settings.DIARY_KEK_ID, *settings.DIARY_RETIRED_KEKS]:
+        try:
+            get_kek(kek_id)
+        except ValueError as e:
+            raise RuntimeError(f"日记加密配置错误：{e}")
+
+def derive_legacy_kek(secret_key: str, kek_id: str) -> bytes:
+    """
+    旧版本在未配置 DIARY_KEK 时由 SECRET_KEY 通过 HKDF 派生 KEK。
+    仅供 scripts.diary_keys legacy-kek 导出，用于把这些 KEK 显式配置下来。
+    """
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=f"taskdiary-diary-kek:{kek_id}".encode('utf-8'),
+        backend=default_backend()
+    )
+    return hkdf.derive(secret_key.encode('utf-8'))
+
+def generate_data_key() -> bytes:
+    return secrets.token_bytes(32)
+
+def wrap_data_key(data_key: bytes, kek_id: Optional[str] = None) -> tuple:
+    """用 KEK 包裹 DEK，返回 (包裹后的密钥, kek_id)。"""
+    kek_id = kek_id or settings.DIARY_KEK_ID
+    wrapped = aes_key_wrap(get_kek(kek_id), data_key, backend=default_backend())
+    return urlsafe_b64encode(wrapped).decode('utf-8'), kek_id
+
+def unwrap_data_key(wrapped_key: str, kek_id: str) -> bytes:
+    try:
+        return aes_key_unwrap(
+            get_kek(kek_id), urlsafe_b64decode(wrapped_key.encode('utf-8')), backend=default_backend()
+        )
+    except InvalidUnwrap:
+        raise ValueError("数据密钥解包失败，可能是 KEK 配置错误。")
@@ -0,0 +1,190 @@
+# backend/app/core/tokens.py
+"""
+访问令牌与刷新令牌的签发和校验。
+
+- 签名密钥只构造一次 (jwk Key 对象)，签发和校验都直接使用，不再每次解析 SECRET_KEY；
+- 校验通过的声明按令牌的 SHA-256 缓存在进程内 (LRU，TOKEN_CACHE_MAX_ENTRIES 条)，缓存到令牌过期，
+  同一令牌的后续请求不再解码和验签；
+- 吊销：jti 记录在 revoked_tokens 表中，每个 worker 在内存中保存未过期的已吊销 jti 集合
+  (每个 16 字节)，后台线程每 TOKEN_REVOCATION_REFRESH_INTERVAL 秒读取一次吊销代数，
+  变化时才重新加载。本 worker 吊销的令牌立即生效，其他 worker 最多延迟一个刷新间隔。
+
+访问令牌 (typ=access) 有效期 ACCESS_TOKEN_EXPIRE_MINUTES 分钟；刷新令牌 (typ=refresh)
+有效期 REFRESH_TOKEN_EXPIRE_DAYS 天，只能使用一次，每次刷新换发新的一对令牌。
+没有 typ / jti 的旧令牌按访问令牌处理，无法单独吊销，到期后自然失效。
+"""
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+from jose import JWTError, jwk, jwt
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.cache import MemoryCacheBackend
+from app.core.config import settings
+from app.database import engine
+from app.crud import tokens as crud_tokens
+
+logger = logging.getLogger(__name__)
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+class TokenError(Exception):
+    """令牌无效、已过期、类型不符或已被吊销"""
+
+@dataclass(frozen=True)
+class TokenClaims:
+    subject: str
+    token_type: str
+    jti: Optional[str]
+    expires_at: datetime
+
+@lru_cache(maxsize=1)
+def _signing_key():
+    return jwk.construct(settings.SECRET_KEY, settings.ALGORITHM)
+
+def _create_token(subject: str, token_type: str, expires_delta: timedelta) -> str:
+    now = datetime.now(timezone.utc)
+    claims = {
+        "sub": subject,
+        "typ": token_type,
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": now + expires_delta,
+    }
+    return jwt.encode(claims, _signing_key(), algorithm=settings.ALGORITHM)
+
+def create_access_token(subject: str) -> str:
+    return _create_token(subject, ACCESS, timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+
+def create_refresh_token(subject: str) -> str:
+    return _create_token(subject, REFRESH, timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
+
+def create_token_pair(subject: str) -> dict:
+    """登录和刷新的响应：一对新的访问令牌和刷新令牌"""
+    return {
+        "access_token": create_access_token(subject),
+        "refresh_token": create_refresh_token(subject),
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+# 值直接保存 TokenClaims 对象 (进程内缓存，不需要序列化)
+_claims_cache = MemoryCacheBackend(max_entries=settings.TOKEN_CACHE_MAX_ENTRIES)
+
+def _decode(token: str) -> TokenClaims:
+    try:
+        payload = jwt.decode(token, _signing_key(), algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise TokenError("无法验证凭据")
+    subject, expires_at = payload.get("sub"), payload.get("exp")
+    if not isinstance(subject, str) or not isinstance(expires_at, (int, float)):
+        raise TokenError("无法验证凭据")
+    return TokenClaims(
+        subject=subject,
+        token_type=payload.get("typ") or ACCESS,
+        jti=payload.get("jti"),
+        expires_at=datetime.fromtimestamp(expires_at, timezone.utc),
+    )
+
+def verify_token(token: str, token_type: str = ACCESS) -> TokenClaims:
+    """校验令牌并返回声明；无效、类型不符或已吊销时抛出 TokenError"""
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    claims = _claims_cache.get(key)
+    if claims is None:
+        claims = _decode(token)
+        ttl = (claims.expires_at - datetime.now(timezone.utc)).total_seconds()
+        if ttl > 0:
+            _claims_cache.set(key, claims, ttl)
+    if claims.token_type != token_type:
+        raise TokenError("令牌类型不正确")
+    if revocation_list.is_revoked(claims.jti):
+        raise TokenError("令牌已失效")
+    return claims
+
+def revoke(db: Session, claims: TokenClaims, owner_id: Optional[int]) -> bool:
+    """
+    吊销令牌并立即在本 worker 生效。返回 False 表示该令牌此前已被吊销
+    (用于保证刷新令牌只能使用一次：并发的两次刷新只有一次成功)。
+    """
+    if claims.jti is None:
+        return True
+    revoked = crud_tokens.revoke_token(db, claims.jti, owner_id, claims.expires_at)
+    revocation_list.add(claims.jti)
+    return revoked
+
+class RevocationList:
+    """
+    已吊销且未过期的 jti 集合 (16 字节的二进制)。第一次查询时同步加载并启动后台刷新线程，
+    之后请求路径上只有一次集合查找，不访问数据库。
+    """
+
+    def __init__(self, session_factory, interval: float):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.generation: Optional[int] = None
+        self._revoked: set = set()
+        # 重新加载期间本 worker 新吊销的 jti，替换集合时合并进去，避免被旧的查询结果覆盖
+        self._added_during_load: set = set()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self.generation is None:
+                self.refresh()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="token-revocation", daemon=True)
+                self._thread.start()
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if jti is None:
+            return False
+        self._ensure_started()
+        try:
+            return bytes.fromhex(jti) in self._revoked
+        except ValueError:
+            return False
+
+    def add(self, jti: str):
+        value = bytes.fromhex(jti)
+        with self._lock:
+            self._revoked.add(value)
+            self._added_during_load.add(value)
+
+    def refresh(self, force: bool = False):
+        """吊销代数变化 (或 force) 时从数据库重新加载集合，顺带丢弃已过期的 jti"""
+        db = self.session_factory()
+        try:
+            generation = crud_tokens.get_revocation_generation(db)
+            if generation == self.generation and not force:
+                return
+            with self._lock:
+                self._added_during_load = set()
+            loaded = {bytes.fromhex(jti) for jti in crud_tokens.get_revoked_jtis(db)}
+        finally:
+            db.close()
+        with self._lock:
+            self._revoked = loaded | self._added_during_load
+            self.generation = generation
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception:
+                logger.warning("刷新令牌吊销列表失败，%s 秒后重试", self.interval, exc_info=True)
+
+revocation_list = RevocationList(
+    sessionmaker(autocommit=False, autoflush=False, bind=engine),
+    interval=settings.TOKEN_REVOCATION_REFRESH_INTERVAL,
+)
@@ -0,0 +1,129 @@
+# backend/app/crud/audit.py
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.models import AuditLog, AuditChainHead
+from app.crud.projection import model_columns
+
+# 链上第一条日志的 prev_hash
+GENESIS_HASH = "0" * 64
+_HEAD_ID = 1
+# 参与哈希的内容字段
+_ENTRY_FIELDS = ["owner_id", "object_type", "object_id", "action", "changes", "created_at"]
+
+def _timestamp(value: datetime) -> str:
+    """参与哈希的时间统一为 UTC 文本；SQLite 读出的时间是 naive 的 (按 UTC 存储)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+def compute_hash(entry_id: int, prev_hash: str, entry: dict) -> str:
+    """一条日志的 hash：覆盖序号、上一条的 hash 以及全部内容字段"""
+    payload = json.dumps(
+        [
+            entry_id, prev_hash, _timestamp(entry["created_at"]), entry["owner_id"],
+            entry["object_type"], entry["object_id"], entry["action"], entry["changes"]
+        ],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _reserve_ids(db: Session, count: int):
+    """
+    锁定链头并预留 count 个连续序号，返回 (第一个序号, 上一条的 hash)。
+    先 UPDATE 再读取：UPDATE 取得行锁 (SQLite 上为写锁)，其他进程的写入方在此排队，
+    读到的链头一定是最新的。链头不存在时先单独提交初始行 (并发插入冲突时忽略) 再重试。
+    """
+    reserve = update(AuditChainHead).where(AuditChainHead.id == _HEAD_ID).values(
+        last_id=AuditChainHead.last_id + count
+    )
+    while db.execute(reserve).rowcount == 0:
+        db.rollback()
+        try:
+            db.execute(insert(AuditChainHead).values(id=_HEAD_ID, last_id=0, last_hash=GENESIS_HASH))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+    last_id, last_hash = db.execute(
+        select(AuditChainHead.last_id, AuditChainHead.last_hash).where(AuditChainHead.id == _HEAD_ID)
+    ).one()
+    return last_id - count + 1, last_hash
+
+def append_audit_entries(db: Session, entries: List[dict]) -> int:
+    """
+    在一个事务中把一批变更追加到哈希链并提交，返回写入的条数。
+    entries 的每一项包含 owner_id / object_type / object_id / action / changes (JSON 文本) / created_at。
+    """
+    if not entries:
+        return 0
+    first_id, prev_hash = _reserve_ids(db, len(entries))
+    rows = []
+    for offset, entry in enumerate(entries):
+        entry_id = first_id + offset
+        entry_hash = compute_hash(entry_id, prev_hash, entry)
+        rows.append({**entry, "id": entry_id, "prev_hash": prev_hash, "hash": entry_hash})
+        prev_hash = entry_hash
+    db.execute(insert(AuditLog), rows)
+    db.execute(update(AuditChainHead).where(AuditChainHead.id == _HEAD_ID).values(last_hash=prev_hash))
+    db.commit()
+    return len(rows)
+
+def get_audit_log(
+    db: Session,
+    user_id: Optional[int] = None,
+    object_type: Optional[str] = None,
+    object_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = 100
+) -> list:
+    """按用户和/或对象查询变更记录，按序号倒序；before_id 用于向前翻页 (键集分页)"""
+    query = db.query(AuditLog)
+    if user_id is not None:
+        query = query.filter(AuditLog.owner_id == user_id)
+    if object_type is not None:
+        query = query.filter(AuditLog.object_type == object_type)
+    if object_id is not None:
+        query = query.filter(AuditLog.object_id == object_id)
+    if before_id is not None:
+        query = query.filter(AuditLog.id < before_id)
+    return query.order_by(AuditLog.id.desc()).limit(limit).all()
+
+def load_changes(changes: Optional[str]):
+    return json.loads(changes) if changes else None
+
+def verify_audit_chain(db: Session, batch_size: int = 1000) -> dict:
+    """
+    从头重新计算整条哈希链。返回 {"checked", "valid", "broken_at", "reason"}；
+    broken_at 为第一条校验失败的日志序号 (末尾被截断时为链头记录的序号)。
+    """
+    expected_id, prev_hash, checked = 1, GENESIS_HASH, 0
+
+    def broken(entry_id, reason):
+        return {"checked": checked, "valid": False, "broken_at": entry_id, "reason": reason}
+
+    while True:
+        batch = db.query(*model_columns(AuditLog, ["id", "prev_hash", "hash"] + _ENTRY_FIELDS)).filter(
+            AuditLog.id >= expected_id
+        ).order_by(AuditLog.id).limit(batch_size).all()
+        for row in batch:
+            if row.id != expected_id:
+                return broken(expected_id, "缺少日志")
+            if row.prev_hash != prev_hash:
+                return broken(row.id, "prev_hash 与上一条不一致")
+            if compute_hash(row.id, row.prev_hash, row._mapping) != row.hash:
+                return broken(row.id, "内容与 hash 不一致")
+            prev_hash = row.hash
+            expected_id += 1
+            checked += 1
+        if len(batch) < batch_size:
+            break
+
+    head = db.query(AuditChainHead).filter(AuditChainHead.id == _HEAD_ID).first()
+    last_id, last_hash = (head.last_id, head.last_hash) if head else (0, GENESIS_HASH)
+    if last_id != checked or last_hash != prev_hash:
+        return broken(last_id, "日志末尾与链头不一致 (可能被截断)")
+    return {"checked": checked, "valid": True, "broken_at": None, "reason": None}
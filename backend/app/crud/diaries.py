@@ -1,28 +1,134 @@
 # backend/app/crud/diaries.py
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from app.models.models import Diary, User
-from app.schemas.schemas import DiaryCreate, DiaryUpdate
-from app.core.security import encrypt_data, decrypt_data, get_key_from_password_hash_and_salt
-from datetime import datetime
-from typing import List, Optional
+from app.schemas.schemas import DiaryCreate, DiaryUpdate, DiaryPatch
+from app.core.config import settings
+from app.core.security import encrypt_bytes, decrypt_batch_bytes
+from app.core.compression import maybe_compress, decompress
+from app.core.cache import cache
+from app.core import audit
+from app.crud.diary_keys import DiaryKeyRing
+from app.crud.projection import resolve_fields, to_partial_dicts, model_columns, LeanRow
+from app.crud.versioning import check_version, patch_owned_row
+import logging
+from base64 import urlsafe_b64encode
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Union
+
+logger = logging.getLogger(__name__)
+
+# 列表接口允许投影的字段，以及 view=summary 时返回的字段
+DIARY_LIST_FIELDS = [
+    "id", "owner_id", "title", "content", "preview", "is_encrypted",
+    "entry_date", "daily_rating", "version", "created_at", "updated_at"
+]
+DIARY_SUMMARY_FIELDS = [
+    "id", "owner_id", "title", "preview", "is_encrypted",
+    "entry_date", "daily_rating", "created_at", "updated_at"
+]
+# 按用户 ID 缓存日记统计，日记的任何写操作都会使其失效
+diary_stats_cache = cache.namespace("diary_stats")
+
+# 呈现 content 时依赖的存储列
+_CONTENT_STORAGE_FIELDS = ["content", "content_blob", "content_codec", "key_id", "is_encrypted"]
+# 统计只需要这些列
+_STATS_FIELDS = ["id", "entry_date", "daily_rating"] + _CONTENT_STORAGE_FIELDS
+
+class DiaryRow(LeanRow):
+    """列表和统计使用的只读日记行，content 可直接替换为呈现内容而不影响会话"""
+    __slots__ = tuple(dict.fromkeys(DIARY_LIST_FIELDS + _CONTENT_STORAGE_FIELDS))
+
+def make_preview(plaintext: str) -> str:
+    """截取明文开头作为摘要，合并连续空白"""
+    return " ".join(plaintext[:settings.DIARY_PREVIEW_LENGTH * 2].split())[:settings.DIARY_PREVIEW_LENGTH].rstrip()
+
+def pack_diary_content(plaintext: str, key: Optional[bytes] = None) -> dict:
+    """
+    将明文编码为存储形式，返回可直接赋值给 Diary 的 content / content_blob / content_codec / preview。
+    先压缩再加密；DIARY_BINARY_STORAGE 关闭时密文以 base64 文本存储，明文不压缩。
+    """
+    preview = make_preview(plaintext) if key is None else None
+    if key is None and not settings.DIARY_BINARY_STORAGE:
+        return {"content": plaintext, "content_blob": None, "content_codec": None, "preview": preview}
+
+    codec, data = maybe_compress(plaintext.encode('utf-8'))
+    if key is not None:
+        data = encrypt_bytes(data, key)
+    elif codec is None:
+        # 明文太短或不可压缩，保持文本存储便于直接查询
+        return {"content": plaintext, "content_blob": None, "content_codec": None, "preview": preview}
+
+    if settings.DIARY_BINARY_STORAGE:
+        return {"content": "", "content_blob": data, "content_codec": codec, "preview": preview}
+    return {
+        "content": urlsafe_b64encode(data).decode('utf-8'),
+        "content_blob": None,
+        "content_codec": codec,
+        "preview": preview
+    }
+
+def unpack_diary_contents(
+    diaries: List[Diary], keyring: Optional[DiaryKeyRing] = None, decrypt: bool = True
+) -> Dict[int, str]:
+    """
+    返回 {日记ID: 对外呈现的内容}。
+    未加密日记总是返回明文；加密日记在 decrypt 为 True 时按 key_id 分组批量解密，
+    否则返回 base64 密文 (与旧版存储格式一致)。
+    """
+    contents = {}
+    groups: Dict[Optional[int], List[Diary]] = {}
+    for diary in diaries:
+        if diary.is_encrypted:
+            if decrypt:
+                groups.setdefault(diary.key_id, []).append(diary)
+            elif diary.content_blob is not None:
+                contents[diary.id] = urlsafe_b64encode(diary.content_blob).decode('utf-8')
+            else:
+                contents[diary.id] = diary.content
+        elif diary.content_blob is not None:
+            contents[diary.id] = decompress(diary.content_blob, diary.content_codec).decode('utf-8')
+        else:
+            contents[diary.id] = diary.content
+
+    for key_id, group in groups.items():
+        payloads = [diary.content_blob if diary.content_blob is not None else diary.content for diary in group]
+        for diary, data in zip(group, decrypt_batch_bytes(payloads, keyring.get(key_id))):
+            contents[diary.id] = decompress(data, diary.content_codec).decode('utf-8')
+    return contents
+
+def _present_diaries(diaries: List[Diary], keyring: Optional[DiaryKeyRing] = None, decrypt: bool = False):
+    """
+    用对外呈现的内容替换 content 属性。
+    使用 set_committed_value，不会把明文标记为待写入的修改。
+    """
+    contents = unpack_diary_contents(diaries, keyring, decrypt)
+    for diary in diaries:
+        set_committed_value(diary, 'content', contents[diary.id])
+
+class DuplicateEntryDate(Exception):
+    """同一用户在该日期已有未删除的日记 (uq_diaries_owner_entry_date_live)"""
+    def __init__(self):
+        super().__init__("该日期已有日记")
+
+def _commit_diary(db: Session):
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise DuplicateEntryDate()
 
 def get_diary(db: Session, diary_id: int, user_id: int, decrypt: bool = False):
     """
     根据日记ID和用户ID获取日记。
     如果 decrypt 为 True 且日记已加密，则解密内容。
     """
-    db_diary = db.query(Diary).filter(Diary.id == diary_id, Diary.owner_id == user_id).first()
-    if db_diary and decrypt and db_diary.is_encrypted:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return None # 用户不存在，无法解密
-
-        # 注意: 这里的密钥派生应使用用户的登录密码，
-        # 但为简化示例，这里使用用户的 hashed_password 和 diary_encryption_salt
-        # 作为派生密钥的输入，这在实际中需要更安全的处理方式。
-        # 最好的做法是客户端发送密码解密，或者用户提供一个单独的加密密码。
-        key = get_key_from_password_hash_and_salt(user.hashed_password, user.diary_encryption_salt)
-        db_diary.content = decrypt_data(db_diary.content, key)
+    db_diary = db.query(Diary).filter(Diary.id == diary_id, Diary.owner_id == user_id, Diary.deleted_at.is_(None)).first()
+    if db_diary:
+        # 新日记使用信封加密的数据密钥 (key_id)；
+        # key_id 为空的旧日记仍使用 hashed_password + diary_encryption_salt 派生的密钥。
+        _present_diaries([db_diary], DiaryKeyRing(db, user_id), decrypt=decrypt)
     return db_diary
 
 def get_diaries(
@@ -32,13 +138,25 @@ def get_diaries(
     limit: int = 100,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    decrypt: bool = False
-) -> List[Diary]:
+    decrypt: bool = False,
+    fields: Optional[List[str]] = None,
+    view: Optional[str] = None
+) -> Union[List[DiaryRow], List[dict]]:
     """
     获取用户的日记列表，支持日期范围过滤。
     如果 decrypt 为 True 且日记已加密，则解密内容。
+    返回只读的 DiaryRow / Row 而不是 ORM 对象；
+    指定 fields 或 view="summary" 时只查询所需的列，返回只含这些字段的字典列表；
+    未请求 content 时不会读取或解密内容。
     """
-    query = db.query(Diary).filter(Diary.owner_id == user_id)
+    columns = resolve_fields(fields, view, DIARY_LIST_FIELDS, DIARY_SUMMARY_FIELDS)
+    present = columns is None or "content" in columns
+    load_columns = DIARY_LIST_FIELDS if columns is None else columns
+    if present:
+        load_columns = list(dict.fromkeys(load_columns + _CONTENT_STORAGE_FIELDS))
+
+    # 只读列表按列元组查询，不构造 ORM 对象
+    query = db.query(*model_columns(Diary, load_columns)).filter(Diary.owner_id == user_id, Diary.deleted_at.is_(None))
     if start_date:
         query = query.filter(Diary.entry_date >= start_date)
     if end_date:
@@ -46,81 +164,81 @@ def get_diaries(
 
     diaries = query.offset(skip).limit(limit).all()
 
-    if decrypt:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return [] # 用户不存在，无法解密
-
-        key = get_key_from_password_hash_and_salt(user.hashed_password, user.diary_encryption_salt)
+    if present:
+        diaries = [DiaryRow(row) for row in diaries]
+        contents = unpack_diary_contents(diaries, DiaryKeyRing(db, user_id), decrypt=decrypt)
         for diary in diaries:
-            if diary.is_encrypted:
-                diary.content = decrypt_data(diary.content, key)
-    return diaries
+            diary.content = contents[diary.id]
+    if columns is None:
+        return diaries
+    return to_partial_dicts(diaries, columns)
 
 def create_user_diary(db: Session, diary: DiaryCreate, user_id: int):
     """
     为指定用户创建新日记。
     如果日记被标记为加密，则在保存前加密内容。
     """
-    content_to_save = diary.content
+    key_id, key = None, None
     if diary.is_encrypted:
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
             raise ValueError("User not found for encryption.")
-        key = get_key_from_password_hash_and_salt(user.hashed_password, user.diary_encryption_salt)
-        content_to_save = encrypt_data(diary.content, key)
+        key_id, key = DiaryKeyRing(db, user_id).active()
 
     db_diary = Diary(
         title=diary.title,
-        content=content_to_save,
+        **pack_diary_content(diary.content, key),
         is_encrypted=diary.is_encrypted,
         entry_date=diary.entry_date,
         daily_rating=diary.daily_rating,
-        owner_id=user_id
+        owner_id=user_id,
+        key_id=key_id
     )
     db.add(db_diary)
-    db.commit()
+    _commit_diary(db)
+    diary_stats_cache.invalidate(user_id)
     db.refresh(db_diary)
+    _present_diaries([db_diary])
     return db_diary
 
-def update_diary(db: Session, diary_id: int, diary_update: DiaryUpdate, user_id: int):
+def update_diary(
+    db: Session, diary_id: int, diary_update: DiaryUpdate, user_id: int, expected_version: Optional[int] = None
+):
     """
     更新指定日记。
-    确保只有日记所有者才能更新。
+    确保只有日记所有者才能更新。指定 expected_version 时版本不一致会抛出 VersionConflict。
     如果内容或加密状态改变，重新加密。
     """
-    db_diary = db.query(Diary).filter(Diary.id == diary_id, Diary.owner_id == user_id).first()
+    db_diary = db.query(Diary).filter(Diary.id == diary_id, Diary.owner_id == user_id, Diary.deleted_at.is_(None)).first()
     if db_diary:
+        check_version(db_diary, expected_version)
         update_data = diary_update.model_dump(exclude_unset=True)
+        update_data.pop('version', None)
+        db_diary.version = (db_diary.version or 1) + 1
 
         # 处理内容和加密状态的更新
         if 'content' in update_data or 'is_encrypted' in update_data:
             current_is_encrypted = update_data.get('is_encrypted', db_diary.is_encrypted)
-            new_content = update_data.get('content', db_diary.content)
 
             user = db.query(User).filter(User.id == user_id).first()
             if not user:
                 raise ValueError("User not found for encryption/decryption during update.")
-            key = get_key_from_password_hash_and_salt(user.hashed_password, user.diary_encryption_salt)
-
-            if current_is_encrypted:
-                # 如果要加密或保持加密状态
-                # 如果新内容是明文（例如从客户端传来），先解密旧内容（如果旧的是密文）然后加密新内容
-                # 简化处理：如果内容有变化且最终是加密的，就直接加密新内容
-                if db_diary.is_encrypted and 'content' in update_data:
-                    # 如果旧的是加密的，且提供了新内容，需要确保新内容是明文，然后加密
-                    # 更好的做法是前端处理明文/密文切换逻辑
-                    pass # 不做解密，假定传入的新content是明文
-
-                db_diary.content = encrypt_data(new_content, key)
-            else:
-                # 如果要解密或保持不加密状态
-                if db_diary.is_encrypted and 'content' not in update_data:
-                    # 如果旧的是加密的，但现在要不加密，且没提供新内容，则需要解密旧内容
-                    db_diary.content = decrypt_data(db_diary.content, key)
-                elif 'content' in update_data:
-                    # 如果有新内容且不加密，直接使用新内容
-                    db_diary.content = new_content
+            keyring = DiaryKeyRing(db, user_id)
+
+            # 假定传入的新 content 是明文 (明文/密文切换逻辑最好由前端处理)
+            new_content = update_data.get('content')
+            if new_content is None and current_is_encrypted != db_diary.is_encrypted:
+                # 只切换加密状态：取出旧内容的明文，按新状态重新存储
+                new_content = unpack_diary_contents([db_diary], keyring)[db_diary.id]
+
+            if new_content is not None:
+                if current_is_encrypted:
+                    # 重新加密时一律使用当前活动的数据密钥
+                    db_diary.key_id, key = keyring.active()
+                else:
+                    db_diary.key_id, key = None, None
+                for field, value in pack_diary_content(new_content, key).items():
+                    setattr(db_diary, field, value)
             db_diary.is_encrypted = current_is_encrypted
             update_data.pop('content', None) # 避免重复设置
             update_data.pop('is_encrypted', None)
@@ -130,27 +248,74 @@ def update_diary(db: Session, diary_id: int, diary_update: DiaryUpdate, user_id:
             setattr(db_diary, key, value)
 
         db.add(db_diary)
-        db.commit()
+        _commit_diary(db)
+        diary_stats_cache.invalidate(user_id)
         db.refresh(db_diary)
+        _present_diaries([db_diary])
     return db_diary
 
-def delete_diary(db: Session, diary_id: int, user_id: int):
+def patch_diary(db: Session, diary_id: int, user_id: int, diary_patch: DiaryPatch):
     """
-    删除指定日记。
+    部分更新日记：只改标题、日期、评级时执行单条 UPDATE ... RETURNING，不读取和解密内容。
+    diary_patch.version 为客户端读取到的版本号，不一致时抛出 VersionConflict。
+    修改内容或加密状态需要重新编码/加密，这类修改走 update_diary。
+    日记不存在时返回 None，否则返回与 update_diary 相同形式的日记 (字典)。
+    """
+    update_data = diary_patch.model_dump(exclude_unset=True)
+    expected_version = update_data.pop('version', None)
+    if 'content' in update_data or 'is_encrypted' in update_data:
+        return update_diary(db, diary_id, diary_patch, user_id, expected_version=expected_version)
+
+    try:
+        row = patch_owned_row(db, Diary, diary_id, user_id, update_data, expected_version)
+    except IntegrityError:
+        db.rollback()
+        raise DuplicateEntryDate()
+    if row is None:
+        return None
+    diary_stats_cache.invalidate(user_id)
+    return {**row._mapping, "content": unpack_diary_contents([row], decrypt=False)[row.id]}
+
+def delete_diary(db: Session, diary_id: int, user_id: int) -> int:
+    """
+    软删除指定日记：单条 UPDATE 写入 deleted_at，返回受影响的行数 (0 表示不存在或无权删除)。
     确保只有日记所有者才能删除。
     """
-    db_diary = db.query(Diary).filter(Diary.id == diary_id, Diary.owner_id == user_id).first()
-    if db_diary:
-        db.delete(db_diary)
-        db.commit()
-    return db_diary
+    deleted = db.query(Diary).filter(
+        Diary.id == diary_id, Diary.owner_id == user_id, Diary.deleted_at.is_(None)
+    ).update({Diary.deleted_at: datetime.now(timezone.utc)}, synchronize_session=False)
+    if deleted:
+        audit.record(db, Diary, audit.DELETE, diary_id, user_id)
+    db.commit()
+    if deleted:
+        diary_stats_cache.invalidate(user_id)
+    return deleted
+
+def get_deleted_diaries(db: Session, user_id: int, since: Optional[datetime] = None, limit: int = 1000):
+    """返回 since 之后删除的日记墓碑 (id, deleted_at)，供客户端同步和缓存失效使用"""
+    query = db.query(Diary.id, Diary.deleted_at).filter(Diary.owner_id == user_id, Diary.deleted_at.isnot(None))
+    if since is not None:
+        query = query.filter(Diary.deleted_at > since)
+    return query.order_by(Diary.deleted_at, Diary.id).limit(limit).all()
 
 def get_diary_stats(db: Session, user_id: int) -> dict:
+    """获取用户的日记统计信息，优先读缓存"""
+    return diary_stats_cache.get_or_set(user_id, lambda: _compute_diary_stats(db, user_id))
+
+def rebuild_diary_stats(db: Session, user_id: int) -> dict:
+    """重新计算日记统计并写入缓存，由后台作业调用"""
+    stats = _compute_diary_stats(db, user_id)
+    diary_stats_cache.set(user_id, stats)
+    return stats
+
+def _compute_diary_stats(db: Session, user_id: int) -> dict:
     """
     计算用户的日记统计信息。
     包括总条目数、总字数、平均字数、打卡频率、日评级分布等。
     """
-    diaries = db.query(Diary).filter(Diary.owner_id == user_id).all()
+    diaries = db.query(*model_columns(Diary, _STATS_FIELDS)).filter(
+        Diary.owner_id == user_id, Diary.deleted_at.is_(None)
+    ).all()
 
     total_entries = len(diaries)
     total_words = 0
@@ -165,15 +330,20 @@ def get_diary_stats(db: Session, user_id: int) -> dict:
     if not user:
         return {} # 用户不存在
 
-    key = get_key_from_password_hash_and_salt(user.hashed_password, user.diary_encryption_salt)
+    keyring = DiaryKeyRing(db, user_id)
+    try:
+        plaintexts = unpack_diary_contents(diaries, keyring)
+    except ValueError:
+        plaintexts = None # 批量解密失败时逐条解密，跳过损坏的条目
 
     for diary in diaries:
-        content_to_count = diary.content
-        if diary.is_encrypted:
+        if plaintexts is not None:
+            content_to_count = plaintexts[diary.id]
+        else:
             try:
-                content_to_count = decrypt_data(diary.content, key)
+                content_to_count = unpack_diary_contents([diary], keyring)[diary.id]
             except Exception as e:
-                print(f"Error decrypting diary {diary.id} for stats: {e}")
+                logger.warning("统计时无法解密日记 %s: %r", diary.id, e)
                 content_to_count = "" # 无法解密则不计入字数
 
         total_words += len(content_to_count.strip().split()) if content_to_count else 0
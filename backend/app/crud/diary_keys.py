@@ -0,0 +1,112 @@
+# backend/app/crud/diary_keys.py
+from sqlalchemy.orm import Session
+from app.models.models import DiaryKey, User
+from app.core.config import settings
+from app.core import audit
+from app.core.security import (
+    generate_data_key, wrap_data_key, unwrap_data_key, get_key_from_password_hash_and_salt
+)
+from typing import Dict, Optional
+
+def get_active_diary_key(db: Session, user_id: int) -> Optional[DiaryKey]:
+    """获取用户当前用于加密新日记的数据密钥 (不存在时返回 None)"""
+    return db.query(DiaryKey).filter(
+        DiaryKey.owner_id == user_id, DiaryKey.is_active == True
+    ).order_by(DiaryKey.version.desc()).first()
+
+def get_or_create_active_diary_key(db: Session, user_id: int) -> DiaryKey:
+    """
+    获取用户的活动数据密钥，不存在时生成一个新的随机 DEK 并用当前 KEK 包裹。
+    只 flush 不 commit，由调用方在同一事务中提交。
+    """
+    diary_key = get_active_diary_key(db, user_id)
+    if diary_key is None:
+        wrapped_key, kek_id = wrap_data_key(generate_data_key())
+        diary_key = DiaryKey(owner_id=user_id, version=1, kek_id=kek_id, wrapped_key=wrapped_key, is_active=True)
+        db.add(diary_key)
+        db.flush()
+    return diary_key
+
+def rotate_user_diary_key(db: Session, user_id: int) -> DiaryKey:
+    """
+    为用户生成新版本的数据密钥。旧密钥保留用于解密历史日记，新日记使用新密钥。
+    """
+    latest = db.query(DiaryKey).filter(DiaryKey.owner_id == user_id).order_by(DiaryKey.version.desc()).first()
+    deactivated = db.query(DiaryKey).filter(DiaryKey.owner_id == user_id, DiaryKey.is_active == True).update(
+        {DiaryKey.is_active: False}, synchronize_session=False
+    )
+    if deactivated:
+        audit.record(db, DiaryKey, audit.UPDATE, None, user_id, {"is_active": False})
+    wrapped_key, kek_id = wrap_data_key(generate_data_key())
+    diary_key = DiaryKey(
+        owner_id=user_id,
+        version=(latest.version + 1) if latest else 1,
+        kek_id=kek_id,
+        wrapped_key=wrapped_key,
+        is_active=True
+    )
+    db.add(diary_key)
+    db.commit()
+    db.refresh(diary_key)
+    return diary_key
+
+def rewrap_diary_keys(db: Session, batch_size: int = 500) -> int:
+    """
+    KEK 轮换：将所有仍由旧 KEK 包裹的 DEK 用当前 KEK 重新包裹。
+    每个用户只有少量 DEK，因此代价与日记条数无关。按批提交，可中断后重新执行。
+    """
+    rewrapped = 0
+    while True:
+        batch = db.query(DiaryKey).filter(DiaryKey.kek_id != settings.DIARY_KEK_ID).order_by(DiaryKey.id).limit(batch_size).all()
+        if not batch:
+            break
+        for diary_key in batch:
+            data_key = unwrap_data_key(diary_key.wrapped_key, diary_key.kek_id)
+            diary_key.wrapped_key, diary_key.kek_id = wrap_data_key(data_key)
+        db.commit()
+        rewrapped += len(batch)
+    return rewrapped
+
+def load_data_key(diary_key: DiaryKey) -> bytes:
+    """解包 DEK，得到可直接用于 AES-GCM 的密钥"""
+    return unwrap_data_key(diary_key.wrapped_key, diary_key.kek_id)
+
+def get_legacy_key(db: Session, user_id: int) -> Optional[bytes]:
+    """旧版密钥：由用户的 hashed_password 和 diary_encryption_salt 通过 PBKDF2 派生"""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        return None
+    return get_key_from_password_hash_and_salt(user.hashed_password, user.diary_encryption_salt)
+
+class DiaryKeyRing:
+    """
+    单次请求内的密钥缓存。
+    按 key_id 解包 DEK，旧版 (key_id 为空) 日记则按需派生一次口令密钥。
+    """
+    def __init__(self, db: Session, user_id: int):
+        self.db = db
+        self.user_id = user_id
+        self._keys: Dict[Optional[int], bytes] = {}
+
+    def get(self, key_id: Optional[int]) -> bytes:
+        if key_id not in self._keys:
+            if key_id is None:
+                key = get_legacy_key(self.db, self.user_id)
+                if key is None:
+                    raise ValueError("User not found for decryption.")
+            else:
+                diary_key = self.db.query(DiaryKey).filter(
+                    DiaryKey.id == key_id, DiaryKey.owner_id == self.user_id
+                ).first()
+                if diary_key is None:
+                    raise ValueError("日记数据密钥不存在。")
+                key = load_data_key(diary_key)
+            self._keys[key_id] = key
+        return self._keys[key_id]
+
+    def active(self) -> tuple:
+        """返回 (活动 DEK 的 key_id, 密钥)，用于加密新内容"""
+        diary_key = get_or_create_active_diary_key(self.db, self.user_id)
+        if diary_key.id not in self._keys:
+            self._keys[diary_key.id] = load_data_key(diary_key)
+        return diary_key.id, self._keys[diary_key.id]
@@ -0,0 +1,151 @@
+# backend/app/crud/job_handlers.py
+"""
+后台作业的处理函数。每个函数在独立的数据库会话 (ctx.db) 中运行，
+按 JOB_BATCH_SIZE 分批处理并提交，每批之后报告进度 (同时检查取消请求)。
+"""
+from typing import List
+from pydantic import BaseModel, Field
+from sqlalchemy import func, literal, or_
+from app.core.config import settings
+from app.core.jobs import JobContext, job_handler
+from app.models.models import Task, ArchivedTask, Diary
+from app.schemas.schemas import TaskCreate, Task as TaskSchema, Diary as DiarySchema
+from app.crud.diaries import pack_diary_content, unpack_diary_contents, rebuild_diary_stats, DiaryRow
+from app.crud.diary_keys import DiaryKeyRing, rotate_user_diary_key
+from app.crud.tasks import build_task, TASK_LIST_FIELDS
+from app.crud.projection import model_columns
+
+def _batches(query, model):
+    """按 id 递增分批读取 query 的结果 (键集分页，不使用 OFFSET)"""
+    last_id = None
+    while True:
+        batch_query = query if last_id is None else query.filter(model.id > last_id)
+        batch = batch_query.order_by(model.id).limit(settings.JOB_BATCH_SIZE).all()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+@job_handler("diary_stats")
+def rebuild_stats(ctx: JobContext, params: dict) -> dict:
+    """重新计算日记统计并刷新缓存"""
+    return rebuild_diary_stats(ctx.db, ctx.user_id)
+
+class ExportParams(BaseModel):
+    include_archived: bool = True
+    # 为 False 时加密日记导出为 base64 密文
+    decrypt: bool = False
+
+@job_handler("export", ExportParams)
+def export_user_data(ctx: JobContext, params: dict) -> dict:
+    """导出用户的全部任务 (含重复系列本身，不展开实例) 和日记"""
+    params = ExportParams.model_validate(params)
+    db, user_id = ctx.db, ctx.user_id
+    # 导出只读，按列元组查询，不在会话中累积 ORM 对象
+    task_queries = [(
+        db.query(*model_columns(Task, TASK_LIST_FIELDS)).filter(Task.owner_id == user_id, Task.deleted_at.is_(None)),
+        Task
+    )]
+    if params.include_archived:
+        task_queries.append((
+            db.query(*model_columns(ArchivedTask, TASK_LIST_FIELDS), literal(True).label("is_archived"))
+            .filter(ArchivedTask.owner_id == user_id),
+            ArchivedTask
+        ))
+    diary_query = db.query(*model_columns(Diary, DiaryRow.__slots__)).filter(
+        Diary.owner_id == user_id, Diary.deleted_at.is_(None)
+    )
+
+    total = sum(query.count() for query, _ in task_queries) + diary_query.count()
+    done = 0
+    tasks, diaries = [], []
+    for query, model in task_queries:
+        for batch in _batches(query, model):
+            tasks.extend(TaskSchema.model_validate(task).model_dump(mode="json") for task in batch)
+            done += len(batch)
+            ctx.progress(done, total, f"已导出 {done}/{total} 项")
+
+    keyring = DiaryKeyRing(db, user_id)
+    for batch in _batches(diary_query, Diary):
+        contents = unpack_diary_contents(batch, keyring, decrypt=params.decrypt)
+        for diary in batch:
+            data = DiarySchema.model_validate(diary).model_dump(mode="json")
+            data["content"] = contents[diary.id]
+            diaries.append(data)
+        done += len(batch)
+        ctx.progress(done, total, f"已导出 {done}/{total} 项")
+    return {"tasks": tasks, "diaries": diaries}
+
+class DiaryReencryptParams(BaseModel):
+    # 为 False 时不生成新密钥，只把仍使用旧密钥的日记迁移到当前活动密钥 (用于续跑被取消的作业)
+    rotate_key: bool = True
+
+@job_handler("diary_reencrypt", DiaryReencryptParams)
+def reencrypt_diaries(ctx: JobContext, params: dict) -> dict:
+    """
+    轮换用户的日记数据密钥，并用新密钥重新加密全部加密日记 (含旧版口令派生密钥加密的日记)。
+    每批提交，被取消时已处理的日记保持新密钥，其余仍可用旧密钥解密。
+    """
+    params = DiaryReencryptParams.model_validate(params)
+    db, user_id = ctx.db, ctx.user_id
+    if params.rotate_key:
+        rotate_user_diary_key(db, user_id)
+    keyring = DiaryKeyRing(db, user_id)
+    active_id, active_key = keyring.active()
+    db.commit()
+
+    pending = db.query(Diary).filter(
+        Diary.owner_id == user_id,
+        Diary.deleted_at.is_(None),
+        Diary.is_encrypted.is_(True),
+        or_(Diary.key_id.is_(None), Diary.key_id != active_id)
+    )
+    total = pending.with_entities(func.count(Diary.id)).scalar()
+    done, failed = 0, 0
+    for batch in _batches(pending, Diary):
+        try:
+            plaintexts = unpack_diary_contents(batch, keyring)
+        except ValueError:
+            # 批量解密失败时逐条解密，跳过无法解密的日记
+            plaintexts = {}
+            for diary in batch:
+                try:
+                    plaintexts.update(unpack_diary_contents([diary], keyring))
+                except ValueError:
+                    failed += 1
+        for diary in batch:
+            if diary.id not in plaintexts:
+                continue
+            for field, value in pack_diary_content(plaintexts[diary.id], active_key).items():
+                setattr(diary, field, value)
+            diary.key_id = active_id
+        db.commit()
+        done += len(batch)
+        ctx.progress(done, total, f"已处理 {done}/{total} 篇")
+    return {"reencrypted": done - failed, "failed": failed, "key_id": active_id}
+
+class TaskImportParams(BaseModel):
+    tasks: List[TaskCreate] = Field(..., max_length=10_000)
+
+@job_handler("task_import", TaskImportParams)
+def import_tasks(ctx: JobContext, params: dict) -> dict:
+    """
+    批量导入任务。先校验全部任务 (任何一项无效时整个作业失败、不写入)，再分批插入。
+    被取消时已提交的批次保留。
+    """
+    params = TaskImportParams.model_validate(params)
+    db_tasks = []
+    for index, task in enumerate(params.tasks, start=1):
+        try:
+            db_tasks.append(build_task(task, ctx.user_id))
+        except ValueError as e:
+            raise ValueError(f"第 {index} 个任务无效: {e}")
+
+    total, created = len(db_tasks), 0
+    for start in range(0, total, settings.JOB_BATCH_SIZE):
+        batch = db_tasks[start:start + settings.JOB_BATCH_SIZE]
+        ctx.db.add_all(batch)
+        ctx.db.commit()
+        created += len(batch)
+        ctx.progress(created, total, f"已导入 {created}/{total} 个任务")
+    return {"created": created}
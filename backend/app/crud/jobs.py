@@ -0,0 +1,179 @@
+# backend/app/crud/jobs.py
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import delete, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import Job, User
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+class JobLimitExceeded(Exception):
+    """用户排队和运行中的作业数已达到 JOB_MAX_ACTIVE_PER_USER"""
+    def __init__(self, limit: int):
+        super().__init__(f"同时进行的作业不能超过 {limit} 个，请等待已有作业结束")
+        self.limit = limit
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _update(db: Session, job_id: str, *conditions, **values) -> int:
+    """UPDATE jobs SET values WHERE id = job_id AND conditions，提交并返回匹配的行数"""
+    updated = db.execute(
+        update(Job).where(Job.id == job_id, *conditions).values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return updated
+
+def stale_cutoff() -> datetime:
+    """心跳早于此时间的运行中作业视为已中断"""
+    return _now() - timedelta(seconds=settings.JOB_STALE_AFTER)
+
+def _is_stale(cutoff: datetime):
+    """运行中且心跳 (尚未写入心跳时为领取时间) 早于 cutoff"""
+    return (Job.status == RUNNING) & (func.coalesce(Job.heartbeat_at, Job.started_at) < cutoff)
+
+def _active_job_count(user_id: int):
+    """排队和运行中的作业数 (标量子查询)，心跳超时 (等待回收) 的作业不计入"""
+    return select(func.count(Job.id)).where(
+        Job.owner_id == user_id, Job.status.in_(ACTIVE_STATUSES), ~_is_stale(stale_cutoff())
+    ).scalar_subquery()
+
+def create_job(db: Session, user_id: int, kind: str, params: Optional[dict] = None) -> Job:
+    """
+    创建排队中的作业；超过每用户并发上限时抛出 JobLimitExceeded。
+    上限检查与插入是同一条 INSERT ... SELECT ... WHERE (活跃作业数) < limit，按影响行数判断是否超限；
+    并发提交时 SQLite 的写锁使其串行执行，PostgreSQL / MySQL 上先以 FOR UPDATE 锁定用户行。
+    """
+    job_id = uuid.uuid4().hex
+    values = {
+        "id": job_id,
+        "owner_id": user_id,
+        "kind": kind,
+        "status": QUEUED,
+        "params": json.dumps(params or {}, ensure_ascii=False),
+    }
+    limit = settings.JOB_MAX_ACTIVE_PER_USER
+    if limit:
+        db.execute(select(User.id).where(User.id == user_id).with_for_update())
+        row = select(*[literal(value, Job.__table__.c[name].type) for name, value in values.items()])
+        row = row.where(_active_job_count(user_id) < limit)
+        inserted = db.execute(insert(Job).from_select(list(values), row)).rowcount
+    else:
+        inserted = db.execute(insert(Job).values(**values)).rowcount
+    db.commit()
+    if not inserted:
+        raise JobLimitExceeded(limit)
+    return get_job(db, job_id)
+
+def get_job(db: Session, job_id: str, user_id: Optional[int] = None) -> Optional[Job]:
+    """获取作业；指定 user_id 时只返回该用户的作业"""
+    query = db.query(Job).filter(Job.id == job_id)
+    if user_id is not None:
+        query = query.filter(Job.owner_id == user_id)
+    return query.first()
+
+def get_jobs(db: Session, user_id: int, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+    """用户最近提交的作业，新的在前"""
+    query = db.query(Job).filter(Job.owner_id == user_id)
+    if status is not None:
+        query = query.filter(Job.status == status)
+    return query.order_by(Job.created_at.desc(), Job.id).limit(limit).all()
+
+def cancel_job(db: Session, job_id: str, user_id: int) -> Optional[Job]:
+    """
+    取消作业：排队中的作业直接标记为 cancelled；
+    运行中的作业只设置 cancel_requested，由作业在下一次报告进度时停止。
+    已结束的作业保持不变。作业不存在时返回 None。
+    """
+    owned = (Job.owner_id == user_id,)
+    if not _update(db, job_id, *owned, Job.status == QUEUED, status=CANCELLED, finished_at=_now()):
+        _update(db, job_id, *owned, Job.status == RUNNING, cancel_requested=True)
+    return get_job(db, job_id, user_id)
+
+def claim_job(db: Session, job_id: str) -> bool:
+    """把排队中的作业标记为运行中；已被其他 worker 领取或已取消时返回 False"""
+    now = _now()
+    return bool(_update(db, job_id, Job.status == QUEUED, status=RUNNING, started_at=now, heartbeat_at=now))
+
+def claim_next_job(db: Session) -> Optional[str]:
+    """按提交顺序领取下一个排队中的作业，返回作业 ID；队列为空时返回 None"""
+    while True:
+        job_id = db.execute(
+            select(Job.id).where(Job.status == QUEUED).order_by(Job.created_at, Job.id).limit(1)
+        ).scalar()
+        db.commit()
+        if job_id is None or claim_job(db, job_id):
+            return job_id
+
+def report_progress(db: Session, job_id: str, progress: int, message: Optional[str] = None) -> bool:
+    """
+    写入进度并更新心跳。单条 UPDATE 同时检查取消请求：
+    作业已被请求取消或已被回收 (不再是 running) 时不写入并返回 False。
+    """
+    values = {"progress": max(0, min(100, progress)), "heartbeat_at": _now()}
+    if message is not None:
+        values["message"] = message
+    return bool(_update(db, job_id, Job.status == RUNNING, Job.cancel_requested.is_(False), **values))
+
+def finish_job(
+    db: Session, job_id: str, status: str, result=None, error: Optional[str] = None, message: Optional[str] = None
+):
+    values = {"status": status, "finished_at": _now(), "error": error}
+    if result is not None:
+        values["result"] = json.dumps(result, ensure_ascii=False)
+    if status == SUCCEEDED:
+        values["progress"] = 100
+    if message is not None:
+        values["message"] = message
+    # 只结束运行中的作业：已被回收 (标记为失败) 的作业保持原状态
+    _update(db, job_id, Job.status == RUNNING, **values)
+
+def fail_stale_jobs(db: Session) -> int:
+    """把心跳超时的运行中作业标记为失败 (执行它的进程已退出)，返回标记的作业数"""
+    failed = db.execute(
+        update(Job).where(_is_stale(stale_cutoff())).values(
+            status=FAILED, finished_at=_now(), error="作业执行中断 (执行它的进程已退出)，请重新提交"
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return failed
+
+def get_queued_job_ids(db: Session, created_before: Optional[datetime] = None) -> List[str]:
+    """排队中的作业 ID (按提交顺序)；created_before 用于只取排队时间较长的作业"""
+    query = select(Job.id).where(Job.status == QUEUED)
+    if created_before is not None:
+        query = query.where(Job.created_at < created_before)
+    ids = db.execute(query.order_by(Job.created_at, Job.id)).scalars().all()
+    db.commit()
+    return ids
+
+def load_json(value: Optional[str]):
+    return json.loads(value) if value else None
+
+def purge_finished_jobs(db: Session, retention_days: Optional[int] = None, batch_size: Optional[int] = None) -> int:
+    """分批物理删除结束超过 JOB_RESULT_RETENTION_DAYS 天的作业 (连同结果)，返回删除的行数"""
+    days = settings.JOB_RESULT_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = _now() - timedelta(days=days)
+    candidates = select(Job.id).where(
+        Job.status.in_(FINISHED_STATUSES), Job.finished_at < cutoff
+    ).limit(batch_size or settings.PURGE_BATCH_SIZE)
+
+    purged = 0
+    while True:
+        ids = db.execute(candidates).scalars().all()
+        if not ids:
+            break
+        db.execute(delete(Job).where(Job.id.in_(ids)).execution_options(synchronize_session=False))
+        db.commit()
+        purged += len(ids)
+    return purged
@@ -1,26 +1,99 @@
 # backend/app/crud/notifications.py
+from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.models.models import NotificationSettings
-from app.schemas.schemas import NotificationSettingsUpdate
-
-def get_notification_settings(db: Session, user_id: int):
-    """获取用户的通知设置"""
-    settings = db.query(NotificationSettings).filter(NotificationSettings.owner_id == user_id).first()
-    if not settings:
-        # 如果用户还没有设置，为他们创建一个空的
-        settings = NotificationSettings(owner_id=user_id)
-        db.add(settings)
-        db.commit()
-        db.refresh(settings)
-    return settings
+from app.models.models import NotificationSettings, NOTIFICATION_CHANNEL_ENABLED
+from app.schemas.schemas import (
+    NotificationSettingsBase, NotificationSettingsUpdate, NotificationSettings as NotificationSettingsSchema
+)
+from app.core.cache import cache
+from app.core import audit
+
+# 按用户 ID 缓存通知设置 (响应模型的字典形式)，更新时写穿
+notification_settings_cache = cache.namespace("notification_settings")
+
+_SETTINGS_COLUMNS = list(NotificationSettings.__table__.columns)
+
+def _to_cache_value(db_settings) -> dict:
+    return NotificationSettingsSchema.model_validate(db_settings).model_dump()
+
+def default_notification_settings(user_id: int) -> dict:
+    """尚未保存过设置的用户的默认值 (全部渠道关闭)，id 为空表示数据库中还没有这一行"""
+    return {"id": None, "owner_id": user_id, **NotificationSettingsBase().model_dump()}
+
+def get_notification_settings(db: Session, user_id: int) -> Optional[NotificationSettings]:
+    """获取用户的通知设置；用户还没有保存过设置时返回 None (只读，不会插入默认行)"""
+    return db.query(NotificationSettings).filter(NotificationSettings.owner_id == user_id).first()
+
+def read_notification_settings(db: Session, user_id: int) -> dict:
+    """读取用户的通知设置，优先读缓存；没有设置时返回默认值"""
+    def load():
+        db_settings = get_notification_settings(db, user_id)
+        return _to_cache_value(db_settings) if db_settings else default_notification_settings(user_id)
+
+    return notification_settings_cache.get_or_set(user_id, load)
+
+def _insert_for(db: Session):
+    """当前数据库方言的 INSERT 构造器，支持 ON CONFLICT / ON DUPLICATE KEY；不支持时返回 None"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+    else:
+        return None
+    return insert
 
 def update_notification_settings(db: Session, user_id: int, settings_update: NotificationSettingsUpdate):
-    """更新用户的通知设置"""
-    db_settings = get_notification_settings(db, user_id)
+    """
+    更新用户的通知设置：单条 INSERT ... ON CONFLICT (owner_id) DO UPDATE，
+    首次保存时插入 (未提供的字段取默认值)，否则只更新请求中提供的字段。
+    并发的首次保存不会再因 owner_id 唯一约束失败。
+    """
     update_data = settings_update.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_settings, key, value)
-    db.add(db_settings)
+    insert = _insert_for(db)
+
+    if insert is None:
+        # 其他数据库退化为先查后写
+        db_settings = get_notification_settings(db, user_id) or NotificationSettings(owner_id=user_id)
+        for key, value in update_data.items():
+            setattr(db_settings, key, value)
+        db.add(db_settings)
+        db.commit()
+        db.refresh(db_settings)
+        value = _to_cache_value(db_settings)
+        notification_settings_cache.set(user_id, value)
+        return value
+
+    statement = insert(NotificationSettings.__table__).values(owner_id=user_id, **update_data)
+    if db.get_bind().dialect.name in ("mysql", "mariadb"):
+        # MySQL 的 upsert 至少要更新一列，空请求时把 owner_id 写回自身
+        statement = statement.on_duplicate_key_update(**update_data or {"owner_id": user_id})
+    elif update_data:
+        statement = statement.on_conflict_do_update(
+            index_elements=[NotificationSettings.owner_id],
+            set_={key: statement.excluded[key] for key in update_data}
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=[NotificationSettings.owner_id])
+    db.execute(statement)
+    row = db.execute(select(*_SETTINGS_COLUMNS).where(NotificationSettings.owner_id == user_id)).first()
+    audit.record(db, NotificationSettings, audit.UPDATE, row.id, user_id, update_data)
     db.commit()
-    db.refresh(db_settings)
-    return db_settings
\ No newline at end of file
+
+    value = _to_cache_value(row)
+    notification_settings_cache.set(user_id, value)
+    return value
+
+def get_users_with_enabled_channels(db: Session, user_ids: Optional[List[int]] = None) -> list:
+    """
+    供提醒投递使用：返回至少开启了一个渠道的用户的通知设置 (只读行)。
+    条件与部分索引 ix_notification_settings_channel_enabled 一致，
+    未开启任何渠道 (或从未保存过设置) 的用户不会被扫描。
+    """
+    query = select(*_SETTINGS_COLUMNS).where(NOTIFICATION_CHANNEL_ENABLED)
+    if user_ids is not None:
+        query = query.where(NotificationSettings.owner_id.in_(user_ids))
+    return db.execute(query.order_by(NotificationSettings.owner_id)).all()
@@ -0,0 +1,51 @@
+# backend/app/crud/projection.py
+from typing import Iterable, List, Optional
+
+VIEW_FULL = "full"
+VIEW_SUMMARY = "summary"
+
+def resolve_fields(
+    fields: Optional[Iterable[str]],
+    view: Optional[str],
+    allowed: Iterable[str],
+    summary: Iterable[str]
+) -> Optional[List[str]]:
+    """
+    根据 fields / view 参数确定需要返回的字段列表。
+    返回 None 表示完整视图 (保持原有行为)；显式的 fields 优先于 view。
+    """
+    if fields:
+        requested = [field.strip() for field in fields if field and field.strip()]
+        unknown = [field for field in requested if field not in allowed]
+        if unknown:
+            raise ValueError(f"不支持的字段: {', '.join(unknown)}")
+        if "id" not in requested:
+            requested.insert(0, "id")
+        return list(dict.fromkeys(requested))
+    if view in (None, VIEW_FULL):
+        return None
+    if view == VIEW_SUMMARY:
+        return list(summary)
+    raise ValueError(f"不支持的视图: {view}")
+
+def to_partial_dicts(rows: list, fields: List[str]) -> List[dict]:
+    """只读取已加载的列，避免访问延迟加载的属性触发额外查询"""
+    return [{field: getattr(row, field) for field in fields} for row in rows]
+
+def model_columns(model, fields: Iterable[str]) -> list:
+    """
+    按字段名取模型的列，供 db.query(*columns) 按元组查询。
+    返回的 Row 是只读的命名元组，不进入会话的身份映射，也没有属性埋点和修改跟踪。
+    """
+    return [getattr(model, field) for field in fields]
+
+class LeanRow:
+    """
+    需要在查询后改写部分字段 (如日记的呈现内容) 时使用的可变只读行。
+    子类用 __slots__ 声明字段，按 Row 的列名逐个赋值；未查询的字段保持未设置。
+    """
+    __slots__ = ()
+
+    def __init__(self, row):
+        for field, value in row._mapping.items():
+            setattr(self, field, value)
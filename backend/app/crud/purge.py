@@ -0,0 +1,59 @@
+# backend/app/crud/purge.py
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.database import sqlite_reuses_ids
+from app.models.models import ArchivedTask, Task, Diary
+
+# 带有 deleted_at 墓碑的模型
+SOFT_DELETE_MODELS = (Task, Diary)
+
+def purge_cutoff(retention_days: Optional[int] = None) -> datetime:
+    days = settings.SOFT_DELETE_RETENTION_DAYS if retention_days is None else retention_days
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+def purge_tombstones(
+    db: Session,
+    model,
+    retention_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None
+) -> int:
+    """
+    物理删除 deleted_at 早于保留期的行，每批最多 batch_size 行、单独提交，返回删除的行数。
+    每批只锁定少量行，可在业务运行时执行，中断后重新执行即可继续。
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    candidates = select(model.id).where(
+        model.deleted_at.isnot(None), model.deleted_at < purge_cutoff(retention_days)
+    ).order_by(model.id).limit(batch_size)
+    if model is Task and sqlite_reuses_ids(db.connection(), Task.__tablename__):
+        # tasks 尚未迁移为 AUTOINCREMENT 时，删除 id 不低于归档表最大 id 的任务会让新任务复用归档任务的 id
+        high_water = db.query(func.max(ArchivedTask.id)).scalar()
+        if high_water is not None:
+            candidates = candidates.where(Task.id < high_water)
+
+    purged, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        ids = db.execute(candidates).scalars().all()
+        if not ids:
+            break
+        if model is Task:
+            # SQLite 默认不执行外键动作，这里显式断开已物化实例与系列的关联
+            db.execute(
+                update(Task).where(Task.recurrence_parent_id.in_(ids)).values(recurrence_parent_id=None)
+                .execution_options(synchronize_session=False)
+            )
+        db.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+        db.commit()
+        purged += len(ids)
+        batches += 1
+    return purged
+
+def purge_all_tombstones(db: Session, retention_days: Optional[int] = None, batch_size: Optional[int] = None) -> dict:
+    return {
+        model.__tablename__: purge_tombstones(db, model, retention_days, batch_size)
+        for model in SOFT_DELETE_MODELS
+    }
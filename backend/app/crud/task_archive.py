@@ -0,0 +1,82 @@
+# backend/app/crud/task_archive.py
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.database import sqlite_reuses_ids
+from app.models.models import Task, ArchivedTask
+
+# 归档时原样复制的列 (archived_at 由数据库填充)
+ARCHIVED_COLUMNS = [column.name for column in ArchivedTask.__table__.columns if column.name != "archived_at"]
+
+def archive_cutoff(older_than_days: Optional[int] = None) -> datetime:
+    days = settings.TASK_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+def backfill_completed_at(db: Session) -> int:
+    """为引入 completed_at 之前完成的任务补齐完成时间 (取最后更新时间或创建时间)"""
+    result = db.execute(
+        update(Task)
+        .where(Task.completed.is_(True), Task.completed_at.is_(None))
+        .values(completed_at=func.coalesce(Task.updated_at, Task.created_at))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+def archive_completed_tasks(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+    user_id: Optional[int] = None
+) -> int:
+    """
+    将完成时间早于 older_than_days 天前的任务分批移入 tasks_archive，返回移动的任务数。
+    每批在一个事务内 INSERT ... SELECT 后 DELETE，中断后重新执行即可继续。
+    重复任务的系列本身不归档 (其实例仍需展开)，已物化的实例照常归档。
+    """
+    batch_size = batch_size or settings.TASK_ARCHIVE_BATCH_SIZE
+    cutoff = archive_cutoff(older_than_days)
+    tasks_table = Task.__table__
+
+    # 归档任务保留原 id，tasks 必须不复用已删除的 id (SQLite 需 AUTOINCREMENT，由 sync_schema 迁移)
+    if sqlite_reuses_ids(db.connection(), tasks_table.name):
+        raise RuntimeError("tasks 表尚未迁移为 AUTOINCREMENT，请先执行 sync_schema 后再归档")
+    candidates = select(Task.id).where(
+        Task.completed.is_(True),
+        Task.completed_at < cutoff,
+        Task.recurrence_rule.is_(None),
+        Task.deleted_at.is_(None)
+    ).order_by(Task.id).limit(batch_size)
+    if user_id is not None:
+        candidates = candidates.where(Task.owner_id == user_id)
+
+    archived, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        ids = db.execute(candidates).scalars().all()
+        if not ids:
+            break
+        db.execute(insert(ArchivedTask.__table__).from_select(
+            ARCHIVED_COLUMNS,
+            select(*[tasks_table.c[name] for name in ARCHIVED_COLUMNS]).where(tasks_table.c.id.in_(ids))
+        ))
+        db.execute(delete(tasks_table).where(tasks_table.c.id.in_(ids)))
+        db.commit()
+        archived += len(ids)
+        batches += 1
+    return archived
+
+def archive_stats(db: Session) -> dict:
+    """热表与归档表的行数，以及热表中已满足归档条件的任务数"""
+    cutoff = archive_cutoff()
+    return {
+        "hot": db.query(func.count(Task.id)).scalar(),
+        "hot_completed": db.query(func.count(Task.id)).filter(Task.completed.is_(True)).scalar(),
+        "archivable": db.query(func.count(Task.id)).filter(
+            Task.completed.is_(True), Task.completed_at < cutoff,
+            Task.recurrence_rule.is_(None), Task.deleted_at.is_(None)
+        ).scalar(),
+        "archived": db.query(func.count(ArchivedTask.id)).scalar(),
+    }
@@ -1,13 +1,170 @@
 # backend/app/crud/tasks.py
+import heapq
+import logging
+from itertools import islice
+from sqlalchemy import func, literal, or_, select, update
 from sqlalchemy.orm import Session
-from app.models.models import Task, User, ImportanceEnum
-from app.schemas.schemas import TaskCreate, TaskUpdate
-from datetime import datetime
-from typing import List, Optional
+from app.models.models import Task, ArchivedTask, User, ImportanceEnum, TASK_OPEN
+from app.schemas.schemas import TaskCreate, TaskUpdate, TaskPatch
+from app.crud.projection import resolve_fields, to_partial_dicts, model_columns
+from app.crud.versioning import check_version, patch_owned_row
+from app.core import audit
+from app.core.recurrence import parse_rrule, iter_occurrences, is_occurrence, last_occurrence, align_datetime
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Union
 
-def get_task(db: Session, task_id: int, user_id: int):
-    """根据任务ID和用户ID获取任务"""
-    return db.query(Task).filter(Task.id == task_id, Task.owner_id == user_id).first()
+logger = logging.getLogger(__name__)
+
+# 列表接口允许投影的字段，以及 view=summary 时返回的字段
+TASK_LIST_FIELDS = [
+    "id", "owner_id", "title", "description", "importance", "completed",
+    "completed_at", "due_date", "reminder_time", "recurrence_rule", "recurrence_parent_id",
+    "occurrence_date", "version", "created_at", "updated_at"
+]
+TASK_SUMMARY_FIELDS = [
+    "id", "owner_id", "title", "importance", "completed", "due_date",
+    "recurrence_parent_id", "occurrence_date"
+]
+
+class TaskOccurrence:
+    """按重复规则即时展开的任务实例，不对应数据库行，id 为所属系列的 id"""
+    __slots__ = (
+        "id", "owner_id", "title", "description", "importance", "completed",
+        "completed_at", "due_date", "reminder_time", "recurrence_rule", "recurrence_parent_id",
+        "occurrence_date", "is_virtual", "version", "created_at", "updated_at"
+    )
+
+    def __init__(self, master, occurrence_date: datetime):
+        self.id = master.id
+        self.owner_id = master.owner_id
+        self.title = master.title
+        self.description = master.description
+        self.importance = master.importance
+        self.completed = False
+        self.completed_at = None
+        self.due_date = occurrence_date
+        # 提醒时间与截止时间保持和系列首个实例相同的间隔
+        self.reminder_time = (
+            occurrence_date + (master.reminder_time - master.due_date)
+            if master.reminder_time is not None else None
+        )
+        self.recurrence_rule = None
+        self.recurrence_parent_id = master.id
+        self.occurrence_date = occurrence_date
+        self.is_virtual = True
+        self.version = None
+        self.created_at = master.created_at
+        self.updated_at = master.updated_at
+
+def _to_db_values(data: dict) -> dict:
+    """将请求模式中的 ImportanceEnumSchema 转换为数据库模型的 ImportanceEnum"""
+    if data.get("importance") is not None:
+        data["importance"] = ImportanceEnum(data["importance"])
+    return data
+
+def _stamp_completed(db_task: Task, values: dict):
+    """completed 发生变化时同步 completed_at"""
+    if "completed" not in values:
+        return
+    if values["completed"] and db_task.completed_at is None:
+        db_task.completed_at = datetime.now(timezone.utc)
+    elif not values["completed"]:
+        db_task.completed_at = None
+
+def _filter_tasks(query, model, completed, importance, due_date_after, due_date_before):
+    """对热表 (Task) 和归档表 (ArchivedTask) 应用相同的过滤条件"""
+    if completed is not None:
+        query = query.filter(model.completed == completed)
+    if importance is not None:
+        query = query.filter(model.importance == importance)
+    if due_date_after is not None:
+        query = query.filter(model.due_date >= due_date_after)
+    if due_date_before is not None:
+        query = query.filter(model.due_date <= due_date_before)
+    return query
+
+def _apply_recurrence(db_task: Task):
+    """校验重复规则并计算 recurrence_end；规则无效时抛出 ValueError"""
+    if not db_task.recurrence_rule:
+        db_task.recurrence_rule = None
+        db_task.recurrence_end = None
+        return
+    if db_task.due_date is None:
+        raise ValueError("重复任务必须指定 due_date 作为首次发生时间")
+    if db_task.recurrence_parent_id is not None:
+        raise ValueError("重复任务的单个实例不能再设置重复规则")
+    db_task.recurrence_end = last_occurrence(parse_rrule(db_task.recurrence_rule), db_task.due_date)
+
+# 展开实例只需要系列的这些列，按元组查询，不构造 ORM 对象
+_SERIES_COLUMNS = (
+    Task.id, Task.owner_id, Task.title, Task.description, Task.importance, Task.due_date,
+    Task.reminder_time, Task.recurrence_rule, Task.created_at, Task.updated_at
+)
+
+def _series_occurrences(series, window_start: Optional[datetime], window_end: Optional[datetime]):
+    try:
+        rule = parse_rrule(series.recurrence_rule)
+    except ValueError as e:
+        logger.warning("跳过重复规则无效的任务 %s: %s", series.id, e)
+        return
+    for occurrence_date in iter_occurrences(rule, series.due_date, start=window_start, end=window_end):
+        yield occurrence_date, series
+
+def _expand_recurring_tasks(
+    db: Session,
+    user_id: int,
+    importance: Optional[ImportanceEnum],
+    window_start: Optional[datetime],
+    window_end: Optional[datetime],
+    limit: int
+) -> List[TaskOccurrence]:
+    """
+    在 [window_start, window_end] 内展开用户的重复任务，按时间顺序返回最早的 limit 个实例。
+    各系列的实例流惰性归并，只生成需要的数量。
+    已物化 (完成或编辑过) 的实例以独立任务行返回，这里跳过对应的时间点。
+    """
+    series_query = db.query(*_SERIES_COLUMNS).filter(
+        Task.owner_id == user_id, Task.recurrence_rule.isnot(None), Task.deleted_at.is_(None)
+    )
+    if importance is not None:
+        series_query = series_query.filter(Task.importance == importance)
+    if window_end is not None:
+        series_query = series_query.filter(Task.due_date <= window_end)
+    if window_start is not None:
+        series_query = series_query.filter(or_(Task.recurrence_end.is_(None), Task.recurrence_end >= window_start))
+    series_rows = series_query.all()
+    if not series_rows:
+        return []
+
+    # 已物化的实例可能已被归档，两张表都要排除；
+    # 被删除的实例 (墓碑) 同样排除，即"跳过这一次"
+    materialized = set()
+    for model in (Task, ArchivedTask):
+        materialized_query = db.query(model.recurrence_parent_id, model.occurrence_date).filter(
+            model.owner_id == user_id, model.recurrence_parent_id.isnot(None)
+        )
+        if window_start is not None:
+            materialized_query = materialized_query.filter(model.occurrence_date >= window_start)
+        if window_end is not None:
+            materialized_query = materialized_query.filter(model.occurrence_date <= window_end)
+        materialized.update(materialized_query.all())
+
+    merged = heapq.merge(
+        *[_series_occurrences(series, window_start, window_end) for series in series_rows],
+        key=lambda item: (item[0], item[1].id)
+    )
+    occurrences = (
+        TaskOccurrence(series, occurrence_date) for occurrence_date, series in merged
+        if (series.id, occurrence_date) not in materialized
+    )
+    return list(islice(occurrences, limit))
+
+def get_task(db: Session, task_id: int, user_id: int, include_archived: bool = False):
+    """根据任务ID和用户ID获取任务；include_archived 为 True 时热表中找不到会再查归档表"""
+    task = db.query(Task).filter(Task.id == task_id, Task.owner_id == user_id, Task.deleted_at.is_(None)).first()
+    if task is None and include_archived:
+        task = db.query(ArchivedTask).filter(ArchivedTask.id == task_id, ArchivedTask.owner_id == user_id).first()
+    return task
 
 def get_tasks(
     db: Session,
@@ -17,52 +174,269 @@ def get_tasks(
     completed: Optional[bool] = None,
     importance: Optional[ImportanceEnum] = None,
     due_date_after: Optional[datetime] = None,
-    due_date_before: Optional[datetime] = None
-) -> List[Task]:
+    due_date_before: Optional[datetime] = None,
+    fields: Optional[List[str]] = None,
+    view: Optional[str] = None,
+    include_archived: bool = False
+) -> Union[list, List[dict]]:
     """
     获取用户的任务列表，支持过滤。
+    返回只读的 Row (命名元组) 而不是 ORM 对象；
+    指定 fields 或 view="summary" 时只查询所需的列，返回只含这些字段的字典列表。
+
+    指定了截止日期窗口 (due_date_after / due_date_before) 时，重复任务会在窗口内
+    惰性展开为实例 (is_virtual=True)，与普通任务按截止时间合并排序后再分页；
+    未指定窗口时重复任务以系列本身 (一行) 返回。
+
+    默认只查询热表；include_archived 为 True 时同时查询归档表中的历史任务，
+    两边各取前 skip + limit 条后合并排序 (无窗口时按 id) 再分页。
     """
-    query = db.query(Task).filter(Task.owner_id == user_id)
-    if completed is not None:
-        query = query.filter(Task.completed == completed)
-    if importance is not None:
-        query = query.filter(Task.importance == importance)
-    if due_date_after is not None:
-        query = query.filter(Task.due_date >= due_date_after)
-    if due_date_before is not None:
-        query = query.filter(Task.due_date <= due_date_before)
-    return query.offset(skip).limit(limit).all()
+    columns = resolve_fields(fields, view, TASK_LIST_FIELDS, TASK_SUMMARY_FIELDS)
+    expand = due_date_after is not None or due_date_before is not None
+    # 归档表中都是已完成的任务
+    include_archived = include_archived and completed is not False
+    load_columns = TASK_LIST_FIELDS if columns is None else list(dict.fromkeys(columns + (["due_date"] if expand else [])))
+
+    def build_query(model):
+        # 只读列表按列元组查询，返回 Row 而不是 ORM 对象
+        selected = model_columns(model, load_columns)
+        if model is ArchivedTask:
+            selected.append(literal(True).label("is_archived"))
+        query = db.query(*selected).filter(model.owner_id == user_id)
+        if model is Task:
+            query = query.filter(Task.deleted_at.is_(None))
+        return _filter_tasks(query, model, completed, importance, due_date_after, due_date_before)
+
+    query = build_query(Task)
+    if expand:
+        tasks = query.filter(Task.recurrence_rule.is_(None)).order_by(Task.due_date, Task.id).limit(skip + limit).all()
+        if include_archived:
+            archived_query = build_query(ArchivedTask).filter(ArchivedTask.recurrence_rule.is_(None))
+            tasks += archived_query.order_by(ArchivedTask.due_date, ArchivedTask.id).limit(skip + limit).all()
+        if completed is not True:
+            # 展开的实例都是未完成的；完成后会物化为普通任务行
+            tasks += _expand_recurring_tasks(db, user_id, importance, due_date_after, due_date_before, skip + limit)
+        if tasks:
+            reference = tasks[0].due_date
+            tasks.sort(key=lambda task: (align_datetime(task.due_date, reference), task.id))
+        tasks = tasks[skip:skip + limit]
+    elif include_archived:
+        tasks = query.order_by(Task.id).limit(skip + limit).all()
+        tasks += build_query(ArchivedTask).order_by(ArchivedTask.id).limit(skip + limit).all()
+        tasks.sort(key=lambda task: task.id)
+        tasks = tasks[skip:skip + limit]
+    else:
+        tasks = query.offset(skip).limit(limit).all()
+    if columns is None:
+        return tasks
+    return to_partial_dicts(tasks, columns)
+
+def get_task_agenda(
+    db: Session,
+    user_id: int,
+    utc_offset_minutes: int = 0,
+    limit: int = 100,
+    now: Optional[datetime] = None
+) -> dict:
+    """
+    按用户本地日期把未完成的任务分为 overdue / today / this_week / no_date，每组最多 limit 个。
+    日期边界按 utc_offset_minutes 计算后换算为 UTC；this_week 为明天起到今天起第 7 天结束。
+    各组都是 owner_id + 截止时间范围的查询，由部分索引 ix_tasks_open_owner_due_date 支持。
+    重复任务在 [today_start, week_end) 内展开为实例：今天早于 now 的实例与普通任务一样计入 overdue，
+    其余并入 today / this_week；今天之前未物化的实例不算逾期 (否则每天重复的系列会无限堆积)。
+    """
+    now = now or datetime.now(timezone.utc)
+    offset = timedelta(minutes=utc_offset_minutes)
+    local_now = now.astimezone(timezone(offset))
+    today_start = local_now.replace(hour=0, minute=0, second=0, microsecond=0).astimezone(timezone.utc)
+    today_end = today_start + timedelta(days=1)
+    week_end = today_start + timedelta(days=7)
+
+    open_tasks = db.query(*model_columns(Task, TASK_LIST_FIELDS)).filter(
+        Task.owner_id == user_id, TASK_OPEN, Task.deleted_at.is_(None), Task.recurrence_rule.is_(None)
+    )
+
+    def due_between(start: Optional[datetime], end: datetime) -> list:
+        query = open_tasks.filter(Task.due_date < end)
+        if start is not None:
+            query = query.filter(Task.due_date >= start)
+        return query.order_by(Task.due_date, Task.id).limit(limit).all()
+
+    def agenda_window(start: Optional[datetime], end: datetime, occurrences_start: Optional[datetime] = None) -> list:
+        """[start, end) 内的普通任务与 [occurrences_start 或 start, end) 内的重复实例，按截止时间合并后取前 limit 个"""
+        occurrences = _expand_recurring_tasks(db, user_id, None, occurrences_start or start, end, limit)
+        tasks = due_between(start, end) + [task for task in occurrences if align_datetime(task.due_date, end) < end]
+        tasks.sort(key=lambda task: (align_datetime(task.due_date, now), task.id))
+        return tasks[:limit]
+
+    return {
+        "utc_offset_minutes": utc_offset_minutes,
+        "today_start": today_start,
+        "today_end": today_end,
+        "week_end": week_end,
+        "overdue": agenda_window(None, now, occurrences_start=today_start),
+        "today": agenda_window(now, today_end),
+        "this_week": agenda_window(today_end, week_end),
+        "no_date": open_tasks.filter(Task.due_date.is_(None)).order_by(Task.id).limit(limit).all(),
+    }
+
+def build_task(task: TaskCreate, user_id: int) -> Task:
+    """构造 (未添加到会话的) 新任务对象；重复规则无效时抛出 ValueError"""
+    values = _to_db_values(task.model_dump())
+    db_task = Task(**values, owner_id=user_id)
+    _stamp_completed(db_task, values)
+    _apply_recurrence(db_task)
+    return db_task
 
 def create_user_task(db: Session, task: TaskCreate, user_id: int):
     """为指定用户创建新任务"""
-    db_task = Task(**task.model_dump(), owner_id=user_id)
+    db_task = build_task(task, user_id)
     db.add(db_task)
     db.commit()
     db.refresh(db_task)
     return db_task
 
-def update_task(db: Session, task_id: int, task_update: TaskUpdate, user_id: int):
+def update_task(
+    db: Session, task_id: int, task_update: TaskUpdate, user_id: int, expected_version: Optional[int] = None
+):
     """
     更新指定任务。
-    确保只有任务所有者才能更新。
+    确保只有任务所有者才能更新。指定 expected_version 时版本不一致会抛出 VersionConflict。
     """
-    db_task = db.query(Task).filter(Task.id == task_id, Task.owner_id == user_id).first()
+    db_task = db.query(Task).filter(Task.id == task_id, Task.owner_id == user_id, Task.deleted_at.is_(None)).first()
     if db_task:
-        update_data = task_update.model_dump(exclude_unset=True)
+        check_version(db_task, expected_version)
+        update_data = _to_db_values(task_update.model_dump(exclude_unset=True))
+        update_data.pop('version', None)
+        db_task.version = (db_task.version or 1) + 1
         for key, value in update_data.items():
             setattr(db_task, key, value)
+        _stamp_completed(db_task, update_data)
+        if 'recurrence_rule' in update_data or 'due_date' in update_data:
+            _apply_recurrence(db_task)
         db.add(db_task)
         db.commit()
         db.refresh(db_task)
     return db_task
 
-def delete_task(db: Session, task_id: int, user_id: int):
+def patch_task(db: Session, task_id: int, user_id: int, task_patch: TaskPatch):
     """
-    删除指定任务。
-    确保只有任务所有者才能删除。
+    部分更新任务：单条 UPDATE ... RETURNING，不先读取整行，也不经过 ORM 变更跟踪。
+    task_patch.version 为客户端读取到的版本号，不一致时抛出 VersionConflict。
+    修改重复规则或截止时间需要校验规则并重新计算 recurrence_end，这类修改走 update_task。
+    任务不存在时返回 None。
     """
-    db_task = db.query(Task).filter(Task.id == task_id, Task.owner_id == user_id).first()
-    if db_task:
-        db.delete(db_task)
-        db.commit()
+    update_data = _to_db_values(task_patch.model_dump(exclude_unset=True))
+    expected_version = update_data.pop('version', None)
+    if 'recurrence_rule' in update_data or 'due_date' in update_data:
+        return update_task(db, task_id, task_patch, user_id, expected_version=expected_version)
+
+    if 'completed' in update_data:
+        update_data['completed_at'] = (
+            func.coalesce(Task.completed_at, datetime.now(timezone.utc)) if update_data['completed'] else None
+        )
+    return patch_owned_row(db, Task, task_id, user_id, update_data, expected_version)
+
+def set_tasks_completed(db: Session, user_id: int, task_ids: List[int], completed: bool = True) -> List[int]:
+    """
+    批量标记任务完成 (或未完成)，一条 UPDATE 完成，返回实际发生变化的任务 ID。
+    已是目标状态、已删除或不属于该用户的任务会被忽略；重复任务的系列本身不参与
+    (单个实例需通过 materialize_occurrence 完成)。
+    """
+    if not task_ids:
+        return []
+    conditions = [
+        Task.owner_id == user_id,
+        Task.id.in_(task_ids),
+        Task.deleted_at.is_(None),
+        Task.recurrence_rule.is_(None),
+        or_(Task.completed.is_(None), Task.completed != completed),
+    ]
+    statement = update(Task).values(
+        completed=completed,
+        completed_at=func.coalesce(Task.completed_at, datetime.now(timezone.utc)) if completed else None,
+        version=Task.version + 1
+    ).execution_options(synchronize_session=False)
+
+    if db.get_bind().dialect.update_returning:
+        updated_ids = db.execute(statement.where(*conditions).returning(Task.id)).scalars().all()
+    else:
+        updated_ids = db.execute(select(Task.id).where(*conditions)).scalars().all()
+        if updated_ids:
+            db.execute(statement.where(Task.id.in_(updated_ids)))
+    for task_id in updated_ids:
+        audit.record(db, Task, audit.UPDATE, task_id, user_id, {"completed": completed})
+    db.commit()
+    return sorted(updated_ids)
+
+def materialize_occurrence(
+    db: Session, task_id: int, user_id: int, occurrence_date: datetime, task_update: TaskUpdate
+):
+    """
+    完成或编辑重复任务的单个实例：将该实例物化为独立任务行并应用修改。
+    实例已物化过时直接更新已有的行 (已删除的实例会被恢复)。
+    系列不存在时返回 None，时间点不属于该系列时抛出 ValueError。
+    """
+    master = db.query(Task).filter(
+        Task.id == task_id, Task.owner_id == user_id, Task.recurrence_rule.isnot(None), Task.deleted_at.is_(None)
+    ).first()
+    if master is None:
+        return None
+    occurrence_date = align_datetime(occurrence_date, master.due_date)
+    if not is_occurrence(parse_rrule(master.recurrence_rule), master.due_date, occurrence_date):
+        raise ValueError("该时间不是此重复任务的实例")
+
+    db_task = db.query(Task).filter(
+        Task.owner_id == user_id,
+        Task.recurrence_parent_id == master.id,
+        Task.occurrence_date == occurrence_date
+    ).first()
+    if db_task is None:
+        occurrence = TaskOccurrence(master, occurrence_date)
+        db_task = Task(
+            title=occurrence.title,
+            description=occurrence.description,
+            importance=occurrence.importance,
+            completed=False,
+            due_date=occurrence.due_date,
+            reminder_time=occurrence.reminder_time,
+            owner_id=user_id,
+            recurrence_parent_id=master.id,
+            occurrence_date=occurrence_date
+        )
+
+    update_data = _to_db_values(task_update.model_dump(exclude_unset=True))
+    if update_data.get('recurrence_rule'):
+        raise ValueError("重复任务的单个实例不能再设置重复规则")
+    update_data.pop('recurrence_rule', None)
+    update_data.pop('version', None)
+    if db_task.id is not None:
+        db_task.version = (db_task.version or 1) + 1
+    db_task.deleted_at = None
+    for key, value in update_data.items():
+        setattr(db_task, key, value)
+    _stamp_completed(db_task, update_data)
+    db.add(db_task)
+    db.commit()
+    db.refresh(db_task)
     return db_task
+
+def delete_task(db: Session, task_id: int, user_id: int) -> int:
+    """
+    软删除指定任务：单条 UPDATE 写入 deleted_at，返回受影响的行数 (0 表示不存在或无权删除)。
+    确保只有任务所有者才能删除。
+    """
+    deleted = db.query(Task).filter(
+        Task.id == task_id, Task.owner_id == user_id, Task.deleted_at.is_(None)
+    ).update({Task.deleted_at: datetime.now(timezone.utc)}, synchronize_session=False)
+    if deleted:
+        audit.record(db, Task, audit.DELETE, task_id, user_id)
+    db.commit()
+    return deleted
+
+def get_deleted_tasks(db: Session, user_id: int, since: Optional[datetime] = None, limit: int = 1000):
+    """返回 since 之后删除的任务墓碑 (id, deleted_at)，供客户端同步和缓存失效使用"""
+    query = db.query(Task.id, Task.deleted_at).filter(Task.owner_id == user_id, Task.deleted_at.isnot(None))
+    if since is not None:
+        query = query.filter(Task.deleted_at > since)
+    return query.order_by(Task.deleted_at, Task.id).limit(limit).all()
@@ -0,0 +1,56 @@
+# backend/app/crud/tokens.py
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.models import RevokedToken, TokenRevocationGeneration
+
+_GENERATION_ID = 1
+
+def _bump_generation(db: Session):
+    """
+    吊销代数加 1。与 _reserve_ids 相同，先 UPDATE 取得行锁；
+    代数行不存在时先单独提交初始行 (并发插入冲突时忽略) 再重试。
+    """
+    bump = update(TokenRevocationGeneration).where(TokenRevocationGeneration.id == _GENERATION_ID).values(
+        generation=TokenRevocationGeneration.generation + 1
+    )
+    while db.execute(bump).rowcount == 0:
+        db.rollback()
+        try:
+            db.execute(insert(TokenRevocationGeneration).values(id=_GENERATION_ID, generation=0))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+
+def revoke_token(db: Session, jti: str, owner_id: Optional[int], expires_at: datetime) -> bool:
+    """记录吊销并在同一事务中递增吊销代数；jti 已被吊销时返回 False"""
+    _bump_generation(db)
+    try:
+        db.execute(insert(RevokedToken).values(jti=jti, owner_id=owner_id, expires_at=expires_at))
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+def get_revocation_generation(db: Session) -> int:
+    return db.execute(
+        select(TokenRevocationGeneration.generation).where(TokenRevocationGeneration.id == _GENERATION_ID)
+    ).scalar() or 0
+
+def get_revoked_jtis(db: Session) -> List[str]:
+    """尚未过期的已吊销 jti；过期的令牌本身已无法通过校验"""
+    return db.execute(
+        select(RevokedToken.jti).where(RevokedToken.expires_at > datetime.now(timezone.utc))
+    ).scalars().all()
+
+def purge_expired_revocations(db: Session) -> int:
+    """删除令牌已过期的吊销记录，返回删除的条数"""
+    removed = db.execute(
+        delete(RevokedToken).where(RevokedToken.expires_at <= datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return removed
@@ -1,8 +1,43 @@
 # backend/app/crud/users.py
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
-from app.models.models import User
-from app.schemas.schemas import UserCreate
-from app.core.security import get_password_hash, generate_salt
+from app.models.models import User, Task, ArchivedTask, Diary, DiaryKey, NotificationSettings, Job
+from app.schemas.schemas import UserCreate, UserPreferencesUpdate
+from app.core.cache import cache
+from app.core.config import settings
+from app.core import audit
+# app.core.security 也依赖本模块，这里导入模块本身以避免循环导入
+from app.core import security
+
+# 认证后的用户信息按用户名缓存，不包含密码哈希和盐
+principal_cache = cache.namespace("principal", ttl=settings.CACHE_PRINCIPAL_TTL)
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """已认证用户的只读信息，作为 get_current_user 的返回值"""
+    id: int
+    username: str
+    email: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    utc_offset_minutes: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UserPrincipal":
+        # 缓存命中时时间字段是 ISO 字符串，刚从数据库加载时是 datetime
+        def parse(value):
+            return datetime.fromisoformat(value) if isinstance(value, str) else value
+        return cls(
+            id=data["id"],
+            username=data["username"],
+            email=data.get("email"),
+            created_at=parse(data.get("created_at")),
+            updated_at=parse(data.get("updated_at")),
+            utc_offset_minutes=data.get("utc_offset_minutes") or 0,
+        )
 
 def get_user(db: Session, user_id: int):
     """根据用户ID获取用户"""
@@ -16,13 +51,25 @@ def get_user_by_email(db: Session, email: str):
     """根据邮箱获取用户"""
     return db.query(User).filter(User.email == email).first()
 
+def get_user_principal(db: Session, username: str) -> Optional[UserPrincipal]:
+    """按用户名获取认证用户信息，优先读缓存；用户不存在时返回 None (不缓存)"""
+    def load():
+        row = db.execute(
+            select(User.id, User.username, User.email, User.created_at, User.updated_at, User.utc_offset_minutes)
+            .where(User.username == username)
+        ).first()
+        return asdict(UserPrincipal(**row._mapping)) if row else None
+
+    data = principal_cache.get_or_set(username, load)
+    return UserPrincipal.from_dict(data) if data else None
+
 def create_user(db: Session, user: UserCreate):
     """
     创建新用户。
     为用户密码生成哈希，并为日记加密生成唯一的盐。
     """
-    hashed_password = get_password_hash(user.password)
-    diary_encryption_salt = generate_salt() # 为日记加密生成一个独立的盐
+    hashed_password = security.get_password_hash(user.password)
+    diary_encryption_salt = security.generate_salt() # 为日记加密生成一个独立的盐
     db_user = User(
         username=user.username,
         hashed_password=hashed_password,
@@ -34,4 +81,42 @@ def create_user(db: Session, user: UserCreate):
     db.refresh(db_user)
     return db_user
 
-# 可以在这里添加更新用户、删除用户等功能
+def update_user_preferences(
+    db: Session, user_id: int, username: str, preferences: UserPreferencesUpdate
+) -> Optional[UserPrincipal]:
+    """更新用户偏好 (单条 UPDATE)，提交后使认证用户信息的缓存失效并返回最新的信息"""
+    values = preferences.model_dump(exclude_unset=True, exclude_none=True)
+    if values:
+        db.execute(update(User).where(User.id == user_id).values(**values))
+        audit.record(db, User, audit.UPDATE, user_id, user_id, values)
+        db.commit()
+        principal_cache.invalidate(username)
+    return get_user_principal(db, username)
+
+def delete_user(db: Session, user_id: int) -> bool:
+    """
+    删除用户及其全部数据 (任务、归档任务、日记、日记密钥、通知设置、后台作业)；变更日志保留。
+    每张表一条 DELETE ... WHERE owner_id，不把任何对象加载到 ORM 中；在同一事务内完成。
+    返回用户是否存在。
+    """
+    # 在函数内导入，避免 crud.diaries -> core.security -> crud.users 的循环导入
+    from app.crud.diaries import diary_stats_cache
+    from app.crud.notifications import notification_settings_cache
+
+    username = db.execute(select(User.username).where(User.id == user_id)).scalar()
+    # 日记引用日记密钥，需先于密钥删除
+    removed = {}
+    for model in (Task, ArchivedTask, Diary, DiaryKey, NotificationSettings, Job):
+        removed[model.__tablename__] = db.execute(
+            delete(model).where(model.owner_id == user_id).execution_options(synchronize_session=False)
+        ).rowcount
+    deleted = db.execute(delete(User).where(User.id == user_id).execution_options(synchronize_session=False)).rowcount
+    if deleted:
+        # 变更日志不随用户删除，只记录各表删除的行数
+        audit.record(db, User, audit.DELETE, user_id, user_id, removed)
+    db.commit()
+    if username is not None:
+        principal_cache.invalidate(username)
+    diary_stats_cache.invalidate(user_id)
+    notification_settings_cache.invalidate(user_id)
+    return bool(deleted)
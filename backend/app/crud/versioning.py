@@ -0,0 +1,54 @@
+# backend/app/crud/versioning.py
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.core import audit
+
+class VersionConflict(Exception):
+    """提交修改时的版本号与数据库中的不一致，说明对象已被其他客户端修改"""
+    def __init__(self, current_version: int):
+        super().__init__(f"对象已被修改 (当前版本 {current_version})，请刷新后重试")
+        self.current_version = current_version
+
+def check_version(db_obj, expected_version: Optional[int]):
+    """ORM 路径上的版本检查；expected_version 为空时不检查 (后写覆盖)"""
+    if expected_version is not None and db_obj.version != expected_version:
+        raise VersionConflict(db_obj.version)
+
+def patch_owned_row(
+    db: Session,
+    model,
+    row_id: int,
+    user_id: int,
+    values: dict,
+    expected_version: Optional[int] = None
+):
+    """
+    单条语句更新一行：UPDATE ... SET values, version = version + 1
+    WHERE id AND owner_id AND 未删除 [AND version = expected_version] RETURNING 全部列。
+    成功时提交并返回更新后的行 (Row)；行不存在返回 None；版本不一致抛出 VersionConflict。
+    只有失败时才多查一次，用于区分"不存在"和"版本冲突"。
+    """
+    conditions = [model.id == row_id, model.owner_id == user_id, model.deleted_at.is_(None)]
+    statement = update(model).where(*conditions)
+    if expected_version is not None:
+        statement = statement.where(model.version == expected_version)
+    statement = statement.values(**values, version=model.version + 1).execution_options(synchronize_session=False)
+    columns = list(model.__table__.columns)
+
+    if db.get_bind().dialect.update_returning:
+        row = db.execute(statement.returning(*columns)).first()
+    else:
+        # 不支持 RETURNING 的数据库 (如 MySQL) 退化为 UPDATE 后再 SELECT
+        updated = db.execute(statement).rowcount
+        row = db.execute(select(*columns).where(*conditions)).first() if updated else None
+
+    if row is None:
+        current_version = db.execute(select(model.version).where(*conditions)).scalar()
+        db.rollback()
+        if current_version is not None and expected_version is not None:
+            raise VersionConflict(current_version)
+        return None
+    audit.record(db, model, audit.UPDATE, row.id, user_id, {key: row._mapping[key] for key in [*values, "version"]})
+    db.commit()
+    return row
@@ -1,21 +1,61 @@
 # backend/app/database.py
-from sqlalchemy import create_engine
+import logging
+from fastapi import Depends
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings # 导入我们新的配置模块
 
+logger = logging.getLogger(__name__)
+
+def worker_count() -> int:
+    """当前部署的 worker 进程数；直接用 uvicorn 启动 (SERVER_WORKERS 为 0) 时视为单进程"""
+    return max(1, settings.SERVER_WORKERS)
+
+def pool_size() -> int:
+    """每个 worker 的连接池大小：整个部署的连接预算按 worker 数平分"""
+    return settings.DB_POOL_SIZE or max(2, settings.DB_MAX_CONNECTIONS // worker_count())
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": pool_size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
 # 根据 DATABASE_URL 判断数据库类型并创建引擎
 if settings.DATABASE_URL.startswith("sqlite"):
     # SQLite 特殊配置，允许在多线程环境 (FastAPI) 中使用
     # 这是因为 SQLite 默认不允许在创建它的线程之外的线程中使用连接
+    in_memory = settings.DATABASE_URL in ("sqlite://", "sqlite:///:memory:")
     engine = create_engine(
-        settings.DATABASE_URL, connect_args={"check_same_thread": False}
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        # 内存数据库使用单连接的连接池，不接受连接池参数
+        **({} if in_memory else _pool_options())
     )
+
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.close()
 else:
     # MySQL, PostgreSQL 等其他数据库的通用配置
     # 使用连接池来更高效地管理数据库连接
+    connect_args = {}
+    if settings.DATABASE_URL.startswith("postgresql"):
+        connect_args["application_name"] = settings.POSTGRES_APPLICATION_NAME
+        if settings.POSTGRES_STATEMENT_TIMEOUT_MS:
+            connect_args["options"] = f"-c statement_timeout={int(settings.POSTGRES_STATEMENT_TIMEOUT_MS)}"
     engine = create_engine(
-        settings.DATABASE_URL, pool_pre_ping=True
+        settings.DATABASE_URL, pool_pre_ping=True, connect_args=connect_args, **_pool_options()
     )
 
 # 创建一个可用于生成数据库会话的工厂
@@ -24,6 +64,85 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # 创建一个所有数据模型都将继承的基础类
 Base = declarative_base()
 
+def sqlite_reuses_ids(conn, table_name: str) -> bool:
+    """SQLite 表未声明 AUTOINCREMENT 时，删除 id 最大的行后该 id 会被重新分配；其他数据库的序列不会回退"""
+    if conn.dialect.name != "sqlite":
+        return False
+    ddl = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table_name}
+    ).scalar()
+    return ddl is not None and "AUTOINCREMENT" not in ddl.upper()
+
+def _rebuild_with_autoincrement(conn, table):
+    """
+    把已存在的 SQLite 表重建为 AUTOINCREMENT (SQLite 不支持 ALTER 修改主键)：
+    新建临时表、复制数据、删除旧表后改名，再按模型重建索引；
+    最后把序列设为本表及 info["shares_ids_with"] 中各表的最大 id，之后分配的 id 都在其之后。
+    """
+    temp_name = f"{table.name}__rebuild"
+    # 只替换表名，外键 (包括指向自身的) 仍引用原表名，改名后依然有效
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+    ddl = ddl.replace(f"CREATE TABLE {table.name} (", f"CREATE TABLE {temp_name} (", 1)
+    existing_columns = {col["name"] for col in inspect(conn).get_columns(table.name)}
+    missing = [column.name for column in table.columns if column.name not in existing_columns]
+    if missing:
+        logger.warning("表 %s 缺少列 %s，暂不重建为 AUTOINCREMENT", table.name, ", ".join(missing))
+        return
+    columns = ", ".join(column.name for column in table.columns)
+    conn.execute(text(ddl))
+    conn.execute(text(f"INSERT INTO {temp_name} ({columns}) SELECT {columns} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {temp_name} RENAME TO {table.name}"))
+    for index in table.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+    high_water = 0
+    for name in (table.name, *table.info.get("shares_ids_with", ())):
+        if inspect(conn).has_table(name):
+            high_water = max(high_water, conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {name}")).scalar())
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table.name})
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), {"name": table.name, "seq": high_water})
+    logger.warning("已将表 %s 重建为 AUTOINCREMENT，id 从 %d 开始分配", table.name, high_water + 1)
+
+def sync_schema():
+    """
+    创建缺失的表，并为已存在的表补齐新增的列和索引。
+    项目没有引入 Alembic，这里只处理可安全在线添加的变更：
+    可为空或带有 server_default 的新列，新的索引，唯一索引放宽为普通索引，
+    以及把声明了 sqlite_autoincrement 的 SQLite 表重建为 AUTOINCREMENT。
+    """
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    logger.warning("跳过列 %s.%s: 非空列必须提供 server_default", table.name, column.name)
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    if isinstance(default, str):
+                        default = f"'{default}'"
+                    else:
+                        default = str(default.compile(dialect=engine.dialect))
+                    ddl += f" DEFAULT {default}"
+                conn.execute(text(ddl))
+            existing_indexes = {index["name"]: index for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                current = existing_indexes.get(index.name)
+                if current is not None and current["unique"] and not index.unique:
+                    # 唯一索引在模型中放宽为普通索引 (如 diaries.entry_date)：删除后按模型重建
+                    index.drop(bind=conn)
+                index.create(bind=conn, checkfirst=True)
+            # 放在补齐列之后：重建时按模型建表，旧表必须已经具备模型的全部列
+            if table.dialect_options["sqlite"]["autoincrement"] and sqlite_reuses_ids(conn, table.name):
+                _rebuild_with_autoincrement(conn, table)
+
 # 依赖注入：为每个 API 请求提供一个独立的数据库会话
 def get_db():
     """
@@ -35,3 +154,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db(db: Session = Depends(get_db)):
+    """
+    只读路由使用的会话依赖。
+    与认证依赖共用同一个请求会话 (不额外占用连接)，但关闭提交时的过期，
+    请求中途的提交不会让已读取的对象在序列化时逐个重新查询。
+    """
+    db.expire_on_commit = False
+    return db
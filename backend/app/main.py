@@ -1,17 +1,41 @@
 # backend/app/main.py
+from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, tasks, diaries, notifications
-from app.database import engine, Base
+from app.api import auth, tasks, diaries, notifications, jobs, audit
+from app.database import sync_schema, pool_size, worker_count
 from app.core.config import settings
+from app.core.security import check_kek_config
+from app.core.middleware import CompressionMiddleware, WorkerRecycleMiddleware
+from app.core.audit import audit_writer
+from app.core.jobs import start_job_reaper
 
-# 在应用启动时根据模型定义创建数据库表
-Base.metadata.create_all(bind=engine)
+# 未配置 DIARY_KEK 时拒绝启动，避免在没有可用 KEK 的情况下写入无法解密的数据密钥
+check_kek_config()
+
+# 在应用启动时根据模型定义创建数据库表，并补齐已有表中新增的列
+# (多 worker 部署时由 scripts.serve 在启动 worker 前统一执行)
+if settings.SYNC_SCHEMA_ON_STARTUP:
+    sync_schema()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 同步路由在线程池中执行，每个线程同时最多占用一个数据库连接：
+    # 线程数默认与连接数相同，多出的线程只会在连接池上排队
+    threads = settings.SERVER_THREADPOOL_SIZE or pool_size() + settings.DB_MAX_OVERFLOW
+    to_thread.current_default_thread_limiter().total_tokens = threads
+    # 回收上次退出时中断的作业，之后定期检查
+    await to_thread.run_sync(start_job_reaper)
+    yield
+    # 退出前写完队列中已提交的变更日志
+    await to_thread.run_sync(audit_writer.flush)
 
 app = FastAPI(
     title="TaskDiarySystem API",
     description="一个功能强大的任务和日记管理系统，支持多种数据库。",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # 设置 CORS
@@ -23,6 +47,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 设置响应压缩
+if settings.RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.RESPONSE_COMPRESSION_MIN_SIZE,
+        level=settings.RESPONSE_COMPRESSION_LEVEL,
+        max_ratio=settings.RESPONSE_COMPRESSION_MAX_RATIO,
+        encodings=settings.RESPONSE_COMPRESSION_ENCODINGS,
+    )
+
+# 多 worker 部署时按请求数或内存回收 worker (单进程时 SIGTERM 会结束整个服务，因此不启用)
+if worker_count() > 1 and (settings.SERVER_MAX_REQUESTS or settings.SERVER_MAX_MEMORY_MB):
+    app.add_middleware(
+        WorkerRecycleMiddleware,
+        max_requests=settings.SERVER_MAX_REQUESTS,
+        jitter=settings.SERVER_MAX_REQUESTS_JITTER,
+        max_memory_mb=settings.SERVER_MAX_MEMORY_MB,
+        memory_check_every=settings.SERVER_MEMORY_CHECK_EVERY,
+    )
+
 api_router = APIRouter()
 
 # --- 修正之处 ---
@@ -31,6 +75,8 @@ api_router.include_router(auth.router, tags=["Auth"])
 api_router.include_router(tasks.router, tags=["Tasks"])
 api_router.include_router(diaries.router, tags=["Diaries"])
 api_router.include_router(notifications.router, tags=["Notifications"])
+api_router.include_router(jobs.router, tags=["Jobs"])
+api_router.include_router(audit.router, tags=["Audit"])
 # -----------------
 
 # 将 api_router 挂载到主应用 app 上，并添加统一的前缀
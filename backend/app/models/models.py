@@ -1,6 +1,6 @@
 # backend/app/models/models.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum, UniqueConstraint, LargeBinary, Index, or_
+from sqlalchemy.sql import func, false
 from sqlalchemy.orm import relationship
 import enum
 
@@ -26,11 +26,14 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     diary_encryption_salt = Column(String, nullable=False)
     email = Column(String, unique=True, index=True, nullable=True)
+    # 用户所在时区相对 UTC 的偏移 (分钟)，日程视图据此划分"今天"和"本周"
+    utc_offset_minutes = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     tasks = relationship("Task", back_populates="owner")
     diaries = relationship("Diary", back_populates="owner")
+    diary_keys = relationship("DiaryKey", back_populates="owner")
     # 添加与 NotificationSettings 的反向关系
     notification_settings = relationship("NotificationSettings", uselist=False, back_populates="owner")
 
@@ -42,15 +45,32 @@ class Task(Base):
     任务模型：存储待办事项。
     """
     __tablename__ = "tasks"
+    # 归档任务保留原 id：SQLite 需声明 AUTOINCREMENT，物理删除 id 最大的任务后才不会把该 id 分配给新任务；
+    # 旧库由 sync_schema 重建为 AUTOINCREMENT，并把序列推进到 tasks_archive 的最大 id 之后
+    __table_args__ = {"sqlite_autoincrement": True, "info": {"shares_ids_with": ("tasks_archive",)}}
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
     description = Column(Text, nullable=True)
     importance = Column(Enum(ImportanceEnum), default=ImportanceEnum.MEDIUM, nullable=False)
     completed = Column(Boolean, default=False)
+    # 标记完成的时间，归档任务按它判断是否已完成足够久
+    completed_at = Column(DateTime(timezone=True), nullable=True, index=True)
     due_date = Column(DateTime(timezone=True), nullable=True)
     reminder_time = Column(DateTime(timezone=True), nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    # 重复任务：recurrence_rule 为 RRULE 子集，due_date 即首个实例 (DTSTART)。
+    # recurrence_end 为最后一个实例的时间 (无限重复时为空)，用于窗口查询时过滤已结束的系列。
+    recurrence_rule = Column(String, nullable=True)
+    recurrence_end = Column(DateTime(timezone=True), nullable=True)
+    # 被完成或编辑过的实例会物化为独立的任务行，记录所属系列和原始实例时间
+    recurrence_parent_id = Column(Integer, ForeignKey("tasks.id", ondelete="SET NULL"), nullable=True, index=True)
+    occurrence_date = Column(DateTime(timezone=True), nullable=True)
+    # 软删除标记 (墓碑)：非空表示已删除，由清理任务在保留期后物理删除
+    deleted_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    # 乐观并发控制：每次修改加 1，客户端提交修改时带上读取到的版本号
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     owner = relationship("User", back_populates="tasks")
     
@@ -60,6 +80,52 @@ class Task(Base):
     def __repr__(self):
         return f"<Task(id={self.id}, title='{self.title}', completed={self.completed})>"
 
+# 未完成的任务：日程视图 (/tasks/agenda) 只扫描这部分任务，按截止时间范围读取；
+# 部分索引只收录满足条件的行，查询时须使用同一个条件表达式才能命中
+TASK_OPEN = Task.completed.is_(False)
+Index(
+    "ix_tasks_open_owner_due_date",
+    Task.owner_id,
+    Task.due_date,
+    sqlite_where=TASK_OPEN,
+    postgresql_where=TASK_OPEN,
+)
+
+class ArchivedTask(Base):
+    """
+    归档任务模型：完成超过 TASK_ARCHIVE_AFTER_DAYS 天的任务从 tasks 表移到这里，
+    保留原任务的 id 和全部字段，只在查询历史时读取。
+    """
+    __tablename__ = "tasks_archive"
+    __table_args__ = (
+        Index("ix_tasks_archive_owner_due_date", "owner_id", "due_date"),
+        Index("ix_tasks_archive_owner_occurrence", "owner_id", "occurrence_date"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    title = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    importance = Column(Enum(ImportanceEnum), default=ImportanceEnum.MEDIUM, nullable=False)
+    completed = Column(Boolean, default=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    due_date = Column(DateTime(timezone=True), nullable=True)
+    reminder_time = Column(DateTime(timezone=True), nullable=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    recurrence_rule = Column(String, nullable=True)
+    recurrence_end = Column(DateTime(timezone=True), nullable=True)
+    recurrence_parent_id = Column(Integer, nullable=True)
+    occurrence_date = Column(DateTime(timezone=True), nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # 供响应模型区分来源
+    is_archived = True
+
+    def __repr__(self):
+        return f"<ArchivedTask(id={self.id}, title='{self.title}')>"
+
 class Diary(Base):
     """
     日记模型：存储日记内容。
@@ -68,11 +134,25 @@ class Diary(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=True)
+    # 文本形式的内容：明文，或旧版 base64 密文。使用二进制存储时为空字符串
     content = Column(Text, nullable=False)
+    # 二进制形式的内容：iv + 密文 + tag (加密时) 或压缩后的明文
+    content_blob = Column(LargeBinary, nullable=True)
+    # 写入前对明文使用的压缩编码 ("zlib"/"zstd")，为空表示未压缩
+    content_codec = Column(String, nullable=True)
+    # 写入时截取的明文摘要，供列表摘要视图使用；加密日记不保存摘要
+    preview = Column(String, nullable=True)
     is_encrypted = Column(Boolean, default=False)
-    entry_date = Column(DateTime(timezone=True), index=True, nullable=False, unique=True)
+    # 同一用户的未删除日记按日期唯一 (见下方的部分唯一索引)，墓碑不占用日期
+    entry_date = Column(DateTime(timezone=True), index=True, nullable=False)
     daily_rating = Column(String, nullable=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # 加密该日记所用的数据密钥；为空且 is_encrypted 为 True 时表示旧版口令派生密钥
+    key_id = Column(Integer, ForeignKey("diary_keys.id"), nullable=True)
+    # 软删除标记 (墓碑)：非空表示已删除，由清理任务在保留期后物理删除
+    deleted_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    # 乐观并发控制：每次修改加 1，客户端提交修改时带上读取到的版本号
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     owner = relationship("User", back_populates="diaries")
     
@@ -82,6 +162,39 @@ class Diary(Base):
     def __repr__(self):
         return f"<Diary(id={self.id}, title='{self.title}', is_encrypted={self.is_encrypted})>"
 
+DIARY_LIVE = Diary.deleted_at.is_(None)
+Index(
+    "uq_diaries_owner_entry_date_live",
+    Diary.owner_id,
+    Diary.entry_date,
+    unique=True,
+    sqlite_where=DIARY_LIVE,
+    postgresql_where=DIARY_LIVE,
+)
+
+class DiaryKey(Base):
+    """
+    日记数据密钥模型：存储被 KEK 包裹的每用户数据加密密钥 (DEK)。
+    每个用户同一时间只有一个 is_active 的密钥，旧版本保留用于解密历史日记。
+    """
+    __tablename__ = "diary_keys"
+    __table_args__ = (UniqueConstraint("owner_id", "version", name="uq_diary_keys_owner_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    version = Column(Integer, nullable=False, default=1)
+    kek_id = Column(String, nullable=False)
+    wrapped_key = Column(String, nullable=False)
+    is_active = Column(Boolean, default=True)
+
+    owner = relationship("User", back_populates="diary_keys")
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<DiaryKey(id={self.id}, owner_id={self.owner_id}, version={self.version}, kek_id='{self.kek_id}')>"
+
 
 class NotificationSettings(Base):
     """
@@ -107,3 +220,115 @@ class NotificationSettings(Base):
 
     owner = relationship("User", back_populates="notification_settings")
 
+class Job(Base):
+    """
+    后台作业模型：既是作业队列 (status 为 queued 的行)，也是进度与结果的存储。
+    params / result 以 JSON 文本保存。
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_owner_status", "owner_id", "status"),
+        Index("ix_jobs_status_created", "status", "created_at"),
+    )
+
+    # uuid4 的十六进制形式，避免客户端猜测他人的作业 ID
+    id = Column(String(32), primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False)
+    # queued / running / succeeded / failed / cancelled
+    status = Column(String, nullable=False, default="queued")
+    progress = Column(Integer, nullable=False, default=0, server_default="0")
+    message = Column(String, nullable=True)
+    params = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    # 运行中的作业被请求取消时置为 True，由作业在下一次报告进度时检查
+    cancel_requested = Column(Boolean, nullable=False, default=False, server_default=false())
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    # 运行中的作业在领取和每次写入进度时更新；超过 JOB_STALE_AFTER 秒未更新视为执行它的进程已退出
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<Job(id='{self.id}', kind='{self.kind}', status='{self.status}')>"
+
+# 至少开启了一个通知渠道：提醒投递只需要扫描这部分用户，
+# 部分索引只收录满足条件的行，查询时须使用同一个条件表达式才能命中
+NOTIFICATION_CHANNEL_ENABLED = or_(
+    NotificationSettings.email_enabled.is_(True),
+    NotificationSettings.wecom_enabled.is_(True),
+    NotificationSettings.dingtalk_enabled.is_(True),
+    NotificationSettings.telegram_enabled.is_(True),
+)
+Index(
+    "ix_notification_settings_channel_enabled",
+    NotificationSettings.owner_id,
+    sqlite_where=NOTIFICATION_CHANNEL_ENABLED,
+    postgresql_where=NOTIFICATION_CHANNEL_ENABLED,
+)
+
+class AuditLog(Base):
+    """
+    变更日志：只追加，由 app.core.audit 的后台写入线程分批写入。
+    id 为链上的序号 (由写入方连续分配)，hash 覆盖本行内容和上一行的 hash (哈希链)，
+    修改、删除或插入任意一行都会使 verify_audit_chain 从该行起校验失败。
+    不引用 users 表：用户被删除后其变更记录仍然保留。
+    """
+    __tablename__ = "audit_log"
+    __table_args__ = (
+        Index("ix_audit_log_owner", "owner_id", "id"),
+        Index("ix_audit_log_object", "object_type", "object_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    owner_id = Column(Integer, nullable=True)
+    # 被修改对象的表名和主键；批量语句无法确定单个对象时 object_id 为空
+    object_type = Column(String, nullable=False)
+    object_id = Column(Integer, nullable=True)
+    # create / update / delete
+    action = Column(String, nullable=False)
+    # 变更内容的 JSON 文本；敏感字段 (密码哈希、日记内容、密钥、webhook 等) 只记录为已修改
+    changes = Column(Text, nullable=True)
+    # 变更提交的时间 (而不是写入日志的时间)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    prev_hash = Column(String(64), nullable=False)
+    hash = Column(String(64), nullable=False)
+
+    def __repr__(self):
+        return f"<AuditLog(id={self.id}, object_type='{self.object_type}', object_id={self.object_id}, action='{self.action}')>"
+
+class AuditChainHead(Base):
+    """
+    哈希链的链头 (只有 id=1 一行)：最后一条日志的序号和 hash。
+    写入方先锁定这一行再分配序号，多个进程并发追加时链不会分叉；
+    与 audit_log 的最后一行比对可以发现从末尾截断的日志。
+    """
+    __tablename__ = "audit_chain_head"
+
+    id = Column(Integer, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    last_hash = Column(String(64), nullable=False)
+
+class RevokedToken(Base):
+    """
+    已吊销的令牌 (登出的访问令牌、已使用或登出的刷新令牌)，按 jti 唯一。
+    令牌过期后吊销记录不再有意义，由 scripts.purge_deleted purge 清理。
+    """
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(32), primary_key=True)
+    owner_id = Column(Integer, nullable=True, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class TokenRevocationGeneration(Base):
+    """
+    吊销代数 (只有 id=1 一行)：每次吊销在同一事务中加 1。
+    各 worker 定期只读取这个数字，变化时才重新加载吊销集合。
+    """
+    __tablename__ = "token_revocation_generation"
+
+    id = Column(Integer, primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
@@ -1,6 +1,6 @@
 # backend/app/schemas/schemas.py
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 
@@ -26,6 +26,7 @@ class UserCreate(UserBase):
 # 这就是之前报错时找不到的 'User'。
 class User(UserBase):
     id: int
+    utc_offset_minutes: int = 0
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -34,6 +35,10 @@ class User(UserBase):
         from_attributes = True
 # --------------------------------------------- #
 
+class UserPreferencesUpdate(BaseModel):
+    # 所在时区相对 UTC 的偏移 (分钟)，如东八区为 480
+    utc_offset_minutes: Optional[int] = Field(None, ge=-720, le=840)
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -51,6 +56,16 @@ class UserInDB(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    # 访问令牌的有效秒数；过期前用 refresh_token 调用 /auth/refresh 换取新的令牌
+    expires_in: Optional[int] = None
+    refresh_token: Optional[str] = None
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
+class Logout(BaseModel):
+    # 同时吊销的刷新令牌 (可选)
+    refresh_token: Optional[str] = None
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -65,6 +80,8 @@ class TaskBase(BaseModel):
     completed: bool = False
     due_date: Optional[datetime] = None
     reminder_time: Optional[datetime] = None
+    # 重复规则 (RRULE 子集，如 "FREQ=WEEKLY;BYDAY=MO,WE")，需同时指定 due_date 作为首次时间
+    recurrence_rule: Optional[str] = None
 
 class TaskCreate(TaskBase):
     pass
@@ -76,16 +93,73 @@ class TaskUpdate(TaskBase):
     completed: Optional[bool] = None
     due_date: Optional[datetime] = None
     reminder_time: Optional[datetime] = None
+    recurrence_rule: Optional[str] = None
+
+class TaskPatch(TaskUpdate):
+    # 客户端读取到的版本号；与数据库不一致时返回 409，为空时不检查
+    version: Optional[int] = None
+
+class TaskBulkComplete(BaseModel):
+    ids: List[int] = Field(..., max_length=1000)
+    completed: bool = True
+
+class TaskBulkCompleteResult(BaseModel):
+    # 实际发生变化的任务 ID (已是目标状态的任务不包含在内)
+    updated_ids: List[int]
 
 class Task(TaskBase):
     id: int
     owner_id: int
+    completed_at: Optional[datetime] = None
+    recurrence_parent_id: Optional[int] = None
+    occurrence_date: Optional[datetime] = None
+    # 为 True 时表示按重复规则即时展开、尚未写入数据库的实例，id 即所属系列的 id
+    is_virtual: bool = False
+    # 为 True 时表示来自归档表的历史任务 (只读)
+    is_archived: bool = False
+    # 虚拟实例没有版本号
+    version: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+# 日程视图：未完成的任务按用户本地时间分组；边界为 UTC 时间
+class TaskAgenda(BaseModel):
+    utc_offset_minutes: int
+    today_start: datetime
+    today_end: datetime
+    week_end: datetime
+    # 截止时间已过
+    overdue: List[Task]
+    # 截止时间在现在到今天结束之间
+    today: List[Task]
+    # 截止时间在明天到今天起第 7 天结束之间
+    this_week: List[Task]
+    # 没有截止时间
+    no_date: List[Task]
+
+# 列表的投影/摘要视图：只包含请求的字段，其余字段不出现在响应中
+class TaskPartial(BaseModel):
+    id: Optional[int] = None
+    owner_id: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    importance: Optional[ImportanceEnumSchema] = None
+    completed: Optional[bool] = None
+    completed_at: Optional[datetime] = None
+    due_date: Optional[datetime] = None
+    reminder_time: Optional[datetime] = None
+    recurrence_rule: Optional[str] = None
+    recurrence_parent_id: Optional[int] = None
+    occurrence_date: Optional[datetime] = None
+    is_virtual: Optional[bool] = None
+    is_archived: Optional[bool] = None
+    version: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 # --- 日记相关模式 ---
 
 class DiaryBase(BaseModel):
@@ -105,15 +179,42 @@ class DiaryUpdate(DiaryBase):
     entry_date: Optional[datetime] = None
     daily_rating: Optional[str] = None
 
+class DiaryPatch(DiaryUpdate):
+    # 客户端读取到的版本号；与数据库不一致时返回 409，为空时不检查
+    version: Optional[int] = None
+
 class Diary(DiaryBase):
     id: int
     owner_id: int
+    version: int = 1
     created_at: datetime
     updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+# 列表的投影/摘要视图；preview 为写入时截取的明文摘要 (加密日记不保存摘要)
+class DiaryPartial(BaseModel):
+    id: Optional[int] = None
+    owner_id: Optional[int] = None
+    title: Optional[str] = None
+    content: Optional[str] = None
+    preview: Optional[str] = None
+    is_encrypted: Optional[bool] = None
+    entry_date: Optional[datetime] = None
+    daily_rating: Optional[str] = None
+    version: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+# 已删除对象的墓碑，供客户端增量同步和缓存失效
+class Tombstone(BaseModel):
+    id: int
+    deleted_at: datetime
+
+    class Config:
+        from_attributes = True
+
 # 用于日记统计的模式
 class DiaryStats(BaseModel):
     total_entries: int
@@ -142,8 +243,54 @@ class NotificationSettingsUpdate(NotificationSettingsBase):
     pass
 
 class NotificationSettings(NotificationSettingsBase):
-    id: int
+    # 用户尚未保存过设置时返回默认值，id 为空
+    id: Optional[int] = None
     owner_id: int
 
     class Config:
         from_attributes = True
+
+# --- 后台作业相关模式 ---
+
+class JobCreate(BaseModel):
+    # 作业类型：diary_stats / export / diary_reencrypt / task_import
+    kind: str
+    params: Dict[str, Any] = {}
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    # queued / running / succeeded / failed / cancelled
+    status: str
+    progress: int
+    message: Optional[str] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class JobResult(BaseModel):
+    id: str
+    status: str
+    result: Any = None
+
+
+# --- 变更日志相关模式 ---
+
+class AuditEntry(BaseModel):
+    id: int
+    # 表名，如 tasks / diaries / notification_settings
+    object_type: str
+    object_id: Optional[int] = None
+    # create / update / delete
+    action: str
+    # 新增时为各字段的值，修改时为 {字段: [旧值, 新值]} (单条语句的修改只有新值)；敏感字段记为 "***"
+    changes: Optional[Dict[str, Any]] = None
+    created_at: datetime
+    # 哈希链：本条的 hash 覆盖内容和上一条的 hash
+    prev_hash: str
+    hash: str
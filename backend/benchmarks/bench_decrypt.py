@@ -0,0 +1,46 @@
+# backend/benchmarks/bench_decrypt.py
+"""
+日记批量解密基准测试。在 backend 目录下运行：
+
+    python -m benchmarks.bench_decrypt [--repeat 20]
+
+对比三种方式解密一页日记的耗时 (毫秒/页)：
+  serial   - 逐条调用 decrypt_data (旧的 get_diaries 实现)
+  batch    - decrypt_batch，单线程，复用 AESGCM 上下文
+  parallel - decrypt_batch，使用线程池
+"""
+import argparse
+import os
+import timeit
+
+from app.core.security import encrypt_data, decrypt_data, decrypt_batch
+
+PAGE_SIZES = [10, 50, 100]
+ENTRY_LENGTHS = [500, 5_000, 50_000]
+
+def run(repeat: int):
+    key = os.urandom(32)
+    print(f"CPU 核数: {os.cpu_count()}")
+    print(f"{'页大小':>6} {'条目长度':>8} {'serial':>10} {'batch':>10} {'parallel':>10}")
+    for entry_length in ENTRY_LENGTHS:
+        plaintext = "日" * (entry_length // 3) + "a" * (entry_length - entry_length // 3 * 3)
+        for page_size in PAGE_SIZES:
+            ciphertexts = [encrypt_data(plaintext, key) for _ in range(page_size)]
+            timings = {
+                "serial": lambda: [decrypt_data(text, key) for text in ciphertexts],
+                "batch": lambda: decrypt_batch(ciphertexts, key, parallel=False),
+                "parallel": lambda: decrypt_batch(ciphertexts, key, parallel=True),
+            }
+            results = {
+                name: min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+                for name, fn in timings.items()
+            }
+            print(
+                f"{page_size:>6} {entry_length:>8} "
+                f"{results['serial']:>9.2f}ms {results['batch']:>9.2f}ms {results['parallel']:>9.2f}ms"
+            )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="日记批量解密基准测试")
+    parser.add_argument("--repeat", type=int, default=20)
+    run(parser.parse_args().repeat)
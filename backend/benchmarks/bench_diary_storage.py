@@ -0,0 +1,110 @@
+# backend/benchmarks/bench_diary_storage.py
+"""
+日记内容存储格式基准测试。在 backend 目录下运行：
+
+    python -m benchmarks.bench_diary_storage [--entries 300] [--length 8000]
+
+在临时 SQLite 数据库中分别以以下格式写入同一批加密/明文长日记，
+报告存储大小 (content + content_blob 字节数)、写入耗时和整页解密读取耗时：
+  legacy      - base64 文本密文，不压缩 (旧格式)
+  binary      - 二进制密文，不压缩
+  binary+zlib - 先 zlib 压缩再加密，二进制存储
+  binary+zstd - 先 zstd 压缩再加密，二进制存储 (需安装 zstandard)
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.compression import available_codecs
+from app.database import Base
+from app.models.models import User, Diary
+from app.schemas.schemas import DiaryCreate
+from app.crud import diaries as crud_diaries
+
+WORDS = (
+    "今天 天气 不错 工作 会议 项目 进展 顺利 晚上 读书 跑步 朋友 家人 计划 明天 "
+    "the quick brown fox jumps over lazy dog meeting notes project deadline review "
+    "weekend coffee morning evening thoughts feeling grateful tired happy"
+).split()
+
+FORMATS = [
+    ("legacy", False, "none"),
+    ("binary", True, "none"),
+    ("binary+zlib", True, "zlib"),
+    ("binary+zstd", True, "zstd"),
+]
+
+def make_entry(rng: random.Random, length: int) -> str:
+    parts, size = [], 0
+    while size < length:
+        word = rng.choice(WORDS)
+        parts.append(word)
+        size += len(word) + 1
+    return " ".join(parts)[:length]
+
+def run_format(name: str, binary: bool, codec: str, entries: list, page_size: int):
+    settings.DIARY_BINARY_STORAGE = binary
+    settings.DIARY_COMPRESSION = codec
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        db = Session()
+        db.add(User(id=1, username="bench", hashed_password="x", diary_encryption_salt="c2FsdHNhbHRzYWx0c2FsdA=="))
+        db.commit()
+
+        base_date = datetime(2020, 1, 1)
+        start = time.perf_counter()
+        for i, (content, encrypted) in enumerate(entries):
+            crud_diaries.create_user_diary(
+                db, DiaryCreate(content=content, is_encrypted=encrypted, entry_date=base_date + timedelta(days=i)), user_id=1
+            )
+        write_ms = (time.perf_counter() - start) * 1000 / len(entries)
+
+        stored_bytes = sum(
+            len(content.encode('utf-8')) + len(blob or b"")
+            for content, blob in db.query(Diary.content, Diary.content_blob)
+        )
+
+        db.expunge_all()
+        start = time.perf_counter()
+        rounds = 5
+        for _ in range(rounds):
+            db.expunge_all()
+            crud_diaries.get_diaries(db, user_id=1, limit=page_size, decrypt=True)
+        read_ms = (time.perf_counter() - start) * 1000 / rounds
+        db.close()
+        engine.dispose()
+    return write_ms, stored_bytes, read_ms
+
+def run(entry_count: int, length: int, page_size: int):
+    rng = random.Random(42)
+    entries = [(make_entry(rng, length), i % 2 == 0) for i in range(entry_count)]
+    raw_bytes = sum(len(content.encode('utf-8')) for content, _ in entries)
+    print(f"{entry_count} 篇日记，每篇约 {length} 字符，一半加密，明文共 {raw_bytes} 字节")
+    print(f"{'格式':<12} {'存储字节':>10} {'占比':>7} {'写入/篇':>10} {'读取/页':>10}")
+    for name, binary, codec in FORMATS:
+        if codec != "none" and codec not in available_codecs():
+            print(f"{name:<12} (未安装 {codec}，跳过)")
+            continue
+        write_ms, stored_bytes, read_ms = run_format(name, binary, codec, entries, page_size)
+        print(
+            f"{name:<12} {stored_bytes:>12} {stored_bytes / raw_bytes * 100:>6.1f}% "
+            f"{write_ms:>8.2f}ms {read_ms:>8.2f}ms"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="日记内容存储格式基准测试")
+    parser.add_argument("--entries", type=int, default=300)
+    parser.add_argument("--length", type=int, default=8000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+    run(args.entries, args.length, args.page_size)
@@ -0,0 +1,99 @@
+# backend/benchmarks/bench_memory.py
+"""
+列表读取路径的内存基准测试。在 backend 目录下运行：
+
+    python -m benchmarks.bench_memory [--page-size 1000] [--rounds 3]
+
+在临时 SQLite 数据库中写入一页任务和日记，用 tracemalloc 测量读取一整页
+(查询 + 校验为响应模型 + 序列化为 JSON) 过程中的峰值内存：
+  orm  - 查询完整的 ORM 对象 (身份映射、属性埋点、修改跟踪)，即旧的 get_tasks / get_diaries 实现
+  lean - crud.get_tasks / get_diaries 当前的实现，按列元组查询，返回 Row / DiaryRow
+每轮使用新的会话，取各轮的最小值。
+"""
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.models import User, Task, Diary
+from app.schemas.schemas import Task as TaskSchema, Diary as DiarySchema
+from app.crud import tasks as crud_tasks
+from app.crud import diaries as crud_diaries
+from app.crud.diary_keys import DiaryKeyRing
+
+def seed(Session, page_size: int):
+    db = Session()
+    db.add(User(id=1, username="bench", hashed_password="x", diary_encryption_salt="x"))
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    for i in range(page_size):
+        db.add(Task(
+            owner_id=1, title=f"task {i}", description="x" * 200,
+            due_date=start + timedelta(hours=i), created_at=start
+        ))
+        db.add(Diary(
+            owner_id=1, title=f"diary {i}", content="word " * 100,
+            entry_date=start + timedelta(days=i), created_at=start
+        ))
+    db.commit()
+    db.close()
+
+def orm_tasks(db, page_size: int):
+    return db.query(Task).filter(Task.owner_id == 1, Task.deleted_at.is_(None)).offset(0).limit(page_size).all()
+
+def orm_diaries(db, page_size: int):
+    diaries = db.query(Diary).filter(Diary.owner_id == 1, Diary.deleted_at.is_(None)).offset(0).limit(page_size).all()
+    crud_diaries._present_diaries(diaries, DiaryKeyRing(db, 1))
+    return diaries
+
+def measure(Session, load, adapter: TypeAdapter, page_size: int, rounds: int) -> int:
+    peaks = []
+    for _ in range(rounds):
+        db = Session()
+        gc.collect()
+        tracemalloc.start()
+        rows = load(db, page_size)
+        assert len(rows) == page_size
+        adapter.dump_json(adapter.validate_python(rows))
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del rows
+        db.close()
+    return min(peaks)
+
+def main():
+    parser = argparse.ArgumentParser(description="列表读取路径的内存基准测试")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        seed(Session, args.page_size)
+
+        cases = [
+            ("tasks", TypeAdapter(List[TaskSchema]), orm_tasks,
+             lambda db, n: crud_tasks.get_tasks(db, user_id=1, limit=n)),
+            ("diaries", TypeAdapter(List[DiarySchema]), orm_diaries,
+             lambda db, n: crud_diaries.get_diaries(db, user_id=1, limit=n)),
+        ]
+        print(f"每页 {args.page_size} 行，峰值内存 (tracemalloc)")
+        for name, adapter, orm_load, lean_load in cases:
+            orm_peak = measure(Session, orm_load, adapter, args.page_size, args.rounds)
+            lean_peak = measure(Session, lean_load, adapter, args.page_size, args.rounds)
+            for label, peak in (("orm", orm_peak), ("lean", lean_peak)):
+                print(f"{name:<8} {label:<5} {peak / 1024:>10.1f} KiB  {peak / args.page_size:>8.0f} B/行")
+            print(f"{name:<8} 节省  {(1 - lean_peak / orm_peak) * 100:>9.1f}%")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# backend/benchmarks/bench_recurrence.py
+"""
+重复任务惰性展开基准测试。在 backend 目录下运行：
+
+    python -m benchmarks.bench_recurrence [--series 1000] [--window-days 7]
+
+在临时 SQLite 数据库中创建一批重复任务 (每日 / 每周多天 / 每月 / 有 COUNT 的有限系列混合)，
+首次时间分布在过去两年内，另有少量已物化的实例。报告：
+  expand   - 只对已加载的系列做窗口展开 (纯计算)
+  get_tasks - 完整的 crud.get_tasks 窗口查询 (含 SQL 查询与合并排序)
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.models import User, Task
+from app.schemas.schemas import TaskCreate, TaskUpdate
+from app.core.recurrence import parse_rrule, iter_occurrences
+from app.crud import tasks as crud_tasks
+
+RULES = [
+    "FREQ=DAILY",
+    "FREQ=DAILY;INTERVAL=2",
+    "FREQ=WEEKLY;BYDAY=MO,WE,FR",
+    "FREQ=WEEKLY;INTERVAL=2",
+    "FREQ=MONTHLY;BYMONTHDAY=1,15",
+    "FREQ=DAILY;COUNT=500",
+]
+
+def timed(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) * 1000 / rounds
+
+def run(series: int, window_days: int, rounds: int):
+    rng = random.Random(42)
+    now = datetime(2024, 6, 3, 9, 0)
+    window_start, window_end = now, now + timedelta(days=window_days)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        db = Session()
+        db.add(User(id=1, username="bench", hashed_password="x", diary_encryption_salt="c2FsdHNhbHRzYWx0c2FsdA=="))
+        db.commit()
+
+        for i in range(series):
+            crud_tasks.create_user_task(db, TaskCreate(
+                title=f"重复任务 {i}",
+                due_date=now - timedelta(days=rng.randint(0, 730), hours=rng.randint(0, 12)),
+                recurrence_rule=RULES[i % len(RULES)]
+            ), user_id=1)
+        # 每 20 个系列完成一个窗口内的实例
+        for master in db.query(Task).filter(Task.recurrence_rule.isnot(None)).all()[::20]:
+            occurrence = next(iter_occurrences(parse_rrule(master.recurrence_rule), master.due_date, start=window_start, end=window_end), None)
+            if occurrence is not None:
+                crud_tasks.materialize_occurrence(db, master.id, 1, occurrence, TaskUpdate(completed=True))
+
+        masters = db.query(Task).filter(Task.recurrence_rule.isnot(None)).all()
+        parsed = [(parse_rrule(master.recurrence_rule), master.due_date) for master in masters]
+
+        def expand():
+            return [
+                occurrence for rule, dtstart in parsed
+                for occurrence in iter_occurrences(rule, dtstart, start=window_start, end=window_end)
+            ]
+
+        def query(limit):
+            db.expunge_all()
+            return crud_tasks.get_tasks(db, user_id=1, limit=limit, due_date_after=window_start, due_date_before=window_end)
+
+        occurrence_count = len(expand())
+        print(f"{series} 个重复系列，{window_days} 天窗口内共 {occurrence_count} 个实例")
+        print(f"expand            {timed(expand, rounds):>8.2f}ms")
+        print(f"get_tasks(100)    {timed(lambda: query(100), rounds):>8.2f}ms")
+        print(f"get_tasks(全部)   {timed(lambda: query(occurrence_count), rounds):>8.2f}ms")
+        db.close()
+        engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重复任务惰性展开基准测试")
+    parser.add_argument("--series", type=int, default=1000)
+    parser.add_argument("--window-days", type=int, default=7)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    run(args.series, args.window_days, args.rounds)
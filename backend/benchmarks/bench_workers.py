@@ -0,0 +1,197 @@
+# backend/benchmarks/bench_workers.py
+"""
+单 worker 与多 worker 部署的吞吐对比。在 backend 目录下运行：
+
+    python -m benchmarks.bench_workers [--workers 1 4] [--duration 10] [--concurrency 32]
+                                       [--database-url postgresql://...]
+
+对每个 worker 数，用 python -m scripts.serve 在本机启动服务 (默认使用临时 SQLite 文件)，
+写入一批任务和日记后，依次对 app/api/ 中的主要接口施压 --duration 秒：
+由 --client-processes 个进程 (默认 CPU 核数) 共 --concurrency 个保持连接的客户端并发请求。
+报告每个接口的 req/s、p50、p99 延迟，以及相对第一个 worker 数的吞吐倍数。
+
+注意：压测客户端与服务在同一台机器上会争用 CPU，结果只适合比较不同 worker 数之间的差异；
+/auth/token 是 bcrypt 计算密集型接口，最能体现多进程的收益。
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from base64 import urlsafe_b64encode
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlencode
+
+API = "/api/v1"
+USERNAME = "bench"
+PASSWORD = "bench-password"
+
+def scenarios(token: str) -> list:
+    """(名称, 方法, 路径, 请求体, Content-Type)；请求体中的 {n} 会被替换为递增序号"""
+    return [
+        ("GET /tasks/", "GET", f"{API}/tasks/?limit=100", None, None),
+        ("GET /tasks/?view=summary", "GET", f"{API}/tasks/?limit=100&view=summary", None, None),
+        ("GET /diaries/?view=summary", "GET", f"{API}/diaries/?limit=100&view=summary", None, None),
+        ("GET /diaries/stats/summary", "GET", f"{API}/diaries/stats/summary", None, None),
+        ("GET /notifications/settings", "GET", f"{API}/notifications/settings", None, None),
+        ("GET /auth/me", "GET", f"{API}/auth/me", None, None),
+        ("POST /tasks/", "POST", f"{API}/tasks/", '{{"title": "bench {n}"}}', "application/json"),
+        ("POST /auth/token", "POST", f"{API}/auth/token",
+         urlencode({"username": USERNAME, "password": PASSWORD}), "application/x-www-form-urlencoded"),
+    ]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def request(conn: http.client.HTTPConnection, method: str, path: str, body=None, headers=None):
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    return response.status, response.read()
+
+def start_server(workers: int, port: int, env: dict) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "scripts.serve", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("服务启动失败，请直接运行 python -m scripts.serve 查看错误")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            if request(conn, "GET", "/")[0] == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("等待服务启动超时")
+
+def seed(port: int, tasks: int, diaries: int) -> str:
+    """注册压测用户并写入数据，返回访问令牌"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    request(conn, "POST", f"{API}/auth/register", json.dumps({"username": USERNAME, "password": PASSWORD}),
+            {"Content-Type": "application/json"})
+    _, body = request(conn, "POST", f"{API}/auth/token", urlencode({"username": USERNAME, "password": PASSWORD}),
+                  {"Content-Type": "application/x-www-form-urlencoded"})
+    token = json.loads(body)["access_token"]
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+    for i in range(tasks):
+        request(conn, "POST", f"{API}/tasks/", json.dumps({"title": f"task {i}", "description": "x" * 200}), headers)
+    for i in range(diaries):
+        entry_date = time.strftime("%Y-%m-%dT00:00:00", time.gmtime(1577836800 + i * 86400))
+        request(conn, "POST", f"{API}/diaries/", json.dumps({"content": "word " * 300, "entry_date": entry_date}), headers)
+    return token
+
+def _client_loop(port: int, method: str, path: str, body, headers: dict, deadline: float, offset: int) -> tuple:
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    latencies, errors, n = [], 0, offset
+    while time.monotonic() < deadline:
+        payload = body.format(n=n) if body else None
+        n += 1
+        start = time.perf_counter()
+        try:
+            status, _ = request(conn, method, path, payload, headers)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+            errors += 1
+            continue
+        if status >= 400:
+            # 失败的请求 (如 429/503) 不计入吞吐和延迟
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return latencies, errors
+
+def _client_process(args) -> tuple:
+    port, method, path, body, headers, duration, threads, offset = args
+    deadline = time.monotonic() + duration
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [
+            pool.submit(_client_loop, port, method, path, body, headers, deadline, offset + i * 1_000_000)
+            for i in range(threads)
+        ]
+        results = [future.result() for future in futures]
+    return [latency for latencies, _ in results for latency in latencies], sum(errors for _, errors in results)
+
+def run_scenario(pool, port: int, scenario, token: str, duration: float, concurrency: int, processes: int) -> dict:
+    name, method, path, body, content_type = scenario
+    headers = {"Authorization": f"Bearer {token}"}
+    if content_type:
+        headers["Content-Type"] = content_type
+    per_process = [concurrency // processes + (1 if i < concurrency % processes else 0) for i in range(processes)]
+    jobs = [
+        (port, method, path, body, headers, duration, threads, i * 100_000_000)
+        for i, threads in enumerate(per_process) if threads
+    ]
+    latencies, errors = [], 0
+    for process_latencies, process_errors in pool.map(_client_process, jobs):
+        latencies.extend(process_latencies)
+        errors += process_errors
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {"rps": len(latencies) / duration, "p50": percentile(0.5), "p99": percentile(0.99), "errors": errors}
+
+def main():
+    parser = argparse.ArgumentParser(description="单 worker 与多 worker 部署的吞吐对比")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--duration", type=float, default=10, help="每个接口的施压秒数")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发客户端总数")
+    parser.add_argument("--client-processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--diaries", type=int, default=200)
+    parser.add_argument("--database-url", default=None, help="默认使用临时 SQLite 文件，PostgreSQL 需为空库")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, ProcessPoolExecutor(max_workers=args.client_processes) as pool:
+        for workers in args.workers:
+            database_url = args.database_url or f"sqlite:///{os.path.join(tmp, f'bench_{workers}.db')}"
+            env = dict(
+                os.environ,
+                DATABASE_URL=database_url,
+                # 压测登录接口时不限流
+                LOGIN_RATE_LIMIT_IP_CAPACITY="1000000",
+                LOGIN_RATE_LIMIT_IP_PER_MINUTE="1000000",
+                LOGIN_RATE_LIMIT_USER_CAPACITY="1000000",
+                LOGIN_RATE_LIMIT_USER_PER_MINUTE="1000000",
+                LOGIN_MAX_CONCURRENT_HASHES="1000000",
+                SERVER_MAX_REQUESTS="0",
+                SERVER_MAX_MEMORY_MB="0",
+            )
+            # 服务要求配置 DIARY_KEK；压测时未配置则使用临时生成的密钥
+            env.setdefault("DIARY_KEK", urlsafe_b64encode(os.urandom(32)).decode())
+            port = free_port()
+            server = start_server(workers, port, env)
+            try:
+                token = seed(port, args.tasks, args.diaries)
+                for scenario in scenarios(token):
+                    result = run_scenario(pool, port, scenario, token, args.duration, args.concurrency, args.client_processes)
+                    results.setdefault(scenario[0], {})[workers] = result
+                    print(f"workers={workers:<3} {scenario[0]:<30} {result['rps']:>9.1f} req/s  "
+                          f"p50 {result['p50']:>7.1f} ms  p99 {result['p99']:>7.1f} ms  errors {result['errors']}")
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+
+    baseline = args.workers[0]
+    print()
+    print(f"{'接口':<30}" + "".join(f"{f'{w} worker':>16}" for w in args.workers) + f"{'倍数':>10}")
+    for name, by_workers in results.items():
+        row = "".join(f"{by_workers[w]['rps']:>12.1f} r/s" for w in args.workers)
+        base = by_workers[baseline]["rps"]
+        ratio = by_workers[args.workers[-1]]["rps"] / base if base else 0
+        print(f"{name:<30}{row}{ratio:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
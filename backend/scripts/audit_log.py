@@ -0,0 +1,82 @@
+# backend/scripts/audit_log.py
+"""
+变更日志工具。在 backend 目录下运行：
+
+    python -m scripts.audit_log verify [--batch-size 1000]
+    python -m scripts.audit_log show [--user-id ID] [--object-type tasks --object-id ID] [--limit 50]
+    python -m scripts.audit_log replay [--path audit_dead_letter.jsonl]
+
+verify: 从头重新计算哈希链，报告第一条被修改、删除或插入的日志 (有问题时退出码为 1)，
+        适合由 cron 定期执行；
+show:   按用户和/或对象查看最近的变更记录；
+replay: 把写入失败后保存在死信文件 (AUDIT_DEAD_LETTER_PATH) 中的变更重新追加到哈希链，
+        成功后删除该文件。序号按追加顺序分配，created_at 保留原来的时间。
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+from app.core.config import settings
+from app.database import SessionLocal, sync_schema
+from app.crud.audit import append_audit_entries, get_audit_log, verify_audit_chain
+
+def replay_dead_letters(db, path: str) -> int:
+    """
+    在一个事务中重新写入死信文件中的变更，返回写入的条数。
+    先改名再读取，运行中的服务新写入的死信不会被一并删除；上次中途失败留下的 .replaying 文件优先处理。
+    """
+    replaying = f"{path}.replaying"
+    if not os.path.exists(replaying):
+        if not os.path.exists(path):
+            return 0
+        os.replace(path, replaying)
+    with open(replaying, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    for entry in entries:
+        entry["created_at"] = datetime.fromisoformat(entry["created_at"])
+    written = append_audit_entries(db, entries)
+    os.remove(replaying)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="变更日志工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    verify_parser = subparsers.add_parser("verify", help="校验哈希链")
+    verify_parser.add_argument("--batch-size", type=int, default=1000)
+    show_parser = subparsers.add_parser("show", help="查看变更记录")
+    show_parser.add_argument("--user-id", type=int, default=None)
+    show_parser.add_argument("--object-type", default=None, help="表名，如 tasks、diaries")
+    show_parser.add_argument("--object-id", type=int, default=None)
+    show_parser.add_argument("--limit", type=int, default=50)
+    replay_parser = subparsers.add_parser("replay", help="重新写入死信文件中的变更")
+    replay_parser.add_argument("--path", default=settings.AUDIT_DEAD_LETTER_PATH)
+
+    args = parser.parse_args()
+    sync_schema()
+
+    db = SessionLocal()
+    try:
+        if args.command == "verify":
+            result = verify_audit_chain(db, batch_size=args.batch_size)
+            if result["valid"]:
+                print(f"哈希链完整，共 {result['checked']} 条")
+            else:
+                print(f"哈希链在第 {result['broken_at']} 条处断开：{result['reason']} (此前 {result['checked']} 条完整)")
+                sys.exit(1)
+        elif args.command == "replay":
+            print(f"已重新写入 {replay_dead_letters(db, args.path)} 条变更")
+        else:
+            entries = get_audit_log(
+                db, user_id=args.user_id, object_type=args.object_type, object_id=args.object_id, limit=args.limit
+            )
+            for entry in entries:
+                print(f"{entry.id:>8} {entry.created_at} user={entry.owner_id} "
+                      f"{entry.object_type}/{entry.object_id} {entry.action} {entry.changes or ''}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
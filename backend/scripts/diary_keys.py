@@ -0,0 +1,110 @@
+# backend/scripts/diary_keys.py
+"""
+日记信封加密维护工具。在 backend 目录下运行：
+
+    python -m scripts.diary_keys generate-kek
+    python -m scripts.diary_keys legacy-kek [--kek-id v1]
+    python -m scripts.diary_keys migrate [--batch-size 200] [--after-id 0]
+    python -m scripts.diary_keys rewrap  [--batch-size 500]
+
+generate-kek: 生成一个随机 KEK (urlsafe base64 编码的 32 字节)，用作 DIARY_KEK。
+legacy-kek:   输出旧版本在未配置 DIARY_KEK 时由当前 SECRET_KEY 派生的 KEK。
+migrate:      将旧版 (PBKDF2 口令派生密钥) 加密的日记迁移到每用户数据密钥。
+              按批提交；已迁移的行 key_id 不再为空，因此中断后直接重新执行即可续跑。
+rewrap:       KEK 轮换后，用当前 DIARY_KEK 重新包裹所有 DEK，不触碰日记密文。
+
+DIARY_KEK 必须单独配置，与 SECRET_KEY 无关，未配置时服务拒绝启动。
+
+从 "KEK 由 SECRET_KEY 派生" 的旧版本升级 (务必在修改 SECRET_KEY 之前完成)：
+  1. 用旧的 SECRET_KEY 运行 legacy-kek --kek-id <当前 DIARY_KEK_ID>；
+  2. 把输出设为 DIARY_KEK，DIARY_KEK_ID 保持不变，重启服务。已有的 DEK 无需重新包裹，
+     此后轮换 SECRET_KEY 不再影响日记。
+
+轮换 KEK (例如怀疑 KEK 泄露)：
+  1. generate-kek 生成新密钥；
+  2. 设置 DIARY_KEK=<新密钥>、DIARY_KEK_ID=<新的版本，如 v2>，
+     把旧的 KEK 放入 DIARY_RETIRED_KEKS (如 {"v1": "<旧密钥>"})，重启服务；
+  3. 运行 rewrap，完成后从 DIARY_RETIRED_KEKS 中删除旧 KEK 并再次重启。
+"""
+import argparse
+import secrets
+from base64 import urlsafe_b64encode
+from typing import Dict
+
+from app.core.config import settings
+from app.core.security import derive_legacy_kek
+from app.database import SessionLocal, sync_schema
+from app.models.models import Diary
+from app.crud.diary_keys import DiaryKeyRing, rewrap_diary_keys
+from app.crud.diaries import pack_diary_content, unpack_diary_contents
+
+def migrate_legacy_diaries(batch_size: int = 200, after_id: int = 0) -> dict:
+    """逐批把 key_id 为空的加密日记用旧密钥解密、再用活动 DEK 加密。"""
+    db = SessionLocal()
+    keyrings: Dict[int, DiaryKeyRing] = {}
+    migrated, failed, last_id = 0, 0, after_id
+    try:
+        while True:
+            batch = db.query(Diary).filter(
+                Diary.is_encrypted == True,
+                Diary.key_id.is_(None),
+                Diary.id > last_id
+            ).order_by(Diary.id).limit(batch_size).all()
+            if not batch:
+                break
+
+            for diary in batch:
+                last_id = diary.id
+                keyring = keyrings.setdefault(diary.owner_id, DiaryKeyRing(db, diary.owner_id))
+                try:
+                    plaintext = unpack_diary_contents([diary], keyring)[diary.id]
+                except ValueError:
+                    failed += 1
+                    continue
+                diary.key_id, key = keyring.active()
+                for field, value in pack_diary_content(plaintext, key).items():
+                    setattr(diary, field, value)
+                migrated += 1
+
+            db.commit()
+            print(f"已迁移 {migrated} 条，失败 {failed} 条，进度 id={last_id}")
+    finally:
+        db.close()
+    return {"migrated": migrated, "failed": failed, "last_id": last_id}
+
+def main():
+    parser = argparse.ArgumentParser(description="日记信封加密维护工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help="迁移旧版加密日记到每用户数据密钥")
+    migrate_parser.add_argument("--batch-size", type=int, default=200)
+    migrate_parser.add_argument("--after-id", type=int, default=0, help="从该日记 ID 之后开始处理")
+
+    rewrap_parser = subparsers.add_parser("rewrap", help="用当前 KEK 重新包裹所有数据密钥")
+    rewrap_parser.add_argument("--batch-size", type=int, default=500)
+
+    subparsers.add_parser("generate-kek", help="生成随机 KEK")
+    legacy_parser = subparsers.add_parser("legacy-kek", help="输出由当前 SECRET_KEY 派生的旧版 KEK")
+    legacy_parser.add_argument("--kek-id", default=settings.DIARY_KEK_ID)
+
+    args = parser.parse_args()
+    if args.command == "generate-kek":
+        print(urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8'))
+        return
+    if args.command == "legacy-kek":
+        print(urlsafe_b64encode(derive_legacy_kek(settings.SECRET_KEY, args.kek_id)).decode('utf-8'))
+        return
+    sync_schema()
+
+    if args.command == "migrate":
+        result = migrate_legacy_diaries(batch_size=args.batch_size, after_id=args.after_id)
+        print(f"完成：{result}")
+    else:
+        db = SessionLocal()
+        try:
+            print(f"已重新包裹 {rewrap_diary_keys(db, batch_size=args.batch_size)} 个数据密钥")
+        finally:
+            db.close()
+
+if __name__ == "__main__":
+    main()
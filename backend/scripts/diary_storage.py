@@ -0,0 +1,123 @@
+# backend/scripts/diary_storage.py
+"""
+日记内容存储维护工具。在 backend 目录下运行：
+
+    python -m scripts.diary_storage convert [--batch-size 200] [--after-id 0]
+    python -m scripts.diary_storage report
+
+convert: 将旧格式 (base64 密文 / 未压缩明文) 的日记按当前配置重新编码：
+         先按 DIARY_COMPRESSION 压缩，再按 DIARY_BINARY_STORAGE 以二进制存储。
+         加密日记保持原有 key_id 不变，明文日记同时补齐列表摘要 (preview)。
+         按 ID 游标分批提交，可从 --after-id 续跑。
+report:  统计当前各存储格式的行数与存储大小 (文本列按数据库 length() 计)。
+"""
+import argparse
+from typing import Dict
+
+from sqlalchemy import func
+
+from app.database import SessionLocal, sync_schema
+from app.models.models import Diary
+from app.crud.diary_keys import DiaryKeyRing
+from app.crud.diaries import pack_diary_content, unpack_diary_contents
+
+def convert_diaries(batch_size: int = 200, after_id: int = 0) -> dict:
+    db = SessionLocal()
+    keyrings: Dict[int, DiaryKeyRing] = {}
+    converted, skipped, failed, last_id = 0, 0, 0, after_id
+    bytes_before, bytes_after = 0, 0
+    try:
+        while True:
+            batch = db.query(Diary).filter(
+                Diary.content_blob.is_(None),
+                Diary.id > last_id
+            ).order_by(Diary.id).limit(batch_size).all()
+            if not batch:
+                break
+
+            for diary in batch:
+                last_id = diary.id
+                keyring = keyrings.setdefault(diary.owner_id, DiaryKeyRing(db, diary.owner_id))
+                try:
+                    plaintext = unpack_diary_contents([diary], keyring)[diary.id]
+                    key = keyring.get(diary.key_id) if diary.is_encrypted else None
+                except ValueError:
+                    failed += 1
+                    continue
+
+                packed = pack_diary_content(plaintext, key)
+                if not diary.is_encrypted and packed["content_blob"] is None:
+                    diary.preview = packed["preview"] # 短文本不压缩，只补齐摘要
+                    skipped += 1
+                    continue
+                before = len(diary.content.encode('utf-8'))
+                after = len(packed["content"].encode('utf-8')) + len(packed["content_blob"] or b"")
+                for field, value in packed.items():
+                    setattr(diary, field, value)
+                bytes_before += before
+                bytes_after += after
+                converted += 1
+
+            db.commit()
+            print(f"已转换 {converted} 条，跳过 {skipped} 条，失败 {failed} 条，进度 id={last_id}")
+    finally:
+        db.close()
+    return {
+        "converted": converted,
+        "skipped": skipped,
+        "failed": failed,
+        "last_id": last_id,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+    }
+
+def storage_report() -> list:
+    """按 (是否加密, 是否二进制, 压缩编码) 分组统计行数和存储字节数"""
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            Diary.is_encrypted,
+            Diary.content_blob.isnot(None),
+            Diary.content_codec,
+            func.count(Diary.id),
+            func.coalesce(func.sum(func.length(Diary.content)), 0),
+            func.coalesce(func.sum(func.length(Diary.content_blob)), 0),
+        ).group_by(Diary.is_encrypted, Diary.content_blob.isnot(None), Diary.content_codec).all()
+    finally:
+        db.close()
+    return [
+        {
+            "is_encrypted": bool(is_encrypted),
+            "binary": bool(binary),
+            "codec": codec or "none",
+            "rows": count,
+            "bytes": int(text_bytes) + int(blob_bytes),
+        }
+        for is_encrypted, binary, codec, count, text_bytes, blob_bytes in rows
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="日记内容存储维护工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="按当前配置重新编码旧格式日记")
+    convert_parser.add_argument("--batch-size", type=int, default=200)
+    convert_parser.add_argument("--after-id", type=int, default=0, help="从该日记 ID 之后开始处理")
+    subparsers.add_parser("report", help="统计各存储格式的行数与字节数")
+
+    args = parser.parse_args()
+    sync_schema()
+
+    if args.command == "convert":
+        result = convert_diaries(batch_size=args.batch_size, after_id=args.after_id)
+        if result["bytes_before"]:
+            ratio = result["bytes_after"] / result["bytes_before"] * 100
+            print(f"已转换条目大小: {result['bytes_before']} -> {result['bytes_after']} 字节 ({ratio:.1f}%)")
+        print(f"完成：{result}")
+    else:
+        print(f"{'加密':>4} {'二进制':>6} {'编码':>6} {'行数':>8} {'字节数':>12}")
+        for row in storage_report():
+            print(f"{str(row['is_encrypted']):>6} {str(row['binary']):>8} {row['codec']:>8} {row['rows']:>8} {row['bytes']:>14}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# backend/scripts/job_worker.py
+"""
+后台作业 worker。在 backend 目录下运行：
+
+    python -m scripts.job_worker [--once] [--max-jobs N] [--concurrency 2]
+
+JOB_BACKEND=database 时从 jobs 表中按提交顺序领取排队中的作业执行，队列为空时每 JOB_POLL_INTERVAL 秒轮询一次；
+--once 处理完当前队列即退出 (适合由 cron 定时执行)。可同时运行多个 worker，作业通过条件 UPDATE 领取，不会重复执行。
+JOB_BACKEND=celery 时启动 celery worker (--concurrency 为进程数)。
+"""
+import argparse
+
+from app.core.config import settings
+from app.database import sync_schema
+from app.core import jobs
+
+def main():
+    parser = argparse.ArgumentParser(description="后台作业 worker")
+    parser.add_argument("--once", action="store_true", help="处理完当前排队的作业后退出")
+    parser.add_argument("--max-jobs", type=int, default=None, help="执行该数量的作业后退出 (便于定期重启 worker)")
+    parser.add_argument("--concurrency", type=int, default=2, help="celery worker 的进程数")
+    args = parser.parse_args()
+    sync_schema()
+
+    if settings.JOB_BACKEND == "celery":
+        jobs.backend.app.worker_main(["worker", "--loglevel=INFO", f"--concurrency={args.concurrency}"])
+        return
+    if settings.JOB_BACKEND != "database":
+        print(f"注意：JOB_BACKEND={settings.JOB_BACKEND}，API 进程不会把作业留给本 worker，这里只处理已排队的作业")
+    executed = jobs.run_worker(max_jobs=args.max_jobs, once=args.once)
+    print(f"完成：执行了 {executed} 个作业")
+
+if __name__ == "__main__":
+    main()
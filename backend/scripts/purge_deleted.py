@@ -0,0 +1,49 @@
+# backend/scripts/purge_deleted.py
+"""
+软删除数据清理工具。在 backend 目录下运行 (适合由 cron 等定时执行)：
+
+    python -m scripts.purge_deleted purge [--retention-days 30] [--batch-size 500]
+    python -m scripts.purge_deleted delete-user --user-id ID
+
+purge:       物理删除墓碑 (deleted_at) 超过保留期的任务和日记，以及结束超过 JOB_RESULT_RETENTION_DAYS 天的后台作业，
+             分批提交，可随时中断后重新执行；同时删除令牌已过期的吊销记录 (revoked_tokens)。
+delete-user: 删除用户及其全部任务、归档任务、日记、日记密钥、通知设置和后台作业 (不可恢复)；
+             变更日志 (audit_log) 只追加，不会删除。
+"""
+import argparse
+
+from app.database import SessionLocal, sync_schema
+from app.crud.purge import purge_all_tombstones
+from app.crud.jobs import purge_finished_jobs
+from app.crud.tokens import purge_expired_revocations
+from app.crud.users import delete_user
+
+def main():
+    parser = argparse.ArgumentParser(description="软删除数据清理工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    purge_parser = subparsers.add_parser("purge", help="物理删除超过保留期的墓碑")
+    purge_parser.add_argument("--retention-days", type=int, default=None, help="默认使用 SOFT_DELETE_RETENTION_DAYS")
+    purge_parser.add_argument("--batch-size", type=int, default=None)
+    delete_user_parser = subparsers.add_parser("delete-user", help="删除用户及其全部数据")
+    delete_user_parser.add_argument("--user-id", type=int, required=True)
+
+    args = parser.parse_args()
+    sync_schema()
+
+    db = SessionLocal()
+    try:
+        if args.command == "purge":
+            result = purge_all_tombstones(db, retention_days=args.retention_days, batch_size=args.batch_size)
+            result["jobs"] = purge_finished_jobs(db, batch_size=args.batch_size)
+            result["revoked_tokens"] = purge_expired_revocations(db)
+            print(f"完成：{result}")
+        elif delete_user(db, args.user_id):
+            print(f"已删除用户 {args.user_id} 及其全部数据")
+        else:
+            print(f"用户 {args.user_id} 不存在")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# backend/scripts/serve.py
+"""
+生产环境启动入口。在 backend 目录下运行 (Docker 镜像的默认命令)：
+
+    python -m scripts.serve [--workers N] [--host 0.0.0.0] [--port 8000]
+
+- 以 N 个 uvicorn worker 进程运行 (默认 SERVER_WORKERS，为 0 时按 CPU 核数)，进程之间不共享内存；
+- 启动 worker 之前执行一次 sync_schema，worker 启动时不再重复执行，避免并发建表；
+- 实际的 worker 数写回环境变量 SERVER_WORKERS，每个 worker 据此把 DB_MAX_CONNECTIONS 平分为自己的连接池，
+  并按连接数设置执行同步路由的线程数；
+- SERVER_MAX_REQUESTS / SERVER_MAX_MEMORY_MB 控制 worker 回收，收到 SIGTERM 时等待处理中的请求最多
+  SERVER_GRACEFUL_TIMEOUT 秒后退出。
+
+开发时仍可使用 uvicorn app.main:app --reload (单进程)。
+"""
+import argparse
+import os
+
+import uvicorn
+
+from app.core.config import settings
+
+def resolve_workers(requested: int = 0) -> int:
+    return requested or settings.SERVER_WORKERS or os.cpu_count() or 1
+
+def main():
+    parser = argparse.ArgumentParser(description="生产环境启动入口")
+    parser.add_argument("--workers", type=int, default=0, help="worker 进程数，默认 SERVER_WORKERS 或 CPU 核数")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    workers = resolve_workers(args.workers)
+    # 子进程通过环境变量读取配置：worker 数决定连接池大小，建表已在这里完成
+    os.environ["SERVER_WORKERS"] = str(workers)
+    os.environ["SYNC_SCHEMA_ON_STARTUP"] = "false"
+    settings.SERVER_WORKERS = workers
+
+    from app.core.security import check_kek_config
+    from app.database import sync_schema, pool_size
+    check_kek_config()
+    sync_schema()
+
+    if workers > 1:
+        shared = {
+            "CACHE_BACKEND": settings.CACHE_BACKEND,
+            "RATE_LIMIT_BACKEND": settings.RATE_LIMIT_BACKEND,
+        }
+        for name, value in shared.items():
+            if value == "memory" or (value == "redis" and not settings.REDIS_URL):
+                print(f"注意：{name}={value} 且未使用真实的 Redis，各 worker 的数据互不共享")
+        if settings.JOB_BACKEND == "local":
+            print("注意：JOB_BACKEND=local，作业在接收请求的 worker 内执行，worker 回收时未开始的作业会留在队列中")
+
+    print(f"启动 {workers} 个 worker，每个 worker 数据库连接池 {pool_size()} (+{settings.DB_MAX_OVERFLOW})")
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        proxy_headers=settings.TRUST_PROXY_HEADERS,
+        forwarded_allow_ips="*" if settings.TRUST_PROXY_HEADERS else None,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+    )
+
+if __name__ == "__main__":
+    main()
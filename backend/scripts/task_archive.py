@@ -0,0 +1,52 @@
+# backend/scripts/task_archive.py
+"""
+已完成任务归档工具。在 backend 目录下运行 (适合由 cron 等定时执行)：
+
+    python -m scripts.task_archive archive [--days 90] [--batch-size 500] [--max-batches N] [--user-id ID]
+    python -m scripts.task_archive report
+
+archive: 将完成超过 --days 天 (默认 TASK_ARCHIVE_AFTER_DAYS) 的任务分批移入 tasks_archive 表，
+         每批一个事务，可随时中断后重新执行。首次运行时会为旧数据补齐 completed_at。
+report:  统计热表、归档表的行数以及当前可归档的任务数。
+"""
+import argparse
+
+from app.database import SessionLocal, sync_schema
+from app.crud.task_archive import archive_completed_tasks, archive_stats, backfill_completed_at
+
+def main():
+    parser = argparse.ArgumentParser(description="已完成任务归档工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    archive_parser = subparsers.add_parser("archive", help="将完成较久的任务移入归档表")
+    archive_parser.add_argument("--days", type=int, default=None, help="完成超过该天数的任务才归档")
+    archive_parser.add_argument("--batch-size", type=int, default=None)
+    archive_parser.add_argument("--max-batches", type=int, default=None, help="本次最多处理的批数")
+    archive_parser.add_argument("--user-id", type=int, default=None, help="只归档该用户的任务")
+    subparsers.add_parser("report", help="统计热表与归档表的行数")
+
+    args = parser.parse_args()
+    sync_schema()
+
+    db = SessionLocal()
+    try:
+        if args.command == "archive":
+            backfilled = backfill_completed_at(db)
+            if backfilled:
+                print(f"已为 {backfilled} 个旧任务补齐 completed_at")
+            archived = archive_completed_tasks(
+                db,
+                older_than_days=args.days,
+                batch_size=args.batch_size,
+                max_batches=args.max_batches,
+                user_id=args.user_id
+            )
+            print(f"完成：归档 {archived} 个任务")
+        else:
+            stats = archive_stats(db)
+            print(f"热表任务 {stats['hot']} 个 (已完成 {stats['hot_completed']}，可归档 {stats['archivable']})，归档表 {stats['archived']} 个")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# backend/tests/conftest.py
+"""
+测试使用临时目录中的 SQLite 数据库，环境变量必须在导入 app 之前设置。
+在 backend 目录下运行：python -m pytest -q
+"""
+import base64
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_dir = tempfile.mkdtemp(prefix="taskdiary-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["DIARY_KEK"] = base64.urlsafe_b64encode(os.urandom(32)).decode()
+
+import app.models.models  # noqa: E402  注册全部模型
+from app.database import Base, SessionLocal, engine, sync_schema  # noqa: E402
+from app.crud import users as crud_users  # noqa: E402
+from app.schemas import schemas  # noqa: E402
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    sync_schema()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def user(db):
+    return crud_users.create_user(db, schemas.UserCreate(username="alice", password="secret-password"))
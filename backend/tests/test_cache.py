@@ -0,0 +1,51 @@
+# backend/tests/test_cache.py
+import pytest
+
+from app.core.cache import Cache, MemoryCacheBackend, RedisCacheBackend
+from app.core.redis_client import LocalRedis
+
+@pytest.fixture(params=["memory", "redis"])
+def namespace(request):
+    backend = MemoryCacheBackend() if request.param == "memory" else RedisCacheBackend(LocalRedis())
+    return Cache(backend, prefix="test").namespace("principal", ttl=60)
+
+@pytest.mark.parametrize("write", ["invalidate", "write_through"])
+def test_fill_racing_a_writer_is_not_cached(namespace, write):
+    def stale_loader():
+        # 加载读到旧数据之后、回填之前，写操作提交并失效 (或写穿) 了缓存
+        if write == "invalidate":
+            namespace.invalidate("alice")
+        else:
+            namespace.set("alice", {"hash": "new"})
+        return {"hash": "old"}
+
+    assert namespace.get_or_set("alice", stale_loader) == {"hash": "old"}
+    assert namespace.get("alice") in (None, {"hash": "new"})
+    assert namespace.get_or_set("alice", lambda: {"hash": "new"}) == {"hash": "new"}
+
+def test_fill_without_writer_is_cached(namespace):
+    assert namespace.get_or_set("bob", lambda: {"id": 1}) == {"id": 1}
+    assert namespace.get_or_set("bob", lambda: pytest.fail("应命中缓存")) == {"id": 1}
+
+def test_memory_add_enforces_max_entries():
+    backend = MemoryCacheBackend(max_entries=2)
+    for key in ("a", "b", "c"):
+        assert backend.add(key, b"1")
+    assert backend.get("a") is None
+    assert backend.get("c") == b"1"
+
+class _BrokenRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis 不可用")
+        return fail
+
+def test_redis_errors_degrade_except_invalidation():
+    backend = RedisCacheBackend(_BrokenRedis())
+    namespace = Cache(backend, prefix="test").namespace("principal", ttl=60)
+    assert backend.get("k") is None
+    assert backend.set("k", b"1") is False
+    assert backend.add("k", b"1") is True
+    assert namespace.get_or_set("alice", lambda: {"id": 1}) == {"id": 1}
+    with pytest.raises(ConnectionError):
+        namespace.invalidate("alice")
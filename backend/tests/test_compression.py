@@ -0,0 +1,50 @@
+# backend/tests/test_compression.py
+import asyncio
+
+import pytest
+
+from app.core.middleware import CompressionMiddleware
+
+def _app(content_type: bytes, body: bytes, extra_headers=()):
+    async def app(scope, receive, send):
+        headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode()), *extra_headers]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+def _request(app, accept_encoding: str) -> dict:
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []}
+    asyncio.run(CompressionMiddleware(app, encodings=("gzip",))(scope, receive, send))
+    headers = {}
+    for name, value in messages[0]["headers"]:
+        headers.setdefault(name, []).append(value)
+    return headers
+
+JSON_BODY = b'{"items": [' + b'{"title": "task"}, ' * 200 + b'{}]}'
+
+@pytest.mark.parametrize("accept_encoding, body", [
+    ("gzip", JSON_BODY),       # 压缩
+    ("gzip", b'{"ok": true}'), # 太小，不压缩
+    ("", JSON_BODY),           # 客户端不支持压缩
+])
+def test_compressible_responses_vary_on_accept_encoding(accept_encoding, body):
+    headers = _request(_app(b"application/json", body), accept_encoding)
+    assert headers[b"vary"] == [b"Accept-Encoding"]
+    assert (b"content-encoding" in headers) == (accept_encoding == "gzip" and body is JSON_BODY)
+
+def test_existing_vary_is_merged_once():
+    app = _app(b"application/json", JSON_BODY, [(b"vary", b"Origin"), (b"vary", b"accept-encoding")])
+    assert _request(app, "")[b"vary"] == [b"Origin", b"accept-encoding"]
+    app = _app(b"application/json", JSON_BODY, [(b"vary", b"Origin")])
+    assert _request(app, "gzip")[b"vary"] == [b"Origin, Accept-Encoding"]
+
+def test_incompressible_content_type_has_no_vary():
+    assert b"vary" not in _request(_app(b"image/png", b"\x89PNG" * 500), "gzip")
@@ -0,0 +1,41 @@
+# backend/tests/test_jobs.py
+import threading
+
+import pytest
+
+from app.crud import jobs as crud_jobs
+from app.core.config import settings
+from app.database import SessionLocal
+
+@pytest.fixture
+def job_limit(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_MAX_ACTIVE_PER_USER", 2)
+    return 2
+
+def test_create_job_enforces_limit(db, user, job_limit):
+    for _ in range(job_limit):
+        job = crud_jobs.create_job(db, user.id, "export", {"format": "json"})
+        assert job.status == crud_jobs.QUEUED and job.params == '{"format": "json"}'
+    with pytest.raises(crud_jobs.JobLimitExceeded):
+        crud_jobs.create_job(db, user.id, "export")
+
+def test_concurrent_create_job_respects_limit(db, user, job_limit):
+    user_id, created, barrier = user.id, [], threading.Barrier(8)
+
+    def submit():
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            created.append(crud_jobs.create_job(session, user_id, "export").id)
+        except crud_jobs.JobLimitExceeded:
+            pass
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == job_limit
+    assert len(crud_jobs.get_jobs(db, user_id)) == job_limit
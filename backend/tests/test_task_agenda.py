@@ -0,0 +1,34 @@
+# backend/tests/test_task_agenda.py
+from datetime import datetime, timedelta, timezone
+
+from app.crud import tasks as crud_tasks
+from app.schemas import schemas
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+def _due_dates(tasks) -> list:
+    return [task.due_date.replace(tzinfo=None) for task in tasks]
+
+def test_agenda_keeps_todays_earlier_occurrences(db, user):
+    series_start = NOW - timedelta(days=3)
+    for hour in (9, 15):
+        crud_tasks.create_user_task(db, schemas.TaskCreate(
+            title=f"每天 {hour} 点", due_date=series_start.replace(hour=hour), recurrence_rule="FREQ=DAILY"
+        ), user.id)
+    crud_tasks.create_user_task(db, schemas.TaskCreate(title="一次性", due_date=NOW.replace(hour=8)), user.id)
+
+    agenda = crud_tasks.get_task_agenda(db, user.id, now=NOW)
+    today = NOW.replace(tzinfo=None)
+    # 今天 9 点的实例已过截止时间，与今天 8 点的普通任务一起计入 overdue；之前几天的实例不堆积
+    assert _due_dates(agenda["overdue"]) == [today.replace(hour=8), today.replace(hour=9)]
+    assert _due_dates(agenda["today"]) == [today.replace(hour=15)]
+    assert len(agenda["this_week"]) == 12
+
+def test_agenda_skips_materialized_occurrence_today(db, user):
+    series = crud_tasks.create_user_task(db, schemas.TaskCreate(
+        title="每天", due_date=NOW.replace(hour=9) - timedelta(days=1), recurrence_rule="FREQ=DAILY"
+    ), user.id)
+    crud_tasks.materialize_occurrence(db, series.id, user.id, NOW.replace(hour=9), schemas.TaskUpdate(completed=True))
+
+    agenda = crud_tasks.get_task_agenda(db, user.id, now=NOW)
+    assert agenda["overdue"] == [] and agenda["today"] == []
@@ -0,0 +1,66 @@
+# backend/tests/test_task_archive.py
+from sqlalchemy import func, text
+
+from app.crud import tasks as crud_tasks
+from app.crud.purge import purge_tombstones
+from app.crud.task_archive import archive_completed_tasks
+from app.database import engine, sqlite_reuses_ids, sync_schema
+from app.models.models import ArchivedTask, Task
+from app.schemas import schemas
+
+def _create_completed(db, user_id, title) -> int:
+    return crud_tasks.create_user_task(db, schemas.TaskCreate(title=title, completed=True), user_id).id
+
+def _recreate_tasks_without_autoincrement(conn):
+    """模拟旧库：按未声明 AUTOINCREMENT 的 DDL 重建 (空的) tasks 表"""
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'tasks'")).scalar()
+    conn.execute(text("DROP TABLE tasks"))
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'tasks'"))
+    conn.execute(text(ddl.replace(" AUTOINCREMENT", "")))
+
+def test_archive_after_purging_highest_id(db, user):
+    for title in ("a", "b"):
+        _create_completed(db, user.id, title)
+    assert archive_completed_tasks(db, older_than_days=0) == 2
+
+    # 物理删除此时 id 最大的热表任务，新任务不能复用它的 id，也不能与归档任务冲突
+    doomed_id = crud_tasks.create_user_task(db, schemas.TaskCreate(title="doomed"), user.id).id
+    crud_tasks.delete_task(db, doomed_id, user.id)
+    assert purge_tombstones(db, Task, retention_days=-1) == 1
+
+    assert _create_completed(db, user.id, "fresh") > doomed_id
+    assert archive_completed_tasks(db, older_than_days=0) == 1
+    assert db.query(func.count(ArchivedTask.id)).scalar() == 3
+    assert db.query(func.count(Task.id)).scalar() == 0
+
+def test_sync_schema_migrates_tasks_to_autoincrement(db, user):
+    user_id = user.id
+    archived_id = _create_completed(db, user_id, "archived")
+    archive_completed_tasks(db, older_than_days=0)
+    db.close()
+
+    with engine.begin() as conn:
+        _recreate_tasks_without_autoincrement(conn)
+        assert sqlite_reuses_ids(conn, "tasks")
+
+    sync_schema()
+    with engine.connect() as conn:
+        assert not sqlite_reuses_ids(conn, "tasks")
+    assert _create_completed(db, user_id, "fresh") > archived_id
+    assert archive_completed_tasks(db, older_than_days=0) == 1
+
+def test_purge_keeps_high_ids_until_migrated(db, user):
+    user_id = user.id
+    archived_id = _create_completed(db, user_id, "archived")
+    archive_completed_tasks(db, older_than_days=0)
+    db.close()
+    with engine.begin() as conn:
+        _recreate_tasks_without_autoincrement(conn)
+        # 墓碑一个在归档任务 id 之下，一个在其之上
+        conn.execute(text(
+            "INSERT INTO tasks (id, title, importance, owner_id, deleted_at) "
+            "VALUES (:low, 'low', 'MEDIUM', :user, '2000-01-01'), (:high, 'high', 'MEDIUM', :user, '2000-01-01')"
+        ), {"low": archived_id - 1, "high": archived_id + 1, "user": user_id})
+
+    assert purge_tombstones(db, Task) == 1  # 只删除 id 低于归档表最大 id 的墓碑
+    assert db.query(Task.id).scalar() == archived_id + 1